@@ -0,0 +1,154 @@
+from archive import MAINTENANCE_GUARD
+
+# Сводные таблицы для отчетов. Их поддерживают триггеры при каждой записи в исходные
+# таблицы, поэтому отчет читает готовые итоги, а не пересчитывает всю историю.
+
+# Сводная таблица -> (DDL, запрос полного пересчета из исходных данных)
+SUMMARY_TABLES = {
+    "menu_by_category": ('''
+            CREATE TABLE IF NOT EXISTS menu_by_category (
+                category TEXT PRIMARY KEY,
+                dishes INTEGER NOT NULL,
+                price_total REAL NOT NULL
+            )
+        ''', '''
+            SELECT IFNULL(category, ''), COUNT(*), TOTAL(price) FROM dishes GROUP BY IFNULL(category, '')
+        '''),
+    "sales_by_category": ('''
+            CREATE TABLE IF NOT EXISTS sales_by_category (
+                category TEXT PRIMARY KEY,
+                items INTEGER NOT NULL,
+                revenue REAL NOT NULL
+            )
+        ''', '''
+            SELECT IFNULL(d.category, ''), SUM(oi.quantity), TOTAL(oi.quantity * oi.price)
+            FROM order_items oi JOIN orders o ON o.id = oi.order_id LEFT JOIN dishes d ON d.id = oi.dish_id
+            WHERE o.status != 'rejected' GROUP BY IFNULL(d.category, '')
+        '''),
+    "sales_by_day": ('''
+            CREATE TABLE IF NOT EXISTS sales_by_day (
+                day TEXT NOT NULL,
+                category TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                revenue REAL NOT NULL,
+                PRIMARY KEY (day, category)
+            )
+        ''', '''
+            SELECT date(o.created_at), IFNULL(d.category, ''), SUM(oi.quantity), TOTAL(oi.quantity * oi.price)
+            FROM order_items oi JOIN orders o ON o.id = oi.order_id LEFT JOIN dishes d ON d.id = oi.dish_id
+            WHERE o.status != 'rejected' GROUP BY date(o.created_at), IFNULL(d.category, '')
+        '''),
+    "covers_by_day": ('''
+            CREATE TABLE IF NOT EXISTS covers_by_day (
+                day TEXT PRIMARY KEY,
+                reservations INTEGER NOT NULL,
+                guests INTEGER NOT NULL
+            )
+        ''', '''
+            SELECT substr(reservation_date, 1, 10), COUNT(*), SUM(number_of_guests)
+            FROM reservations GROUP BY substr(reservation_date, 1, 10)
+        '''),
+    "payroll_by_position": ('''
+            CREATE TABLE IF NOT EXISTS payroll_by_position (
+                position TEXT PRIMARY KEY,
+                staff INTEGER NOT NULL,
+                salary_total REAL NOT NULL
+            )
+        ''', '''
+            SELECT position, COUNT(*), TOTAL(salary) FROM staff GROUP BY position
+        '''),
+}
+
+def apply_delta(table_name, keys, values, sign):
+    # SQL прибавления (sign="+") или вычитания (sign="-") одной строки исходных данных к итогам.
+    # keys/values - [(колонка итогов, выражение над new./old.), ...]; строка итогов, у которой
+    # счетчик (первая колонка values) дошел до нуля, удаляется
+    key_columns = [column for column, _ in keys]
+    value_columns = [column for column, _ in values]
+    expressions = [expression for _, expression in keys + values]
+    if sign == "+":
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in value_columns)
+        return f'''
+            INSERT INTO {table_name} ({', '.join(key_columns + value_columns)})
+            VALUES ({', '.join(expressions)})
+            ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates};
+        '''
+    where = " AND ".join(f"{column} = {expression}" for column, expression in keys)
+    updates = ", ".join(f"{column} = {column} - ({expression})" for column, expression in values)
+    return f'''
+        UPDATE {table_name} SET {updates} WHERE {where};
+        DELETE FROM {table_name} WHERE {where} AND {value_columns[0]} <= 0;
+    '''
+
+def delta_triggers(prefix, source, watched, summaries, when=None):
+    # Триггеры INSERT/DELETE/UPDATE OF watched на source, переносящие строку в каждую
+    # из summaries = [(таблица итогов, keys, values)], где выражения используют {row} вместо new/old
+    def body(row, sign):
+        return "".join(apply_delta(table_name, [(c, e.format(row=row)) for c, e in keys],
+                                   [(c, e.format(row=row)) for c, e in values], sign)
+                       for table_name, keys, values in summaries)
+
+    def condition(row, guard=False):
+        # Удаление при переносе в архив (archive.py) из итогов не вычитается
+        conditions = ([when.format(row=row)] if when else []) + ([MAINTENANCE_GUARD] if guard else [])
+        return f" WHEN {' AND '.join(conditions)}" if conditions else ""
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {source}{condition('new')} BEGIN"
+        f"{body('new', '+')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {source}{condition('old', True)} BEGIN"
+        f"{body('old', '-')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_update_old AFTER UPDATE OF {watched} ON {source}"
+        f"{condition('old')} BEGIN{body('old', '-')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {prefix}_update_new AFTER UPDATE OF {watched} ON {source}"
+        f"{condition('new')} BEGIN{body('new', '+')} END",
+    ]
+
+# Позиция не отклоненного заказа учитывается по категории блюда на момент продажи и дню заказа
+ORDER_ITEM_CATEGORY = "IFNULL((SELECT category FROM dishes WHERE id = {row}.dish_id), '')"
+ORDER_ITEM_DAY = "(SELECT date(created_at) FROM orders WHERE id = {row}.order_id)"
+ORDER_ITEM_ACCEPTED = "(SELECT status FROM orders WHERE id = {row}.order_id) != 'rejected'"
+
+def summary_triggers():
+    triggers = []
+    triggers += delta_triggers("analytics_menu", "dishes", "category, price", [
+        ("menu_by_category", [("category", "IFNULL({row}.category, '')")],
+         [("dishes", "1"), ("price_total", "IFNULL({row}.price, 0)")]),
+    ])
+    triggers += delta_triggers("analytics_sales", "order_items", "quantity, price, dish_id", [
+        ("sales_by_category", [("category", ORDER_ITEM_CATEGORY)],
+         [("items", "{row}.quantity"), ("revenue", "{row}.quantity * {row}.price")]),
+        ("sales_by_day", [("day", ORDER_ITEM_DAY), ("category", ORDER_ITEM_CATEGORY)],
+         [("items", "{row}.quantity"), ("revenue", "{row}.quantity * {row}.price")]),
+    ], when=ORDER_ITEM_ACCEPTED)
+    triggers += delta_triggers("analytics_covers", "reservations", "reservation_date, number_of_guests", [
+        ("covers_by_day", [("day", "substr({row}.reservation_date, 1, 10)")],
+         [("reservations", "1"), ("guests", "{row}.number_of_guests")]),
+    ])
+    triggers += delta_triggers("analytics_payroll", "staff", "position, salary", [
+        ("payroll_by_position", [("position", "{row}.position")],
+         [("staff", "1"), ("salary_total", "IFNULL({row}.salary, 0)")]),
+    ])
+    return triggers
+
+def create_summary_tables(cursor):
+    created = []
+    for table_name, (ddl, _) in SUMMARY_TABLES.items():
+        exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone()
+        cursor.execute(ddl)
+        if not exists:
+            created.append(table_name)
+    for trigger in summary_triggers():
+        # Триггеры пересоздаются, чтобы изменённые условия дошли и до уже созданных баз
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger.split()[5]}")
+        cursor.execute(trigger)
+    # Новые сводные таблицы заполняются по уже накопленным данным один раз
+    rebuild_summaries(cursor, created)
+
+def rebuild_summaries(cursor, tables=None):
+    # Полный пересчет итогов из исходных таблиц (при создании и для сверки);
+    # продажи при этом относятся к текущим категориям блюд
+    for table_name in SUMMARY_TABLES if tables is None else tables:
+        _, query = SUMMARY_TABLES[table_name]
+        cursor.execute(f"DELETE FROM {table_name}")
+        cursor.execute(f"INSERT INTO {table_name} {query}")
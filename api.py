@@ -0,0 +1,398 @@
+import argparse
+import asyncio
+import json
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from availability import ReservationConflict
+from bulk_import import IMPORT_COLUMNS, validate
+from connection import is_busy_error
+from database import Database
+from locations import load_locations
+from metrics import METRICS
+
+# HTTP/JSON доступ к базе для планшетов официантов и экрана кухни, где нет Tk.
+# Чтения выполняет пул потоков, у каждого своя Database; записи идут по очереди через
+# один поток-писатель, как в DbWorker. Ответы на GET помечаются ETag по PRAGMA data_version:
+# пока база не менялась, повторный запрос с If-None-Match получает 304 и в базу не ходит.
+
+DEFAULT_PORT = 8080
+DEFAULT_LIMIT = 200
+MAX_LIMIT = 1000
+MAX_BODY = 1 << 20
+SESSION_TTL = 8 * 3600  # токен входа действует смену, затем нужен новый POST /login
+SESSION_SWEEP = 60  # не чаще раза в минуту из sessions убираются истёкшие токены
+READ_TABLES = ("dishes", "reservations", "ingredients", "staff")
+WRITE_TABLES = ("reservations", "ingredients", "staff")  # меню меняется только из приложения
+
+STATUS_TEXT = {200: "OK", 201: "Created", 204: "No Content", 304: "Not Modified", 400: "Bad Request",
+               401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+               409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+               503: "Service Unavailable"}
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def encode(payload):
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+class DatabasePool:
+    # Database на каждый поток: sqlite3-соединение нельзя передавать между потоками
+    def __init__(self, path="restaurant.db", readers=4):
+        self.path = path
+        self.local = threading.local()
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="db-writer")
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="db-reader")
+        # Писатель открывает базу первым, чтобы схема была создана до подключения читателей
+        self.writer.submit(self.database).result()
+        # Соединение только для номера версии: его data_version меняется при коммите
+        # любого другого соединения - нашего писателя, другого терминала или процесса
+        self.version_connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.version_lock = threading.Lock()
+        self.portions = None  # (версия, {id блюда: порций}) - общие для всех читателей
+        self.portions_lock = threading.Lock()
+
+    def database(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = self.local.db = Database(self.path)
+        return db
+
+    def version(self):
+        with self.version_lock:
+            return self.version_connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def dish_portions(self, db):
+        # Порции пересчитываются один раз на версию базы, а не каждым читателем отдельно.
+        # Блокировка держится только на проверке и замене: пересчёт идёт без неё, результат
+        # сохраняется под версией, взятой до пересчёта, и не заменяет более новый
+        version = self.version()
+        with self.portions_lock:
+            if self.portions is not None and self.portions[0] == version:
+                return self.portions[1]
+        portions = db.dish_portions()
+        with self.portions_lock:
+            if self.portions is None or self.portions[0] < version:
+                self.portions = (version, portions)
+        return portions
+
+    async def read(self, job):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, lambda: job(self.database()))
+
+    async def write(self, job):
+        def run():
+            db = self.database()
+            db.drop_stale_caches()
+            return job(db)
+
+        return await asyncio.get_running_loop().run_in_executor(self.writer, run)
+
+    def close(self):
+        self.readers.shutdown()
+        self.writer.submit(lambda: self.database().close()).result()
+        self.writer.shutdown()
+        self.version_connection.close()
+
+def single(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+def parse_limit(query):
+    try:
+        limit = int(single(query, "limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise HttpError(400, "limit должен быть числом") from None
+    return max(1, min(limit, MAX_LIMIT))
+
+def parse_after(query):
+    # Курсор страницы - JSON-массив [значение колонки сортировки, id] из поля next прошлого ответа
+    text = single(query, "after")
+    if text is None:
+        return None
+    try:
+        value, record_id = json.loads(text)
+        return value, int(record_id)
+    except (TypeError, ValueError):
+        raise HttpError(400, "after: ожидается курсор из поля next") from None
+
+def list_records(db, table_name, query, dish_portions):
+    order_by = single(query, "order_by", "id")
+    ascending = single(query, "order", "asc") != "desc"
+    limit = parse_limit(query)
+    if table_name == "dishes":
+        category_filter = query.get("category")
+        text = single(query, "q", "").strip()
+        if text:
+            # Результаты поиска - одна страница, упорядоченная по релевантности
+            rows = db.search_dishes(text, limit, category_filter)
+            return {"items": dish_dicts(db, rows, dish_portions), "next": None}
+        rows = db.fetch_page("dishes", order_by, ascending, parse_after(query), limit, category_filter)
+        items = dish_dicts(db, rows, dish_portions)
+    else:
+        rows = db.fetch_page(table_name, order_by, ascending, parse_after(query), limit)
+        items = [row._asdict() for row in rows]
+    next_page = None
+    if len(rows) == limit:
+        last = rows[-1]
+        value = getattr(last, order_by)
+        next_page = json.dumps([value if value is not None else "", last.id], ensure_ascii=False)
+    return {"items": items, "next": next_page}
+
+def dish_dicts(db, rows, dish_portions):
+    portions = dish_portions(db)
+    return [dict(row._asdict(), portions=portions.get(row.id)) for row in rows]
+
+def get_record(db, table_name, record_id, dish_portions):
+    row = db.fetch_record(table_name, record_id)
+    if row is None:
+        raise HttpError(404, f"Запись {record_id} не найдена")
+    return dish_dicts(db, [row], dish_portions)[0] if table_name == "dishes" else row._asdict()
+
+def save_reservation(db, fields, record_id=None):
+    # Двойное бронирование одного стола не допускаем, как и в приложении: проверка
+    # и запись идут одной транзакцией базы
+    try:
+        return db.save_reservation(fields, record_id)
+    except ReservationConflict as error:
+        raise HttpError(409, str(error)) from None
+
+def create_record(db, table_name, body):
+    record = validate(table_name, body)
+    if table_name == "reservations":
+        return save_reservation(db, dict(zip((column for column, _ in IMPORT_COLUMNS[table_name]), record)))._asdict()
+    return db.add_record(table_name, record)._asdict()
+
+def update_record(db, table_name, record_id, body):
+    current = db.fetch_record(table_name, record_id)
+    if current is None:
+        raise HttpError(404, f"Запись {record_id} не найдена")
+    converters = dict(IMPORT_COLUMNS[table_name])
+    fields = {}
+    for column, value in body.items():
+        if column not in converters:
+            raise HttpError(400, f"Неизвестное поле {column}")
+        try:
+            fields[column] = converters[column](value)
+        except (TypeError, ValueError) as error:
+            raise HttpError(400, f"{column}: {error}") from None
+    if not fields:
+        return current._asdict()
+    if table_name == "reservations":
+        row = save_reservation(db, fields, record_id)
+        if row is None:
+            raise HttpError(404, f"Запись {record_id} не найдена")
+        return row._asdict()
+    return db.update_record(table_name, {"id": record_id, **fields})._asdict()
+
+def delete_record(db, table_name, record_id):
+    if db.delete_record(table_name, record_id) is None:
+        raise HttpError(404, f"Запись {record_id} не найдена")
+
+class ApiServer:
+    def __init__(self, pool):
+        self.pool = pool
+        # Номер запуска в ETag: счётчик data_version начинается заново у каждого соединения
+        self.boot = secrets.token_hex(4)
+        self.sessions = {}  # токен -> (роль пользователя, срок действия по time.monotonic)
+        self.next_sweep = 0
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"API: http://{host}:{server.sockets[0].getsockname()[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 с постоянными соединениями: запросы одного клиента обрабатываются по очереди
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    writer.write(self.response(413, encode({"error": "Слишком большой запрос"}), close=True))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload, extra = await self.dispatch(method, target, headers, body)
+                close = version != "HTTP/1.1" or headers.get("connection", "").lower() == "close"
+                writer.write(self.response(status, payload, extra, close))
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def response(self, status, payload, extra=None, close=False):
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}", f"Content-Length: {len(payload)}",
+                 f"Connection: {'close' if close else 'keep-alive'}"]
+        if payload:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines += [f"{name}: {value}" for name, value in (extra or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload
+
+    async def dispatch(self, method, target, headers, body):
+        # Возвращает (статус, тело ответа в байтах, дополнительные заголовки)
+        try:
+            url = urlsplit(target)
+            parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+            query = parse_qs(url.query)
+            if method == "GET":
+                return await self.get(parts, query, headers)
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "Ожидается JSON-объект")
+            if parts == ["login"] and method == "POST":
+                return await self.login(data)
+            if parts == ["logout"] and method == "POST":
+                return self.logout(headers)
+            return await self.change(method, parts, data, headers)
+        except HttpError as error:
+            return error.status, encode({"error": str(error)}), None
+        except (ValueError, KeyError) as error:  # в том числе неверный JSON и недопустимые колонки
+            return 400, encode({"error": str(error)}), None
+        except sqlite3.OperationalError as error:
+            if is_busy_error(error):
+                return 503, encode({"error": "База занята, повторите запрос"}), {"Retry-After": "1"}
+            print(f"Ошибка базы данных: {error}", file=sys.stderr)
+            return 500, encode({"error": str(error)}), None
+        except Exception as error:
+            print(f"Ошибка обработки {method} {target}: {error!r}", file=sys.stderr)
+            return 500, encode({"error": "Внутренняя ошибка"}), None
+
+    async def get(self, parts, query, headers):
+        if not parts or parts == ["health"]:
+            return 200, encode({"status": "ok"}), None
+        # Читать может любой вошедший пользователь, без входа открыта только проверка живости
+        self.authorize(headers)
+        if parts == ["metrics"]:
+            return 200, encode(METRICS.report()), None
+        if parts[0] not in READ_TABLES or len(parts) > 2:
+            raise HttpError(404, "Нет такого ресурса")
+        version = self.pool.version()
+        etag = f'"{self.boot}-{version}"'
+        if etag in headers.get("if-none-match", ""):
+            return 304, b"", {"ETag": etag, "Cache-Control": "no-cache"}
+        table_name = parts[0]
+        if len(parts) == 1:
+            payload = await self.pool.read(lambda db: encode(list_records(db, table_name, query, self.pool.dish_portions)))
+        else:
+            record_id = parse_id(parts[1])
+            payload = await self.pool.read(lambda db: encode(get_record(db, table_name, record_id, self.pool.dish_portions)))
+        # Запись, закоммиченная во время чтения, меняет версию: такой ответ отдаётся без ETag,
+        # иначе клиент закэшировал бы его под тегом, который уже не соответствует данным
+        if self.pool.version() != version:
+            return 200, payload, {"Cache-Control": "no-cache"}
+        return 200, payload, {"ETag": etag, "Cache-Control": "no-cache"}
+
+    async def login(self, data):
+        username, password = data.get("username"), data.get("password")
+        user = await self.pool.read(lambda db: db.fetch_user(username, password))
+        if user is None:
+            raise HttpError(401, "Неверное имя пользователя или пароль")
+        self.sweep_sessions()
+        token = secrets.token_urlsafe(16)
+        self.sessions[token] = (user.role, time.monotonic() + SESSION_TTL)
+        return 200, encode({"token": token, "username": user.username, "role": user.role,
+                            "expires_in": SESSION_TTL}), None
+
+    def logout(self, headers):
+        self.authorize(headers)
+        del self.sessions[bearer_token(headers)]
+        return 204, b"", None
+
+    def authorize(self, headers, role=None):
+        # Роль по токену из Authorization: Bearer; истёкший токен - как отсутствующий
+        self.sweep_sessions()
+        session = self.sessions.get(bearer_token(headers))
+        if session is None or session[1] <= time.monotonic():
+            raise HttpError(401, "Нужен вход: POST /login")
+        if role is not None and session[0] != role:
+            raise HttpError(403, "Недостаточно прав")
+        return session[0]
+
+    def sweep_sessions(self):
+        now = time.monotonic()
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + SESSION_SWEEP
+        for token in [token for token, (_, expires) in self.sessions.items() if expires <= now]:
+            del self.sessions[token]
+
+    async def change(self, method, parts, data, headers):
+        if not parts or parts[0] not in WRITE_TABLES or len(parts) > 2:
+            raise HttpError(404, "Нет такого ресурса")
+        # Изменять данные может только администратор, как и в приложении
+        self.authorize(headers, "admin")
+        table_name = parts[0]
+        if len(parts) == 1 and method == "POST":
+            row = await self.pool.write(lambda db: create_record(db, table_name, data))
+            return 201, encode(row), None
+        if len(parts) == 2 and method in ("PUT", "PATCH"):
+            record_id = parse_id(parts[1])
+            row = await self.pool.write(lambda db: update_record(db, table_name, record_id, data))
+            return 200, encode(row), None
+        if len(parts) == 2 and method == "DELETE":
+            record_id = parse_id(parts[1])
+            await self.pool.write(lambda db: delete_record(db, table_name, record_id))
+            return 204, b"", None
+        raise HttpError(405, f"Метод {method} не поддерживается")
+
+def bearer_token(headers):
+    return headers.get("authorization", "").removeprefix("Bearer ").strip()
+
+def parse_id(text):
+    try:
+        return int(text)
+    except ValueError:
+        raise HttpError(404, "Нет такой записи") from None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON API базы ресторана")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--location", help="код точки из locations.json вместо --db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--readers", type=int, default=4, help="потоков для чтения")
+    parser.add_argument("--slow-ms", type=float, help="записывать запросы дольше стольких мс")
+    parser.add_argument("--slow-log", help="файл журнала медленных запросов")
+    parser.add_argument("--trace", action="store_true", help="трассировка SQL: операторы триггеров и шаги VM")
+    parser.add_argument("--metrics", help="записать метрики (JSON) в этот файл при остановке")
+    args = parser.parse_args(argv)
+    METRICS.configure(args.slow_ms, args.slow_log, args.trace)
+    if args.location:
+        locations = load_locations()
+        if args.location not in locations:
+            parser.error(f"неизвестная точка {args.location}, есть: {', '.join(locations)}")
+        args.db = locations[args.location].path
+
+    pool = DatabasePool(args.db, args.readers)
+    try:
+        asyncio.run(ApiServer(pool).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+        if args.metrics:
+            METRICS.dump(args.metrics)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+
+# Архив истории: брони и заказы старше заданного срока переносятся из restaurant.db в отдельный
+# файл (по умолчанию restaurant_archive.db), подключаемый через ATTACH как схема archive.
+# Перенос идёт пачками, каждая пачка - своя короткая транзакция, так что терминалы продолжают
+# писать между пачками. Пока пачка переносится, в таблице maintenance лежит строка: триггеры
+# удаления видят её и не вычитают архивные строки из сводных итогов и не пишут их в change_log.
+# Строку видит только транзакция переноса, для остальных соединений её не бывает.
+# Полный пересчёт итогов (analytics.rebuild_summaries) видит только горячие таблицы.
+
+ARCHIVE_SCHEMA = "archive"
+DEFAULT_AGE_DAYS = 365
+BATCH_SIZE = 1000
+
+# Условие для триггеров удаления: строка удаляется не переносом в архив
+MAINTENANCE_GUARD = "NOT EXISTS (SELECT 1 FROM maintenance)"
+
+# Таблица -> (колонки, DDL в архиве, условие "старая строка", [(зависимая таблица, колонка связи)])
+ARCHIVED_TABLES = {
+    "reservations": (
+        "id, customer_name, reservation_date, number_of_guests, table_number, duration_minutes, start_at", '''
+            CREATE TABLE IF NOT EXISTS archive.reservations (
+                id INTEGER PRIMARY KEY,
+                customer_name TEXT NOT NULL,
+                reservation_date TEXT NOT NULL,
+                number_of_guests INTEGER NOT NULL,
+                table_number INTEGER NOT NULL,
+                duration_minutes INTEGER NOT NULL,
+                start_at INTEGER
+            )
+        ''', "start_at < ?", ()),
+    "orders": ("id, created_at, table_number, status, note", '''
+            CREATE TABLE IF NOT EXISTS archive.orders (
+                id INTEGER PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                table_number INTEGER,
+                status TEXT NOT NULL,
+                note TEXT
+            )
+        ''', "created_at < ?", (("order_items", "order_id"),)),
+}
+
+DEPENDENT_TABLES = {
+    "order_items": ("id, order_id, dish_id, quantity, price", '''
+            CREATE TABLE IF NOT EXISTS archive.order_items (
+                id INTEGER PRIMARY KEY,
+                order_id INTEGER NOT NULL,
+                dish_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL
+            )
+        '''),
+}
+
+ARCHIVE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS archive.idx_reservations_start ON reservations (start_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_orders_created ON orders (created_at)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_order_items_order ON order_items (order_id)",
+)
+
+# Представления "горячие + архивные строки" на соединении чтения -> таблица
+HISTORY_VIEWS = {"reservations_history": "reservations"}
+
+def create_maintenance_table(cursor):
+    cursor.execute("CREATE TABLE IF NOT EXISTS maintenance (reason TEXT NOT NULL)")
+
+def default_archive_path(path):
+    root, extension = os.path.splitext(path)
+    return f"{root}_archive{extension or '.db'}"
+
+def is_attached(connection):
+    return any(row[1] == ARCHIVE_SCHEMA for row in connection.execute("PRAGMA database_list").fetchall())
+
+def attach_archive(db, path=None):
+    # Подключает архив к обоим соединениям Database и создаёт в нём таблицы; повторный вызов ничего не делает.
+    # ATTACH нельзя выполнить внутри транзакции
+    path = path or default_archive_path(db.manager.path)
+    for connection in (db.connection, db.read_connection):
+        if not is_attached(connection):
+            connection.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+    db.cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode = WAL")
+    for _, ddl, _, _ in ARCHIVED_TABLES.values():
+        db.cursor.execute(ddl)
+    for _, ddl in DEPENDENT_TABLES.values():
+        db.cursor.execute(ddl)
+    for ddl in ARCHIVE_INDEXES:
+        db.cursor.execute(ddl)
+    # Временные представления живут в соединении чтения; query_only запрещает и их,
+    # поэтому на время CREATE TEMP VIEW он снимается
+    db.read_connection.execute("PRAGMA query_only = 0")
+    try:
+        for view_name, table_name in HISTORY_VIEWS.items():
+            columns = ARCHIVED_TABLES[table_name][0]
+            db.read_connection.execute(f'''
+                CREATE TEMP VIEW IF NOT EXISTS {view_name} AS
+                SELECT {columns} FROM main.{table_name}
+                UNION ALL
+                SELECT {columns} FROM {ARCHIVE_SCHEMA}.{table_name}
+            ''')
+    finally:
+        db.read_connection.execute("PRAGMA query_only = 1")
+    return path
+
+def archive_cutoffs(age_days, now=None):
+    # Граница "старых" строк для каждой таблицы в её формате: start_at - настенное время
+    # в секундах (см. availability.parse_reservation_date), created_at - локальное время текстом
+    moment = (time.time() if now is None else now) - age_days * 86400
+    return {"reservations": calendar.timegm(time.localtime(moment)),
+            "orders": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(moment))}
+
+def move_rows(db, table_name, cutoff, batch_size=BATCH_SIZE, on_progress=None):
+    # Перенос строк старше cutoff пачками по batch_size; возвращает число перенесённых строк.
+    # В WAL транзакция атомарна для каждого файла по отдельности, поэтому в архив пишем
+    # INSERT OR REPLACE: пачку, прерванную между файлами, следующий запуск перенесёт заново
+    columns, _, condition, dependents = ARCHIVED_TABLES[table_name]
+    moved = 0
+    while True:
+        with db.transaction():
+            ids = [row[0] for row in db.cursor.execute(
+                f"SELECT id FROM main.{table_name} WHERE {condition} ORDER BY id LIMIT ?",
+                (cutoff, batch_size)).fetchall()]
+            if not ids:
+                break
+            batch = (json.dumps(ids),)
+            db.cursor.execute("INSERT INTO maintenance (reason) VALUES (?)", (f"archive {table_name}",))
+            for dependent, key in dependents:
+                dependent_columns = DEPENDENT_TABLES[dependent][0]
+                db.cursor.execute(f'''
+                    INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{dependent} ({dependent_columns})
+                    SELECT {dependent_columns} FROM main.{dependent} WHERE {key} IN (SELECT value FROM json_each(?))
+                ''', batch)
+                db.cursor.execute(f"DELETE FROM main.{dependent} WHERE {key} IN (SELECT value FROM json_each(?))", batch)
+            db.cursor.execute(f'''
+                INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table_name} ({columns})
+                SELECT {columns} FROM main.{table_name} WHERE id IN (SELECT value FROM json_each(?))
+            ''', batch)
+            db.cursor.execute(f"DELETE FROM main.{table_name} WHERE id IN (SELECT value FROM json_each(?))", batch)
+            db.cursor.execute("DELETE FROM maintenance")
+        moved += len(ids)
+        if on_progress:
+            on_progress(table_name, moved)
+    return moved
+
+def archive_history(db, age_days=DEFAULT_AGE_DAYS, batch_size=BATCH_SIZE, path=None, on_progress=None, now=None):
+    # {таблица: перенесено строк}
+    db.attach_archive(path)
+    cutoffs = archive_cutoffs(age_days, now)
+    moved = {table_name: move_rows(db, table_name, cutoffs[table_name], batch_size, on_progress)
+             for table_name in ARCHIVED_TABLES}
+    db.invalidate_caches("reservations")
+    return moved
+
+def main(argv=None):
+    from database import Database  # database сам импортирует этот модуль
+
+    parser = argparse.ArgumentParser(description="Перенос старых броней и заказов restaurant.db в архив")
+    parser.add_argument("--days", type=int, default=DEFAULT_AGE_DAYS, help="переносить строки старше стольких дней")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="строк в одной транзакции")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--archive", help="файл архива (по умолчанию <база>_archive.db)")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    started = time.perf_counter()
+    try:
+        moved = archive_history(db, args.days, args.batch_size, args.archive,
+                                on_progress=lambda table_name, count: print(f"{table_name}: {count}", file=sys.stderr))
+    finally:
+        db.close()
+    seconds = time.perf_counter() - started
+    print(", ".join(f"{table_name}: {count}" for table_name, count in moved.items()) + f" строк в архиве, {seconds:.2f} с")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import bisect
+import calendar
+import time
+from datetime import datetime, timezone
+
+# Длительность брони по умолчанию, минут
+DEFAULT_DURATION = 120
+
+RESERVATION_DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S")
+
+def parse_reservation_date(text):
+    # Дата брони -> секунды от эпохи. Время считается "настенным", без часового пояса,
+    # так же как strftime('%s', ...) в SQLite, которым заполняется reservations.start_at
+    for date_format in RESERVATION_DATE_FORMATS:
+        try:
+            return calendar.timegm(datetime.strptime(text.strip(), date_format).timetuple())
+        except ValueError:
+            pass
+    raise ValueError(f"Неверный формат даты: {text!r}, ожидается ГГГГ-ММ-ДД ЧЧ:ММ")
+
+def wall_clock_now():
+    # Текущее местное время в тех же "настенных" секундах, что и start_at
+    return calendar.timegm(time.localtime())
+
+def format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+class ReservationConflict(ValueError):
+    # Стол занят в это время или мест за ним не хватает
+    pass
+
+class TableSchedule:
+    # Брони одного стола: интервалы [start, end), отсортированные по началу, плюс
+    # префиксный максимум концов. Это не дерево: сложность операций линейная в худшем случае.
+    # - add/remove: list.insert/del и пересчёт max_ends от места вставки - O(n); бронь
+    #   в конец расписания (обычный случай - новые брони позже старых) пересчитывает один элемент.
+    # - overlapping: bisect плюс обход назад, пока max_ends > start. Брони одного стола не
+    #   пересекаются (save_reservation это проверяет), и обход занимает найденные + 1 шаг;
+    #   но за одной длинной бронью (старые данные, сдвинутые столы) обход проходит все брони,
+    #   начавшиеся внутри неё, - до O(n).
+    # На столе за день десятки броней, а в движке только не закончившиеся, поэтому
+    # массивы здесь дешевле сбалансированного дерева; границы проверяет test_availability.
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.max_ends = []  # max_ends[i] = max(ends[0..i])
+
+    def add(self, start, end, reservation_id):
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.ids.insert(index, reservation_id)
+        self._rebuild_max(index)
+
+    def remove(self, reservation_id):
+        if reservation_id not in self.ids:
+            return
+        index = self.ids.index(reservation_id)
+        del self.starts[index], self.ends[index], self.ids[index]
+        self._rebuild_max(index)
+
+    def _rebuild_max(self, index):
+        del self.max_ends[index:]
+        current = self.max_ends[-1] if self.max_ends else None
+        for end in self.ends[index:]:
+            current = end if current is None else max(current, end)
+            self.max_ends.append(current)
+
+    def overlapping(self, start, end):
+        # id броней, пересекающих [start, end). Интервалы с началом >= end отсекает bisect,
+        # а идти назад дальше места, где max_ends <= start, нет смысла
+        result = []
+        index = bisect.bisect_left(self.starts, end) - 1
+        while index >= 0 and self.max_ends[index] > start:
+            if self.ends[index] > start:
+                result.append(self.ids[index])
+            index -= 1
+        return result
+
+    def is_free(self, start, end, exclude_id=None):
+        index = bisect.bisect_left(self.starts, end)
+        if index == 0 or self.max_ends[index - 1] <= start:
+            return True
+        return all(reservation_id == exclude_id for reservation_id in self.overlapping(start, end))
+
+    def free_slots(self, window_start, window_end, duration):
+        # Свободные промежутки не короче duration секунд внутри [window_start, window_end)
+        slots = []
+        cursor = window_start
+        index = bisect.bisect_right(self.max_ends, window_start)
+        while index < len(self.starts) and self.starts[index] < window_end:
+            if self.starts[index] - cursor >= duration:
+                slots.append((cursor, self.starts[index]))
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        if window_end - cursor >= duration:
+            slots.append((cursor, window_end))
+        return slots
+
+class AvailabilityEngine:
+    # Расписание столов в памяти: брони, не закончившиеся к моменту since (None - все).
+    # Запросы с началом не раньше since отвечаются отсюда; отдельные изменённые брони
+    # заменяются на месте через remove() и add(), без перестройки всего расписания
+    def __init__(self, rows, capacities=None, since=None):
+        self.tables = {}
+        self.placements = {}  # id брони -> столы, которые она занимает (основной и сдвинутые)
+        self.since = since
+        # По столу и началу: брони добавляются в конец расписания стола
+        for reservation_id, table_number, start, duration in sorted(rows, key=lambda row: (row[1], row[2])):
+            self.add(reservation_id, table_number, start, duration)
+        self.capacities = capacities or {}
+
+    def covers(self, start):
+        return self.since is None or start >= self.since
+
+    def add(self, reservation_id, table_number, start, duration):
+        self.schedule(table_number).add(start, start + duration * 60, reservation_id)
+        self.placements.setdefault(reservation_id, []).append(table_number)
+
+    def remove(self, reservation_id):
+        for table_number in self.placements.pop(reservation_id, ()):
+            self.tables[table_number].remove(reservation_id)
+
+    def schedule(self, table_number):
+        if table_number not in self.tables:
+            self.tables[table_number] = TableSchedule()
+        return self.tables[table_number]
+
+    def known_tables(self):
+        return sorted(set(self.tables) | set(self.capacities))
+
+    def conflicts(self, table_number, start, duration, exclude_id=None):
+        schedule = self.tables.get(table_number)
+        if schedule is None:
+            return []
+        return [reservation_id for reservation_id in schedule.overlapping(start, start + duration * 60)
+                if reservation_id != exclude_id]
+
+    def free_tables(self, start, duration, guests=None):
+        # Свободные столы на время [start, start + duration); вместимость проверяется,
+        # если она известна для стола
+        end = start + duration * 60
+        result = []
+        for table_number in self.known_tables():
+            capacity = self.capacities.get(table_number)
+            if guests is not None and capacity is not None and capacity < guests:
+                continue
+            schedule = self.tables.get(table_number)
+            if schedule is None or schedule.is_free(start, end):
+                result.append(table_number)
+        return result
+
+    def free_slots(self, window_start, window_end, duration, guests=None):
+        # Свободные окна по каждому столу за вечер: {стол: [(начало, конец), ...]}
+        result = {}
+        for table_number in self.known_tables():
+            capacity = self.capacities.get(table_number)
+            if guests is not None and capacity is not None and capacity < guests:
+                continue
+            schedule = self.tables.get(table_number) or TableSchedule()
+            slots = schedule.free_slots(window_start, window_end, duration * 60)
+            if slots:
+                result[table_number] = slots
+        return result
@@ -0,0 +1,317 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import datagen
+from orders import OrderIngest
+from availability import parse_reservation_date
+from database import Database, VALID_CATEGORIES
+
+# Замеры слоя Database и заполнения списков на синтетических данных (datagen.py).
+# Работает без дисплея: если Tk недоступен (нет X-сервера), вместо ttk.Treeview
+# используется HeadlessTree с тем же набором методов. Результаты пишутся в JSON,
+# и новый прогон можно сравнить с сохранённым (--compare).
+
+DEFAULT_SIZES = "1k,100k"
+WRITE_OPS = 500  # операций на замер add/update/delete
+ORDER_COUNT = 2000  # заказов на замер приёма заказов
+
+class HeadlessTree:
+    # Минимальная замена ttk.Treeview для PagedTreeview: хранит строки, ничего не рисует
+    def __init__(self):
+        self.children = []
+        self.values = {}
+        self.first = 0
+
+    def configure(self, **options):
+        pass
+
+    def get_children(self, item=""):
+        return tuple(self.children)
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        iid = iid if iid is not None else f"I{len(self.values)}"
+        if index == "end":
+            self.children.append(iid)
+        else:
+            self.children.insert(index, iid)
+        self.values[iid] = values
+        return iid
+
+    def delete(self, *iids):
+        removed = set(iids)
+        self.children = [iid for iid in self.children if iid not in removed]
+        for iid in iids:
+            del self.values[iid]
+
+    def item(self, iid, values=None):
+        if values is not None:
+            self.values[iid] = values
+        return {"values": list(self.values[iid])}
+
+    def exists(self, iid):
+        return iid in self.values
+
+    def index(self, iid):
+        return self.children.index(iid)
+
+    def yview(self, *args):
+        total = max(len(self.children), 1)
+        return self.first / total, min(self.first + 20, total) / total
+
+    def yview_moveto(self, fraction):
+        self.first = round(fraction * len(self.children))
+
+def make_tree_factory():
+    # ttk.Treeview на скрытом окне, если есть дисплей (в том числе Xvfb), иначе HeadlessTree
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        return HeadlessTree, "headless"
+
+    def factory():
+        tree = ttk.Treeview(root, columns=Database.DISH_COLUMNS, show="headings")
+        tree.pack()
+        return tree
+
+    def update():
+        root.update_idletasks()
+
+    factory.update = update
+    return factory, "tk"
+
+def measure(repeat, action):
+    # action() -> число обработанных строк/операций; возвращает (времена, число)
+    times = []
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = action()
+        times.append(time.perf_counter() - started)
+    return times, count
+
+class Bench:
+    def __init__(self, repeat=3, tree_factory=None, display="headless"):
+        self.repeat = repeat
+        self.tree_factory = tree_factory or HeadlessTree
+        self.display = display
+        self.results = []
+
+    def run(self, name, size, action, repeat=None):
+        times, count = measure(repeat or self.repeat, action)
+        best = min(times)
+        result = {"name": name, "size": size, "runs": len(times), "min_s": round(best, 6),
+                  "median_s": round(statistics.median(times), 6), "count": count,
+                  "per_second": round(count / best, 1) if best else None}
+        self.results.append(result)
+        print(f"{size:>9} {name:<48} {best * 1000:10.2f} мс  {count:>9}", file=sys.stderr)
+        return result
+
+    def populate(self, path, size, seed):
+        db = Database(path)
+        for table_name in datagen.GENERATORS:
+            datagen.generate(db, table_name, size, seed)
+        db.close()
+
+    def run_size(self, size, seed, keep_dir=None):
+        directory = keep_dir or tempfile.mkdtemp(prefix="restaurant-bench-")
+        path = os.path.join(directory, f"bench-{size}.db")
+        if not os.path.exists(path):
+            started = time.perf_counter()
+            self.populate(path, size, seed)
+            print(f"{size:>9} подготовка данных: {time.perf_counter() - started:.1f} с", file=sys.stderr)
+        db = Database(path)
+        try:
+            self.bench_reads(db, size)
+            self.bench_dishes(db, size)
+            self.bench_trees(db, size)
+            self.bench_writes(db, size)
+            self.bench_orders(db, size)
+        finally:
+            db.close()
+            if keep_dir is None:
+                for name in os.listdir(directory):
+                    os.remove(os.path.join(directory, name))
+                os.rmdir(directory)
+
+    def bench_reads(self, db, size):
+        for table_name in ("dishes", "reservations", "staff", "ingredients"):
+            self.run(f"fetch_all:{table_name}", size, lambda: len(db.fetch_all(table_name)))
+            self.run(f"fetch_page:{table_name}:first", size,
+                     lambda: len(db.fetch_page(table_name, limit=200)))
+        evening = parse_reservation_date("2024-01-01 18:00")  # первый день расписания datagen
+        self.run("free_tables", size, lambda: len(db.free_tables(evening, 120, 2)))
+
+    def bench_dishes(self, db, size):
+        filters = {"all": None, "one": [VALID_CATEGORIES[0]], "three": list(VALID_CATEGORIES[:3])}
+        for cache in ("cold", "warm"):
+            for order_by in Database.DISH_SORT_COLUMNS:
+                for ascending in (True, False):
+                    for filter_name, category_filter in filters.items():
+                        def action():
+                            if cache == "cold":
+                                db.invalidate_caches("dishes")
+                            else:
+                                db.warm_dish_cache()
+                            return len(db.fetch_all_dishes(order_by, ascending, category_filter))
+
+                        direction = "asc" if ascending else "desc"
+                        self.run(f"fetch_all_dishes:{cache}:{order_by}:{direction}:{filter_name}", size, action)
+        db.invalidate_caches("dishes")
+        self.run("warm_dish_cache", size, lambda: db.invalidate_caches("dishes") or len(db.warm_dish_cache().rows))
+        for text in ("суп", "салат с", "крем-суп по"):
+            self.run(f"search_dishes:{text}", size, lambda: len(db.search_dishes(text)))
+
+    def bench_trees(self, db, size):
+        from main import PagedTreeview
+        update = getattr(self.tree_factory, "update", lambda: None)
+
+        def paged(table_name, pages):
+            def action():
+                tree = self.tree_factory()
+                view = PagedTreeview(tree, lambda after, limit, deliver: deliver(
+                    db.fetch_page(table_name, after=after, limit=limit)), lambda row: (row[0], row[0]))
+                # Прокрутку имитируем сами: вызовы из yscrollcommand исказили бы замер
+                tree.configure(yscrollcommand="")
+                view.reset()
+                for _ in range(pages - 1):
+                    view.load_next()
+                update()
+                loaded = sum(len(page[1]) for page in view.pages) + len(view.dropped_above) * view.page_size
+                if hasattr(tree, "destroy"):
+                    tree.destroy()
+                return loaded
+            return action
+
+        def full(table_name):
+            # Прежний способ: все строки таблицы разом в дерево
+            def action():
+                tree = self.tree_factory()
+                rows = db.fetch_all(table_name)
+                for row in rows:
+                    tree.insert("", "end", values=row)
+                update()
+                if hasattr(tree, "destroy"):
+                    tree.destroy()
+                return len(rows)
+            return action
+
+        for table_name in ("dishes", "reservations", "staff", "ingredients"):
+            self.run(f"tree:{table_name}:first_page", size, paged(table_name, 1))
+            self.run(f"tree:{table_name}:scroll_20_pages", size, paged(table_name, 20))
+            if size <= 100000:
+                self.run(f"tree:{table_name}:full_populate", size, full(table_name), repeat=1)
+
+    def bench_writes(self, db, size):
+        ids = []
+
+        def add():
+            ids.clear()
+            for number in range(WRITE_OPS):
+                ids.append(db.add_record("dishes", (f"Блюдо {number}", "", "", 100.0, "Супы"))[0])
+            return WRITE_OPS
+
+        def update():
+            for record_id in ids:
+                db.update_record("dishes", {"id": record_id, "name": "Новое", "description": "", "ingredients": "",
+                                            "price": 150.0, "category": "Десерты"})
+            return len(ids)
+
+        def delete():
+            for record_id in ids:
+                db.delete_record("dishes", record_id)
+            return len(ids)
+
+        for name, action in (("add_record", add), ("update_record", update), ("delete_record", delete)):
+            self.run(f"{name}:dishes", size, action, repeat=1)
+
+    def bench_orders(self, db, size, seed=42):
+        # Устойчивая скорость приёма заказов: позиции на 1-4 блюда, списание со склада по рецептам
+        rng = random.Random(seed)
+        dish_ids = [row[0] for row in db.cursor.execute("SELECT id FROM dishes").fetchall()]
+        orders = [{"table_number": rng.randint(1, datagen.TABLE_COUNT),
+                   "items": [(rng.choice(dish_ids), rng.randint(1, 3)) for _ in range(rng.randint(1, 4))]}
+                  for _ in range(ORDER_COUNT)]
+        lines = sum(len(order["items"]) for order in orders)
+
+        def ingest(stock, batch_size):
+            def action():
+                db.cursor.execute("UPDATE ingredients SET quantity = ?", (stock,))
+                ingest = OrderIngest(db, batch_size=batch_size, max_delay=60)
+                for order in orders:
+                    ingest.submit(order)
+                ingest.flush()
+                return lines
+            return action
+
+        for batch_size in (1, 100):
+            self.run(f"orders:ingest:batch_{batch_size}:lines", size, ingest(10 ** 9, batch_size), repeat=1)
+        self.run("orders:ingest:batch_100:rejected", size, ingest(0, 100), repeat=1)
+
+def parse_sizes(text):
+    return [datagen.parse_count(part) for part in text.split(",") if part.strip()]
+
+def compare(results, previous, threshold):
+    # Сравнение по (name, size); замедление больше threshold раз считается регрессией
+    old = {(item["name"], item["size"]): item for item in previous["results"]}
+    regressions = []
+    for item in results:
+        before = old.get((item["name"], item["size"]))
+        if not before or not before["min_s"]:
+            continue
+        ratio = item["min_s"] / before["min_s"]
+        marker = "  РЕГРЕССИЯ" if ratio > threshold else ""
+        print(f"{item['size']:>9} {item['name']:<48} {ratio:6.2f}x{marker}")
+        if marker:
+            regressions.append(item)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности restaurant-app")
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes(DEFAULT_SIZES),
+                        help="строк на таблицу через запятую, например 1k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="куда записать результаты (JSON), по умолчанию stdout")
+    parser.add_argument("--compare", help="файл предыдущих результатов для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="порог регрессии, во сколько раз медленнее")
+    parser.add_argument("--data-dir", help="каталог для баз с данными (сохраняются между прогонами)")
+    parser.add_argument("--headless", action="store_true", help="не использовать Tk даже при наличии дисплея")
+    args = parser.parse_args(argv)
+
+    tree_factory, display = (HeadlessTree, "headless") if args.headless else make_tree_factory()
+    bench = Bench(args.repeat, tree_factory, display)
+    for size in args.sizes:
+        bench.run_size(size, args.seed, args.data_dir)
+
+    report = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "display": display,
+                 "seed": args.seed, "repeat": args.repeat},
+        "results": bench.results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(bench.results, json.load(file), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+from availability import DEFAULT_DURATION, AvailabilityEngine, parse_reservation_date
+from database import Database, VALID_CATEGORIES
+
+# Пакетная загрузка меню, остатков, персонала и бронирований из CSV или JSON Lines.
+# Файл читается потоком, строки проверяются и пишутся пачками через executemany,
+# каждая пачка - одна транзакция.
+
+def text(value):
+    value = "" if value is None else str(value).strip()
+    if not value:
+        raise ValueError("пустое значение")
+    return value
+
+def optional_text(value):
+    return None if value is None or str(value).strip() == "" else str(value).strip()
+
+def non_negative(convert):
+    def check(value):
+        number = convert(str(value).strip().replace(",", "."))
+        if number < 0:
+            raise ValueError("отрицательное значение")
+        return number
+    return check
+
+def positive_int(value):
+    number = int(str(value).strip())
+    if number <= 0:
+        raise ValueError("должно быть больше нуля")
+    return number
+
+def category(value):
+    value = text(value)
+    if value not in VALID_CATEGORIES:
+        raise ValueError(f"неизвестная категория {value!r}")
+    return value
+
+def hire_date(value):
+    value = text(value)
+    datetime.strptime(value, "%Y-%m-%d")
+    return value
+
+def reservation_date(value):
+    value = text(value)
+    parse_reservation_date(value)
+    return value
+
+def reorder_level(value):
+    return 0 if optional_text(value) is None else non_negative(float)(value)
+
+def duration(value):
+    return DEFAULT_DURATION if optional_text(value) is None else positive_int(value)
+
+# Таблица -> [(колонка, преобразование и проверка значения), ...]
+IMPORT_COLUMNS = {
+    "dishes": [("name", text), ("description", optional_text), ("ingredients", optional_text),
+               ("price", non_negative(float)), ("category", category)],
+    "ingredients": [("name", text), ("quantity", non_negative(float)), ("unit", text), ("reorder_level", reorder_level)],
+    "staff": [("name", text), ("position", text), ("salary", non_negative(float)), ("hire_date", hire_date)],
+    "reservations": [("customer_name", text), ("reservation_date", reservation_date),
+                     ("number_of_guests", positive_int), ("table_number", positive_int),
+                     ("duration_minutes", duration)],
+}
+
+class ImportReport:
+    MAX_KEPT_REJECTS = 1000  # отклонённые строки сверх этого только считаются
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.imported = 0
+        self.rejected = 0
+        self.rejects = []  # [(номер строки, причина, исходная строка), ...]
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, line_number, reason, raw):
+        self.rejected += 1
+        if len(self.rejects) < self.MAX_KEPT_REJECTS:
+            self.rejects.append((line_number, reason, raw))
+
+    @property
+    def rows_per_second(self):
+        return (self.imported + self.rejected) / self.seconds if self.seconds else 0.0
+
+    def summary(self):
+        return (f"{self.table_name}: загружено {self.imported}, отклонено {self.rejected}, "
+                f"{self.seconds:.2f} с, {self.rows_per_second:.0f} строк/с")
+
+def read_rows(path, file_format=None):
+    # Поток словарей (номер строки, запись) из CSV или JSON Lines
+    file_format = file_format or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_number, error
+                    continue
+                yield line_number, record if isinstance(record, dict) else ValueError("ожидается JSON-объект")
+
+def validate(table_name, raw):
+    if isinstance(raw, Exception):
+        raise ValueError(str(raw))
+    values = []
+    for column, convert in IMPORT_COLUMNS[table_name]:
+        try:
+            values.append(convert(raw.get(column)))
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"{column}: {error}") from None
+    return tuple(values)
+
+def import_rows(db, table_name, rows, batch_size=1000, on_progress=None):
+    # rows - итератор (номер строки, словарь значений); возвращает ImportReport
+    if table_name not in IMPORT_COLUMNS:
+        raise ValueError(f"Загрузка в таблицу {table_name} не поддерживается")
+    columns = [column for column, _ in IMPORT_COLUMNS[table_name]]
+    report = ImportReport(table_name)
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        # Брони проверяются на пересечения и с базой, и с уже принятыми строками пакета.
+        # Проверка по базе идёт в транзакции записи пакета: брони других терминалов,
+        # сделанные во время загрузки, в неё попадают
+        with db.transaction():
+            accepted = AvailabilityEngine([]) if table_name == "reservations" else None
+            records = []
+            for line_number, raw in batch:
+                try:
+                    record = validate(table_name, raw)
+                    if accepted is not None:
+                        start = parse_reservation_date(record[1])
+                        conflicts = (db.reservation_conflicts(record[3], start, record[4]) +
+                                     accepted.conflicts(record[3], start, record[4]))
+                        if conflicts:
+                            raise ValueError(f"стол {record[3]} занят: {', '.join(map(str, conflicts))}")
+                        accepted.add(f"строка {line_number}", record[3], start, record[4])
+                except ValueError as error:
+                    report.reject(line_number, str(error), raw)
+                    continue
+                records.append(record)
+            if records:
+                db.add_records(table_name, columns, records)
+                report.imported += len(records)
+        report.seconds = time.perf_counter() - report.started
+        if on_progress:
+            on_progress(report)
+    if table_name == "ingredients" and report.imported:
+        db.sync_recipes()  # новые позиции склада могли упоминаться в составе блюд
+    report.seconds = time.perf_counter() - report.started
+    return report
+
+def import_file(db, table_name, path, file_format=None, batch_size=1000, on_progress=None):
+    return import_rows(db, table_name, read_rows(path, file_format), batch_size, on_progress)
+
+def write_rejects(report, path):
+    with open(path, "w", encoding="utf-8") as file:
+        for line_number, reason, raw in report.rejects:
+            raw = raw if isinstance(raw, dict) else str(raw)
+            file.write(json.dumps({"line": line_number, "reason": reason, "row": raw}, ensure_ascii=False) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная загрузка данных в restaurant.db")
+    parser.add_argument("table", choices=sorted(IMPORT_COLUMNS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--rejects", help="куда записать отклонённые строки (JSON Lines)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        parser.error(f"файл {args.path} не найден")
+    db = Database(args.db)
+    report = import_file(db, args.table, args.path, args.format, args.batch_size,
+                         on_progress=lambda progress: print(progress.summary(), file=sys.stderr))
+    print(report.summary())
+    for line_number, reason, _ in report.rejects[:20]:
+        print(f"  строка {line_number}: {reason}")
+    if report.rejected > 20:
+        print(f"  ... и ещё {report.rejected - 20}")
+    if args.rejects:
+        write_rejects(report, args.rejects)
+    db.close()
+    return 0 if report.rejected == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import METRICS, install_tracing
+
+# Ошибки SQLite, при которых запрос имеет смысл повторить: другой терминал держит блокировку
+BUSY_MESSAGES = ("database is locked", "database table is locked", "database is busy")
+
+def is_busy_error(error):
+    return isinstance(error, sqlite3.OperationalError) and any(message in str(error) for message in BUSY_MESSAGES)
+
+class ConnectionStats:
+    def __init__(self, role):
+        self.role = role
+        self.statements = 0
+        self.retries = 0
+        self.busy_errors = 0  # запросы, так и не выполненные после всех повторов
+        self.total_time = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, duration, retries, failed_busy=False):
+        with self.lock:
+            self.statements += 1
+            self.retries += retries
+            self.busy_errors += failed_busy
+            self.total_time += duration
+
+    def snapshot(self):
+        with self.lock:
+            return {"role": self.role, "statements": self.statements, "retries": self.retries,
+                    "busy_errors": self.busy_errors, "total_time": round(self.total_time, 6)}
+
+class ManagedCursor(sqlite3.Cursor):
+    # Курсор, который повторяет запрос при занятой базе и ведёт статистику соединения.
+    # Время запроса в метриках - выполнение плюс чтение строк через fetch*; запрос
+    # считается законченным, когда строки кончились или курсор выполняет следующий
+    query = None  # [SQL, секунды, строк, шагов VM и программ на начало] запроса, строки которого ещё читаются
+
+    def execute(self, sql, parameters=()):
+        return self._track(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._track(sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._track(sql_script, super().executescript, sql_script)
+
+    def fetchone(self):
+        row = self._fetch(super().fetchone)
+        if row is None:
+            self.finish_query()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._fetch(super().fetchmany, size)
+        if len(rows) < size:
+            self.finish_query()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(super().fetchall)
+        self.finish_query()
+        return rows
+
+    def close(self):
+        self.finish_query()
+        super().close()
+
+    def finish_query(self):
+        if self.query is not None:
+            sql, seconds, rows, steps, programs = self.query
+            self.query = None
+            connection = self.connection
+            METRICS.record_query(sql, seconds, rows, connection.stats.role, connection.steps - steps,
+                                 connection.programs - programs)
+
+    def _track(self, sql, method, *args):
+        self.finish_query()
+        steps, programs = self.connection.steps, self.connection.programs
+        started = time.perf_counter()
+        result = self.connection.run_with_retry(method, *args)
+        self.query = [sql, time.perf_counter() - started, max(self.rowcount, 0), steps, programs]
+        if self.description is None:
+            self.finish_query()  # не SELECT - читать нечего
+        return result
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self.query is not None:
+            self.query[1] += time.perf_counter() - started
+            self.query[2] += (result is not None) if not isinstance(result, list) else len(result)
+        return result
+
+class ManagedConnection(sqlite3.Connection):
+    retries = 5
+    retry_delay = 0.05
+    stats = None
+    # Шаги виртуальной машины SQLite и выполненные программы (оператор, триггеры), если включена
+    # трассировка (metrics.install_tracing)
+    steps = 0
+    programs = 0
+
+    def cursor(self, factory=ManagedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def run_with_retry(self, method, *args):
+        # busy_timeout уже ждёт внутри SQLite; сюда доходят случаи, когда ожидание не помогло.
+        # Повторяем с экспоненциальной задержкой и случайным разбросом, чтобы терминалы не совпадали
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                result = method(*args)
+            except sqlite3.OperationalError as error:
+                if not is_busy_error(error) or attempt >= self.retries:
+                    self.stats.record(time.perf_counter() - started, attempt, is_busy_error(error))
+                    raise
+                time.sleep(self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5))
+                attempt += 1
+                continue
+            self.stats.record(time.perf_counter() - started, attempt)
+            return result
+
+class ConnectionManager:
+    # Соединения одного процесса с общей базой restaurant.db, к которой подключено несколько терминалов.
+    # WAL позволяет читать во время записи; запись идёт через отдельное соединение
+    # и явные транзакции BEGIN IMMEDIATE, чтения - через соединение только для чтения.
+    def __init__(self, path="restaurant.db", busy_timeout_ms=5000, synchronous="NORMAL", retries=5, retry_delay=0.05):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.writer = self.open("writer")
+        self.reader = self.open("reader")
+
+    def open(self, role):
+        # isolation_level=None: без неявных BEGIN, каждая одиночная команда - своя транзакция,
+        # составные изменения оборачиваются в transaction()
+        # cached_statements: запросы из реестра repositories.STATEMENTS разбираются один раз на соединение
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None,
+                                     factory=ManagedConnection, cached_statements=256)
+        connection.retries = self.retries
+        connection.retry_delay = self.retry_delay
+        connection.stats = ConnectionStats(role)
+        install_tracing(connection)
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if role == "writer":
+            connection.execute("PRAGMA journal_mode = WAL")
+        else:
+            connection.execute("PRAGMA query_only = 1")
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE сразу берёт блокировку записи: ожидание случается на входе,
+        # а не посреди транзакции, где SQLite вернул бы BUSY без ожидания
+        if self.writer.in_transaction:
+            yield self.writer  # вложенный вызов - работаем в уже открытой транзакции
+            return
+        self.writer.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.writer
+        except BaseException:
+            if self.writer.in_transaction:
+                self.writer.execute("ROLLBACK")
+            raise
+        self.writer.execute("COMMIT")
+
+    def stats(self):
+        return [self.writer.stats.snapshot(), self.reader.stats.snapshot()]
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
@@ -0,0 +1,1072 @@
+import sqlite3
+import bisect
+import json
+import re
+import time
+
+from analytics import create_summary_tables, rebuild_summaries
+from archive import HISTORY_VIEWS, MAINTENANCE_GUARD, attach_archive, create_maintenance_table
+from availability import AvailabilityEngine, DEFAULT_DURATION, ReservationConflict, format_timestamp, parse_reservation_date, wall_clock_now
+from connection import ConnectionManager
+from metrics import timed_methods
+from orders import create_order_tables
+from payroll import check_shift, compute_payroll, create_shift_tables, shift_groups
+from recipes import IngredientMatcher, default_portion, max_portions, stem, to_stock_units
+from repositories import NULLABLE, ROW_TYPES, STATEMENTS, Dish, Repository, sort_expression
+from repricing import apply_rule, create_price_tables, preview, undo_batch
+from seating import DEFAULT_TABLE_CAPACITY, plan_seating
+
+# Список допустимых категорий блюд
+VALID_CATEGORIES = ("Закуска", "Супы", "Основное блюдо", "Десерты", "Напитки")
+
+class Database:
+    TABLES = tuple(ROW_TYPES)
+    DISH_COLUMNS = Dish._fields
+    DISH_SORT_COLUMNS = ("id", "name", "price", "category")
+    # Версия схемы в PRAGMA user_version: увеличивается при каждом изменении create_tables,
+    # чтобы уже обновлённая база открывалась без DDL и проверок миграций
+    SCHEMA_VERSION = 8
+    CHANGE_POLL_LIMIT = 5000  # больше изменений за один опрос - дешевле перечитать списки целиком
+
+    def __init__(self, path="restaurant.db", location=None, **connection_options):
+        # Записи идут через self.cursor, чтения - через self.read_cursor (отдельное соединение, WAL)
+        started = time.perf_counter()
+        self.location = location  # точка сети (locations.Location), если база открыта по списку точек
+        self.manager = ConnectionManager(path, **connection_options)
+        self.connection = self.manager.writer
+        self.cursor = self.connection.cursor()
+        self.read_connection = self.manager.reader
+        self.read_cursor = self.read_connection.cursor()
+        # Репозитории таблиц: строки - именованные кортежи, SQL - из STATEMENTS
+        self.repositories = {table_name: Repository(self, table_name) for table_name in self.TABLES}
+        self.users = self.repositories["users"]
+        self.dishes = self.repositories["dishes"]
+        self.reservations = self.repositories["reservations"]
+        self.staff = self.repositories["staff"]
+        self.ingredients = self.repositories["ingredients"]
+        self.dish_cache = None
+        self.availability = None
+        self.portions = None  # (PRAGMA data_version, {id блюда: порций})
+        self.matcher = None  # (версия названий склада, IngredientMatcher, {id ингредиента: единица})
+        self.writer_version = None  # PRAGMA data_version соединения записи при последней проверке кэшей
+        self.change_version = None  # последняя просмотренная версия change_log
+        self.change_data_version = None  # PRAGMA data_version соединения чтения при последнем опросе
+        self.fts_enabled = False
+        self.archive_path = None  # файл архива, если он подключён (attach_archive)
+        # Время открытия по этапам [(этап, секунды), ...] для отчёта о запуске
+        self.startup_timings = [("соединения", time.perf_counter() - started)]
+        started = time.perf_counter()
+        if self.cursor.execute("PRAGMA user_version").fetchone()[0] == self.SCHEMA_VERSION:
+            self.fts_enabled = self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='dishes_fts'").fetchone() is not None
+            if not self.fts_enabled:
+                self.register_search_functions()
+            self.startup_timings.append(("схема актуальна, DDL пропущен", time.perf_counter() - started))
+            return
+        # Схема и начальные пользователи создаются одной транзакцией, чтобы терминалы,
+        # запущенные одновременно, не мешали друг другу
+        with self.transaction():
+            self.create_tables()
+            self.setup_initial_users()
+            self.cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        self.startup_timings.append(("создание и миграции схемы", time.perf_counter() - started))
+
+    def transaction(self):
+        return self.manager.transaction()
+
+    def connection_stats(self):
+        return self.manager.stats()
+
+    def close(self):
+        self.manager.close()
+
+    def create_tables(self):
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    role TEXT NOT NULL
+                )
+            ''')
+
+        # Таблица для блюд
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS dishes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    description TEXT,
+                    ingredients TEXT,
+                    price REAL NOT NULL,
+                    category TEXT
+                )
+            ''')
+
+        # Таблица для бронирований
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reservations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    customer_name TEXT NOT NULL,
+                    reservation_date TEXT NOT NULL,
+                    number_of_guests INTEGER NOT NULL,
+                    table_number INTEGER NOT NULL
+                )
+            ''')
+
+        # Таблица для персонала
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS staff (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    position TEXT NOT NULL,
+                    salary REAL NOT NULL,
+                    hire_date TEXT NOT NULL
+                )
+            ''')
+
+        # Таблица для остатков продуктов
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ingredients (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    unit TEXT NOT NULL
+                )
+            ''')
+
+        # Индексы под сортировку и фильтр списка блюд, пока кэш блюд не прогрет
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_dishes_name ON dishes (name, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_dishes_price ON dishes (price, id)")
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_dishes_category ON dishes (IFNULL(category, ''), id)")
+        self.create_search_index()
+        self.migrate_reservations()
+        self.migrate_recipes()
+        self.migrate_stock_alerts()
+        create_maintenance_table(self.cursor)
+        self.migrate_change_log()
+        self.migrate_tables()
+        create_order_tables(self.cursor)
+        create_summary_tables(self.cursor)
+        create_shift_tables(self.cursor)
+        create_price_tables(self.cursor)
+
+    def migrate_reservations(self):
+        # Типизированное время брони: start_at (секунды от эпохи) заполняется триггерами
+        # из reservation_date, длительность хранится в минутах
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(reservations)")]
+        if "duration_minutes" not in columns:
+            self.cursor.execute(
+                f"ALTER TABLE reservations ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT {DEFAULT_DURATION}")
+        if "start_at" not in columns:
+            self.cursor.execute("ALTER TABLE reservations ADD COLUMN start_at INTEGER")
+            self.cursor.execute("UPDATE reservations SET start_at = CAST(strftime('%s', reservation_date) AS INTEGER)")
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS reservations_start_insert AFTER INSERT ON reservations BEGIN
+                    UPDATE reservations SET start_at = CAST(strftime('%s', new.reservation_date) AS INTEGER)
+                    WHERE id = new.id;
+                END
+            ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS reservations_start_update AFTER UPDATE OF reservation_date ON reservations BEGIN
+                    UPDATE reservations SET start_at = CAST(strftime('%s', new.reservation_date) AS INTEGER)
+                    WHERE id = new.id;
+                END
+            ''')
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reservations_table_start ON reservations (table_number, start_at)")
+
+    def migrate_recipes(self):
+        # Рецепты: сколько каждого ингредиента со склада уходит на порцию блюда.
+        # При первом запуске связи строятся из текстового списка dishes.ingredients
+        exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='dish_ingredients'").fetchone()
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS dish_ingredients (
+                    dish_id INTEGER NOT NULL,
+                    ingredient_id INTEGER NOT NULL,
+                    quantity REAL NOT NULL,
+                    unit TEXT,
+                    PRIMARY KEY (dish_id, ingredient_id)
+                )
+            ''')
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dish_ingredients_ingredient ON dish_ingredients (ingredient_id)")
+        # Версия названий и единиц склада: по ней sync_recipes видит, что сопоставитель
+        # ингредиентов устарел, в том числе после правок с другого терминала. Версия случайная,
+        # чтобы после отката транзакции следующая правка не повторила уже виденный номер;
+        # previous - версия до последней правки
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS stock_names_version (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL,
+                    previous INTEGER
+                )
+            ''')
+        self.cursor.execute("INSERT OR IGNORE INTO stock_names_version (id, version) VALUES (1, random())")
+        for name, event in (("insert", "INSERT"), ("update", "UPDATE OF name, unit"), ("delete", "DELETE")):
+            self.cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS ingredients_names_{name} AFTER {event} ON ingredients BEGIN
+                        UPDATE stock_names_version SET previous = version, version = random();
+                    END
+                ''')
+        # Внешние ключи в SQLite по умолчанию выключены, связи удалённых записей чистят триггеры
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS dishes_recipe_delete AFTER DELETE ON dishes BEGIN
+                    DELETE FROM dish_ingredients WHERE dish_id = old.id;
+                END
+            ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS ingredients_recipe_delete AFTER DELETE ON ingredients BEGIN
+                    DELETE FROM dish_ingredients WHERE ingredient_id = old.id;
+                END
+            ''')
+        if not exists:
+            self.sync_recipes()
+
+    def migrate_stock_alerts(self):
+        # Порог дозаказа по каждому ингредиенту и список заканчивающихся позиций low_stock.
+        # Список ведут триггеры при каждом изменении остатка, поэтому проверка стоит
+        # O(число тревог), а не просмотр всего склада
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(ingredients)")]
+        if "reorder_level" not in columns:
+            self.cursor.execute("ALTER TABLE ingredients ADD COLUMN reorder_level REAL NOT NULL DEFAULT 0")
+        exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='low_stock'").fetchone()
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS low_stock (
+                    ingredient_id INTEGER PRIMARY KEY,
+                    quantity REAL NOT NULL,
+                    reorder_level REAL NOT NULL,
+                    since TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')),
+                    alerted INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+        # Позиция попадает в список, когда остаток опускается до порога (при пороге 0 - когда кончилась)
+        for name, event in (("ingredients_low_stock_insert", "INSERT"),
+                            ("ingredients_low_stock_update", "UPDATE OF quantity, reorder_level")):
+            self.cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON ingredients
+                    WHEN new.quantity <= new.reorder_level BEGIN
+                        INSERT INTO low_stock (ingredient_id, quantity, reorder_level)
+                        VALUES (new.id, new.quantity, new.reorder_level)
+                        ON CONFLICT (ingredient_id) DO UPDATE
+                        SET quantity = excluded.quantity, reorder_level = excluded.reorder_level;
+                    END
+                ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS ingredients_low_stock_clear AFTER UPDATE OF quantity, reorder_level ON ingredients
+                WHEN new.quantity > new.reorder_level AND old.quantity <= old.reorder_level BEGIN
+                    DELETE FROM low_stock WHERE ingredient_id = new.id;
+                END
+            ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS ingredients_low_stock_delete AFTER DELETE ON ingredients BEGIN
+                    DELETE FROM low_stock WHERE ingredient_id = old.id;
+                END
+            ''')
+        if not exists:
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO low_stock (ingredient_id, quantity, reorder_level)
+                SELECT id, quantity, reorder_level FROM ingredients WHERE quantity <= reorder_level
+            ''')
+
+    def migrate_tables(self):
+        # Столы зала: вместимость и соседние столы, которые можно сдвинуть для большой компании.
+        # Бронь занимает reservations.table_number и, если столы сдвинуты, ещё столы из
+        # reservation_tables; ручной перенос брони сдвинутые столы освобождает
+        exists = self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tables'").fetchone()
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tables (
+                    number INTEGER PRIMARY KEY,
+                    capacity INTEGER NOT NULL CHECK (capacity > 0)
+                )
+            ''')
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS table_neighbours (
+                    table_number INTEGER NOT NULL,
+                    neighbour INTEGER NOT NULL,
+                    PRIMARY KEY (table_number, neighbour)
+                )
+            ''')
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS reservation_tables (
+                    reservation_id INTEGER NOT NULL,
+                    table_number INTEGER NOT NULL,
+                    PRIMARY KEY (reservation_id, table_number)
+                )
+            ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_start ON reservations (start_at)")
+        # Конец брони: движок занятости загружает только не закончившиеся брони
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reservations_end ON reservations (start_at + duration_minutes * 60)")
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS reservations_joined_reset
+                AFTER UPDATE OF table_number, reservation_date, duration_minutes ON reservations
+                WHEN new.table_number IS NOT old.table_number OR new.reservation_date IS NOT old.reservation_date
+                    OR new.duration_minutes IS NOT old.duration_minutes
+                BEGIN
+                    DELETE FROM reservation_tables WHERE reservation_id = new.id;
+                END
+            ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS reservations_joined_delete AFTER DELETE ON reservations BEGIN
+                    DELETE FROM reservation_tables WHERE reservation_id = old.id;
+                END
+            ''')
+        if not exists:
+            # Столы, которые уже встречаются в бронях (или 10 столов в пустой базе), по соседству номеров
+            numbers = [row[0] for row in self.cursor.execute(
+                "SELECT DISTINCT table_number FROM reservations WHERE table_number > 0 ORDER BY 1")]
+            numbers = numbers or list(range(1, 11))
+            self.cursor.executemany("INSERT INTO tables (number, capacity) VALUES (?, ?)",
+                                    [(number, DEFAULT_TABLE_CAPACITY) for number in numbers])
+            pairs = [(a, b) for a, b in zip(numbers, numbers[1:]) if b == a + 1]
+            self.cursor.executemany("INSERT INTO table_neighbours (table_number, neighbour) VALUES (?, ?)",
+                                    pairs + [(b, a) for a, b in pairs])
+
+    def migrate_change_log(self):
+        # Журнал изменений для синхронизации терминалов: одна строка на запись таблицы,
+        # при каждом изменении записи её строка получает новую наибольшую версию.
+        # Так журнал не растёт от повторных правок, а опрос "что изменилось после версии N"
+        # идёт по первичному ключу
+        self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS change_log (
+                    version INTEGER PRIMARY KEY,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    operation TEXT NOT NULL,
+                    UNIQUE (table_name, row_id)
+                )
+            ''')
+        # Перенос в архив (archive.py) удалением не считается: терминалы показывают
+        # предстоящие брони, а архивные строки в их списки не попадают
+        for table_name in self.TABLES:
+            self.cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}_change_delete")
+            for event, operation, row, condition in (("INSERT", "insert", "new", ""), ("UPDATE", "update", "new", ""),
+                                                     ("DELETE", "delete", "old", f" WHEN {MAINTENANCE_GUARD}")):
+                self.cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS {table_name}_change_{operation} AFTER {event} ON {table_name}{condition} BEGIN
+                            INSERT INTO change_log (version, table_name, row_id, operation)
+                            VALUES ((SELECT IFNULL(MAX(version), 0) + 1 FROM change_log), '{table_name}', {row}.id, '{operation}')
+                            ON CONFLICT (table_name, row_id) DO UPDATE
+                            SET version = excluded.version, operation = excluded.operation;
+                        END
+                    ''')
+
+    def create_search_index(self):
+        # Полнотекстовый индекс по блюдам (FTS5). unicode61 сам приводит регистр кириллицы,
+        # а ё заменяем на е и при индексации, и в запросе. Индекс поддерживают триггеры.
+        exists = self.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='dishes_fts'").fetchone()
+        if exists:
+            self.fts_enabled = True
+            return
+        try:
+            self.cursor.execute('''
+                    CREATE VIRTUAL TABLE dishes_fts USING fts5 (
+                        name, description, ingredients,
+                        tokenize='unicode61 remove_diacritics 2',
+                        prefix='2 3'
+                    )
+                ''')
+        except sqlite3.OperationalError:
+            # SQLite собран без FTS5 - поиск будет работать через LIKE
+            self.fts_enabled = False
+            self.register_search_functions()
+            return
+        self.fts_enabled = True
+        fields = ", ".join(f"{SEARCH_NORMALIZE_SQL.format(f'new.{column}')}"
+                           for column in ("name", "description", "ingredients"))
+        self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS dishes_fts_insert AFTER INSERT ON dishes BEGIN
+                    INSERT INTO dishes_fts (rowid, name, description, ingredients) VALUES (new.id, {fields});
+                END
+            ''')
+        self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS dishes_fts_delete AFTER DELETE ON dishes BEGIN
+                    DELETE FROM dishes_fts WHERE rowid = old.id;
+                END
+            ''')
+        self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS dishes_fts_update AFTER UPDATE OF name, description, ingredients ON dishes BEGIN
+                    DELETE FROM dishes_fts WHERE rowid = old.id;
+                    INSERT INTO dishes_fts (rowid, name, description, ingredients) VALUES (new.id, {fields});
+                END
+            ''')
+        columns = ", ".join(SEARCH_NORMALIZE_SQL.format(column) for column in ("name", "description", "ingredients"))
+        self.cursor.execute(f"INSERT INTO dishes_fts (rowid, name, description, ingredients) SELECT id, {columns} FROM dishes")
+
+    def register_search_functions(self):
+        # Без FTS5 поиск идёт через LIKE по тексту, нормализованному этой функцией
+        for connection in (self.connection, self.read_connection):
+            connection.create_function("normalize_search_text", 1,
+                                       lambda value: normalize_search_text(value) if value else value)
+
+    def setup_initial_users(self):
+        self.cursor.execute("SELECT COUNT(*) FROM users")
+        count = self.cursor.fetchone()[0]
+        if count == 0:
+            # Добавляем админа и обычного пользователя
+            self.add_user("admin", "admin", "admin")
+            self.add_user("user", "user", "user")
+
+    def add_user(self, username, password, role):
+        self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
+
+    def fetch_user(self, username, password):
+        return self.users.query(("login",), (username, password)).fetchone()
+
+    def repository(self, table_name):
+        if table_name not in self.repositories:
+            raise ValueError(f"Неизвестная таблица: {table_name}")
+        return self.repositories[table_name]
+
+    def fetch_all(self, table_name):
+        return self.repository(table_name).all()
+
+    def fetch_record(self, table_name, record_id):
+        return self.repository(table_name).get(record_id)
+
+    def iter_rows(self, table_name, order_by="id", ascending=True, row_filter=None, arraysize=1000):
+        # Генератор строк таблицы для выгрузок: сортировка и фильтр выполняются в SQLite,
+        # в памяти одновременно не больше arraysize строк
+        return self.repository(table_name).iterate(order_by, ascending, row_filter, arraysize)
+
+    def count_rows(self, table_name, row_filter=None):
+        return self.repository(table_name).count(row_filter)
+
+    def attach_archive(self, path=None):
+        # Подключает архив истории; после этого читается представление reservations_history
+        self.archive_path = attach_archive(self, path)
+        for view_name in HISTORY_VIEWS:
+            self.repositories.setdefault(view_name, Repository(self, view_name))
+        return self.archive_path
+
+    # Методы изменения возвращают затронутую строку, чтобы вкладки обновляли только её
+    def add_record(self, table_name, record):
+        # Значения идут по порядку колонок после id; не переданные колонки получают значения по умолчанию
+        repository = self.repository(table_name)
+        with self.transaction():
+            record_id = repository.add(record)
+            if table_name == "dishes":
+                self.sync_recipes([record_id])
+            elif table_name == "ingredients":
+                self.sync_ingredient(record_id)
+        self.invalidate_caches(table_name, [record_id])
+        return self.fetch_record(table_name, record_id)
+
+    def add_records(self, table_name, columns, records):
+        # Пакетная вставка: один executemany в одной транзакции
+        repository = self.repository(table_name)
+        with self.transaction():
+            last_id = repository.max_id()
+            count = repository.add_many(columns, records)
+            if table_name == "dishes":
+                # Рецепты только для новых блюд; после загрузки склада связи перестраивает sync_recipes()
+                self.sync_recipes(after_id=last_id)
+        self.invalidate_caches(table_name)
+        return count
+
+    def update_record(self, table_name, record):
+        record_id = record.pop('id')
+        repository = self.repository(table_name)
+        with self.transaction():
+            repository.update(record_id, record)
+            if table_name == "dishes" and "ingredients" in record:
+                self.sync_recipes([record_id])
+            elif table_name == "ingredients" and "name" in record:
+                self.sync_ingredient(record_id)
+        self.invalidate_caches(table_name, [record_id])
+        return self.fetch_record(table_name, record_id)
+
+    def delete_record(self, table_name, record_id):
+        deleted = self.repository(table_name).delete(record_id)
+        self.invalidate_caches(table_name, [record_id])
+        return record_id if deleted else None
+
+    def fetch_all_dishes(self, order_by="id", ascending=True, category_filter=None):
+        category_filter = category_filter or None
+        if self.dish_cache is not None:
+            return self.dish_cache.page(order_by, ascending, None, None, category_filter)
+        return self.fetch_page("dishes", order_by, ascending, None, -1, category_filter)
+
+    def warm_dish_cache(self):
+        # Прогрев кэша блюд: после этого сортировка и фильтр по категориям не ходят в базу
+        if self.dish_cache is None:
+            columns = [name for name, _ in self.table_columns("dishes")]
+            self.dish_cache = DishCache(self.fetch_all("dishes"), columns)
+            for order_by in self.DISH_SORT_COLUMNS:
+                self.dish_cache.order(order_by)
+        return self.dish_cache
+
+    def refresh_dish_cache(self, dish_ids):
+        # Изменённые блюда заменяются в кэше, удалённые убираются из него
+        rows = {row.id: row for row in self.dishes.get_many(dish_ids)}
+        for dish_id in dish_ids:
+            if dish_id in rows:
+                self.dish_cache.upsert(rows[dish_id])
+            else:
+                self.dish_cache.remove(dish_id)
+
+    def search_dishes(self, text, limit=200, category_filter=None):
+        # Поиск по мере ввода: каждое слово запроса ищется как префикс, результат по релевантности
+        words = re.findall(r"\w+", normalize_search_text(text))
+        if not words:
+            return []
+        category_params = [] if category_filter is None else [json.dumps(list(category_filter), ensure_ascii=False)]
+        if self.fts_enabled:
+            params = [" ".join(f'"{word}"*' for word in words), *category_params]
+        else:
+            params = [*category_params, *(f"%{word}%" for word in words)]
+        query = STATEMENTS.search(self.fts_enabled, len(words), category_filter is not None)
+        return self.dishes.reader.execute(query, (*params, limit)).fetchall()
+
+    # Массовое изменение цен по правилу repricing.PriceRule: предпросмотр, применение
+    # одной транзакцией и отмена пачки целиком
+    def reprice_preview(self, rule):
+        return preview(self.read_cursor, rule)
+
+    def reprice(self, rule):
+        # (id пачки, блюд изменено)
+        with self.transaction():
+            result = apply_rule(self.cursor, rule)
+        self.invalidate_caches("dishes")
+        return result
+
+    def price_batches(self, limit=50):
+        # [(id, когда, правило, блюд, когда отменена), ...] от последней пачки
+        return self.read_cursor.execute('''
+            SELECT id, created_at, rule, dishes, undone_at FROM price_batches ORDER BY id DESC LIMIT ?
+        ''', (limit,)).fetchall()
+
+    def undo_repricing(self, batch_id):
+        # (блюд возвращено, пропущено)
+        with self.transaction():
+            result = undo_batch(self.cursor, batch_id)
+        self.invalidate_caches("dishes")
+        return result
+
+    def sync_recipes(self, dish_ids=None, after_id=None):
+        # Связи блюд со складом по тексту dishes.ingredients. Новые упоминания получают
+        # количество по умолчанию, исчезнувшие из текста удаляются, а уже заданные
+        # количества сохраняются. dish_ids/after_id ограничивают набор блюд
+        matcher, units = self.ingredient_matcher()
+        if dish_ids is not None:
+            dishes = self.cursor.execute(STATEMENTS.get("dishes", "ingredient_texts", "ids"),
+                                         (json.dumps(list(dish_ids)),)).fetchall()
+        elif after_id is not None:
+            dishes = self.cursor.execute(STATEMENTS.get("dishes", "ingredient_texts", "after"), (after_id,)).fetchall()
+        else:
+            dishes = self.cursor.execute(STATEMENTS.get("dishes", "ingredient_texts", "all")).fetchall()
+        wanted = {dish_id: matcher.match_text(text) for dish_id, text in dishes}
+        if dish_ids is None and after_id is None:
+            existing = self.cursor.execute(STATEMENTS.get("dish_ingredients", "pairs", False)).fetchall()
+        else:
+            existing = self.cursor.execute(STATEMENTS.get("dish_ingredients", "pairs", True),
+                                           (json.dumps(list(wanted)),)).fetchall()
+        stale = [(dish_id, ingredient_id) for dish_id, ingredient_id in existing
+                 if dish_id in wanted and ingredient_id not in wanted[dish_id]]
+        links = [(dish_id, ingredient_id, default_portion(units[ingredient_id]))
+                 for dish_id, ingredient_ids in wanted.items() for ingredient_id in ingredient_ids]
+        with self.transaction():
+            self.cursor.executemany(STATEMENTS.get("dish_ingredients", "unlink"), stale)
+            self.cursor.executemany(STATEMENTS.get("dish_ingredients", "link"), links)
+        return len(links)
+
+    def ingredient_matcher(self, ingredient_id=None):
+        # Сопоставитель строится заново, только когда изменились названия или единицы склада.
+        # ingredient_id - ингредиент, только что добавленный или изменённый в этой транзакции:
+        # если до него склад не менялся, позиция заменяется в готовом сопоставителе
+        version, previous = self.cursor.execute(STATEMENTS.get("ingredients", "names_version")).fetchone()
+        if ingredient_id is not None and self.matcher is not None and self.matcher[0] == previous:
+            _, matcher, units = self.matcher
+            row = self.cursor.execute(STATEMENTS.get("ingredients", "name_unit"), (ingredient_id,)).fetchone()
+            matcher.remove(ingredient_id)
+            units.pop(ingredient_id, None)
+            if row is not None:
+                matcher.add(ingredient_id, row[0])
+                units[ingredient_id] = row[1]
+            self.matcher = (version, matcher, units)
+        elif self.matcher is None or self.matcher[0] != version:
+            stock = self.cursor.execute(STATEMENTS.get("ingredients", "names")).fetchall()
+            self.matcher = (version, IngredientMatcher((ingredient_id, name) for ingredient_id, name, _ in stock),
+                            {ingredient_id: unit for ingredient_id, _, unit in stock})
+        return self.matcher[1], self.matcher[2]
+
+    def sync_ingredient(self, ingredient_id):
+        # Новый или переименованный ингредиент: пересчитываются только блюда, в тексте которых
+        # есть начала слов его названия, и блюда, уже связанные с ним по старому названию
+        matcher, _ = self.ingredient_matcher(ingredient_id)
+        name = matcher.names.get(ingredient_id, "")
+        words = [part for word in name.split() for part in re.findall(r"\w+", stem(word))]
+        # Позиция с тем же названием и меньшим id забирает все упоминания сама
+        if not words or matcher.exact[name][0] != ingredient_id:
+            mode, params = "linked", ()
+        elif self.fts_enabled:
+            mode, params = "fts", ("ingredients : (" + " ".join(f'"{word}"*' for word in words) + ")",)
+        else:
+            # Без FTS5 хватает самого длинного слова: лишние блюда отсеет сопоставитель
+            mode, params = "like", (f"%{max(words, key=len)}%",)
+        dish_ids = [dish_id for dish_id, in self.cursor.execute(STATEMENTS.get("dish_ingredients", "mentions", mode),
+                                                                (*params, ingredient_id))]
+        return self.sync_recipes(dish_ids)
+
+    def fetch_recipe(self, dish_id):
+        # [(id ингредиента, название, количество на порцию, единица рецепта, единица склада), ...]
+        self.read_cursor.execute('''
+            SELECT r.ingredient_id, i.name, r.quantity, r.unit, i.unit
+            FROM dish_ingredients r JOIN ingredients i ON i.id = r.ingredient_id
+            WHERE r.dish_id = ? ORDER BY i.name
+        ''', (dish_id,))
+        return self.read_cursor.fetchall()
+
+    def set_recipe_quantity(self, dish_id, ingredient_id, quantity, unit=None):
+        self.cursor.execute('''
+            INSERT INTO dish_ingredients (dish_id, ingredient_id, quantity, unit) VALUES (?, ?, ?, ?)
+            ON CONFLICT (dish_id, ingredient_id) DO UPDATE SET quantity = excluded.quantity, unit = excluded.unit
+        ''', (dish_id, ingredient_id, float(quantity), unit or None))
+
+    def dish_portions(self):
+        # {id блюда: сколько порций можно приготовить из текущих остатков}. Пересчёт одним
+        # проходом по всем рецептам, только когда база изменилась (в том числе из другого
+        # терминала) - это отслеживает PRAGMA data_version соединения для чтения
+        version = self.read_cursor.execute("PRAGMA data_version").fetchone()[0]
+        if self.portions is None or self.portions[0] != version:
+            self.read_cursor.execute('''
+                SELECT r.dish_id, r.ingredient_id, r.quantity, r.unit, i.unit
+                FROM dish_ingredients r JOIN ingredients i ON i.id = r.ingredient_id
+            ''')
+            links = []
+            for dish_id, ingredient_id, quantity, unit, stock_unit in self.read_cursor.fetchall():
+                quantity = to_stock_units(quantity, unit, stock_unit)
+                if quantity is not None:
+                    links.append((dish_id, ingredient_id, quantity))
+            self.read_cursor.execute("SELECT id, CAST(quantity AS REAL) FROM ingredients")
+            self.portions = (version, max_portions(links, dict(self.read_cursor.fetchall())))
+        return self.portions[1]
+
+    def with_portions(self, rows):
+        # Строки блюд с дополнительной колонкой "Порций"; пусто, если рецепт не связан со складом
+        portions = self.dish_portions()
+        return [tuple(row) + (portions.get(row[0], ""),) for row in rows]
+
+    def low_stock(self):
+        # Заканчивающиеся позиции: [(id, название, остаток, порог, единица, с какого времени), ...]
+        self.read_cursor.execute('''
+            SELECT i.id, i.name, l.quantity, l.reorder_level, i.unit, l.since
+            FROM low_stock l JOIN ingredients i ON i.id = l.ingredient_id
+            ORDER BY l.quantity - l.reorder_level, i.name
+        ''')
+        return self.read_cursor.fetchall()
+
+    def low_stock_ids(self):
+        self.read_cursor.execute("SELECT ingredient_id FROM low_stock")
+        return {row[0] for row in self.read_cursor.fetchall()}
+
+    def take_low_stock_alerts(self):
+        # Позиции, попавшие в список с прошлого вызова; каждая сообщается один раз,
+        # пока остаток снова не поднимется выше порога
+        with self.transaction():
+            self.cursor.execute('''
+                SELECT i.id, i.name, l.quantity, l.reorder_level, i.unit, l.since
+                FROM low_stock l JOIN ingredients i ON i.id = l.ingredient_id
+                WHERE l.alerted = 0 ORDER BY i.name
+            ''')
+            alerts = self.cursor.fetchall()
+            if alerts:
+                self.cursor.execute("UPDATE low_stock SET alerted = 1 WHERE alerted = 0")
+        return alerts
+
+    # Отчеты читают готовые итоги из сводных таблиц (analytics.py)
+    def menu_by_category(self):
+        return self.read_cursor.execute(STATEMENTS.get("reports", "menu_by_category")).fetchall()
+
+    def sales_by_category(self, first_day=None, last_day=None):
+        # Без периода - итоги за все время, с периодом - сумма по дням периода
+        if first_day is None and last_day is None:
+            return self.read_cursor.execute(STATEMENTS.get("reports", "sales_by_category", False)).fetchall()
+        return self.read_cursor.execute(STATEMENTS.get("reports", "sales_by_category", True),
+                                        (first_day or "0000-00-00", last_day or "9999-99-99")).fetchall()
+
+    def covers_by_day(self, first_day, last_day):
+        return self.read_cursor.execute(STATEMENTS.get("reports", "covers_by_day"), (first_day, last_day)).fetchall()
+
+    def payroll_by_position(self):
+        return self.read_cursor.execute(STATEMENTS.get("reports", "payroll_by_position")).fetchall()
+
+    # Смены и зарплата (payroll.py). Период - дни 'ГГГГ-ММ-ДД' включительно, смена
+    # относится к дню, в который началась
+    def period_bounds(self, first_day, last_day):
+        return parse_reservation_date(f"{first_day} 00:00"), parse_reservation_date(f"{last_day} 00:00") + 86400
+
+    def fetch_shifts(self, first_day, last_day, staff_id=None):
+        # [(id смены, id сотрудника, имя, должность, начало, конец), ...] по началу смены
+        start, end = self.period_bounds(first_day, last_day)
+        return self.read_cursor.execute(STATEMENTS.get("shifts", "period"), (start, end, staff_id, staff_id)).fetchall()
+
+    def add_shift(self, staff_id, start_at, end_at):
+        check_shift(start_at, end_at)
+        with self.transaction():
+            if self.cursor.execute(STATEMENTS.get("shifts", "staff_exists"), (staff_id,)).fetchone() is None:
+                raise ValueError(f"Нет сотрудника с id {staff_id}")
+            self.cursor.execute(STATEMENTS.get("shifts", "insert"), (staff_id, start_at, end_at))
+        return self.cursor.lastrowid
+
+    def add_shifts(self, rows):
+        # Пакетная вставка [(id сотрудника, начало, конец), ...] одной транзакцией
+        with self.transaction():
+            self.cursor.executemany(STATEMENTS.get("shifts", "insert"), rows)
+        return self.cursor.rowcount
+
+    def delete_shift(self, shift_id):
+        self.cursor.execute(STATEMENTS.get("shifts", "delete"), (shift_id,))
+        return shift_id if self.cursor.rowcount else None
+
+    def payroll(self, first_day, last_day):
+        # Payslip на каждого сотрудника за период; стаж - полные годы на последний день периода,
+        # для неразборчивой даты найма - 0
+        start, end = self.period_bounds(first_day, last_day)
+        staff = self.read_cursor.execute(STATEMENTS.get("shifts", "payroll_staff"), (last_day, last_day)).fetchall()
+        return compute_payroll(staff, shift_groups(self.read_cursor, start, end))
+
+    def rebuild_summaries(self):
+        with self.transaction():
+            rebuild_summaries(self.cursor)
+
+    def availability_engine(self):
+        # Движок строится по броням, не закончившимся к началу сегодняшнего дня: история
+        # в память не попадает. Дальше он обновляется по одной брони (refresh_availability)
+        if self.availability is None:
+            today = wall_clock_now() // 86400 * 86400
+            rows = self.read_cursor.execute(STATEMENTS.get("reservations", "availability", "since"),
+                                            (today, today)).fetchall()
+            capacities = dict(self.read_cursor.execute("SELECT number, capacity FROM tables").fetchall())
+            self.availability = AvailabilityEngine(rows, capacities, since=today)
+        return self.availability
+
+    def availability_for(self, start, end):
+        # Движок для окна [start, end): общий, если окно не раньше его горизонта, иначе
+        # временный из броней, пересекающих окно (проверки задним числом редки)
+        engine = self.availability_engine()
+        if engine.covers(start):
+            return engine
+        statement = STATEMENTS.get("reservations", "availability", "window")
+        rows = self.read_cursor.execute(statement, (end, start, end, start)).fetchall()
+        return AvailabilityEngine(rows, engine.capacities)
+
+    def refresh_availability(self, reservation_ids):
+        # Изменённые, новые и удалённые брони заменяются в движке на месте
+        engine = self.availability
+        if engine is None:
+            return
+        for reservation_id in reservation_ids:
+            engine.remove(reservation_id)
+        ids = json.dumps(list(reservation_ids))
+        for row in self.read_cursor.execute(STATEMENTS.get("reservations", "availability", "ids"),
+                                            (ids, engine.since, ids, engine.since)).fetchall():
+            engine.add(*row)
+
+    def fetch_tables(self):
+        # [(номер, вместимость, [соседи]), ...]
+        neighbours = {}
+        for table_number, neighbour in self.read_cursor.execute(STATEMENTS.get("tables", "neighbours")).fetchall():
+            neighbours.setdefault(table_number, []).append(neighbour)
+        rows = self.read_cursor.execute(STATEMENTS.get("tables", "all")).fetchall()
+        return [(number, capacity, neighbours.get(number, [])) for number, capacity in rows]
+
+    def save_table(self, number, capacity, neighbours=()):
+        # Соседство симметрично: стол 3 рядом с 4 - значит и 4 рядом с 3
+        neighbours = sorted({neighbour for neighbour in neighbours if neighbour != number})
+        with self.transaction():
+            self.cursor.execute(STATEMENTS.get("tables", "save"), (number, capacity))
+            self.cursor.execute(STATEMENTS.get("tables", "clear_neighbours"), (number, number))
+            self.cursor.executemany(STATEMENTS.get("tables", "add_neighbour"),
+                                    [(number, neighbour) for neighbour in neighbours] +
+                                    [(neighbour, number) for neighbour in neighbours])
+        if self.availability is not None:
+            self.availability.capacities[number] = capacity  # брони от вместимости не зависят
+
+    def delete_table(self, number):
+        with self.transaction():
+            self.cursor.execute(STATEMENTS.get("tables", "delete"), (number,))
+            self.cursor.execute(STATEMENTS.get("tables", "clear_neighbours"), (number, number))
+        if self.availability is not None:
+            self.availability.capacities.pop(number, None)
+
+    def day_reservations(self, day):
+        # Брони дня 'ГГГГ-ММ-ДД' для рассадки: [(id, гостей, начало, конец, стол), ...] и
+        # {id: кортеж занятых столов}
+        day_start = parse_reservation_date(f"{day} 00:00")
+        rows = self.read_cursor.execute(STATEMENTS.get("reservations", "seating", "day"),
+                                        (day_start, day_start + 86400)).fetchall()
+        current = {row[0]: (row[4],) for row in rows}
+        for reservation_id, table_number in self.read_cursor.execute(STATEMENTS.get("reservations", "seating", "joined"),
+                                                                     (day_start, day_start + 86400)).fetchall():
+            current[reservation_id] = tuple(sorted(current[reservation_id] + (table_number,)))
+        return rows, current
+
+    def seating_plan(self, day):
+        # План рассадки всех броней дня; брони прошлого дня, заходящие за полночь, остаются на своих столах
+        rows, current = self.day_reservations(day)
+        day_start = parse_reservation_date(f"{day} 00:00")
+        blocked = self.read_cursor.execute(STATEMENTS.get("reservations", "seating", "overnight"),
+                                           (day_start - 86400, day_start, day_start)).fetchall()
+        tables = self.fetch_tables()
+        return plan_seating(rows, {number: capacity for number, capacity, _ in tables},
+                            {number: neighbours for number, _, neighbours in tables}, current, blocked)
+
+    def apply_seating(self, plan):
+        # Перенос броней по плану одной транзакцией. Если брони дня изменились после
+        # расчёта, план устарел - ValueError, нужно пересчитать
+        changed = plan.changed()
+        with self.transaction():
+            if plan.reservations:
+                day = format_timestamp(plan.reservations[0][2])[:10]
+                if self.day_reservations(day)[0] != plan.reservations:
+                    raise ValueError("Брони изменились после расчёта рассадки, пересчитайте план")
+            for reservation_id in changed:
+                main_table, *joined = plan.assignments[reservation_id]
+                self.cursor.execute(STATEMENTS.get("reservations", "seating", "move"), (main_table, reservation_id))
+                self.cursor.execute(STATEMENTS.get("reservations", "seating", "unjoin"), (reservation_id,))
+                self.cursor.executemany(STATEMENTS.get("reservations", "seating", "join"),
+                                        [(reservation_id, table_number) for table_number in joined])
+        self.invalidate_caches("reservations", changed)
+        return changed
+
+    def reservation_conflicts(self, table_number, start_at, duration_minutes=DEFAULT_DURATION, exclude_id=None):
+        # id броней этого стола, пересекающихся с новым временем. Запрос к самой базе через
+        # курсор записи, а не к движку занятости: внутри транзакции записи ответ верен до коммита
+        end_at = start_at + duration_minutes * 60
+        return sorted({row[0] for row in self.cursor.execute(STATEMENTS.get("reservations", "conflicts"), (
+            table_number, end_at, start_at, exclude_id, table_number, end_at, start_at, exclude_id))})
+
+    def save_reservation(self, fields, reservation_id=None):
+        # Новая бронь или изменение брони reservation_id (fields - изменённые колонки).
+        # Занятость стола и вместимость проверяются запросами к самой базе в той же транзакции,
+        # что и запись: движок занятости видит брони других терминалов только после poll_changes.
+        # ReservationConflict - стол занят или мал; None - изменяемой брони нет
+        columns = ROW_TYPES["reservations"]._fields
+        with self.transaction():
+            if reservation_id is None:
+                record = dict(fields)
+            else:
+                current = self.cursor.execute(STATEMENTS.get("reservations", "get"), (reservation_id,)).fetchone()
+                if current is None:
+                    return None
+                record = dict(zip(columns, current), **fields)
+            if reservation_id is None or {"reservation_date", "table_number", "duration_minutes", "number_of_guests"} & set(fields):
+                self.check_reservation(record, reservation_id)
+            if reservation_id is None:
+                self.cursor.execute(STATEMENTS.insert("reservations", list(fields)), tuple(fields.values()))
+                reservation_id = self.cursor.lastrowid
+            else:
+                self.repository("reservations").update(reservation_id, fields)
+        self.invalidate_caches("reservations", [reservation_id])
+        return self.fetch_record("reservations", reservation_id)
+
+    def check_reservation(self, record, reservation_id=None):
+        # Вызывается внутри транзакции записи: чтения идут курсором записи
+        table_number = record["table_number"]
+        duration = record.get("duration_minutes") or DEFAULT_DURATION
+        conflicts = self.reservation_conflicts(table_number, parse_reservation_date(record["reservation_date"]),
+                                               duration, reservation_id)
+        if conflicts:
+            raise ReservationConflict(f"Стол {table_number} уже занят в это время "
+                                      f"(брони № {', '.join(map(str, conflicts))})")
+        # Мест за столом; если бронь остаётся на своём месте и времени, то вместе со сдвинутыми
+        # к ней столами. None - стол не описан в tables, вместимость не проверяем
+        capacity = self.cursor.execute(STATEMENTS.get("tables", "seated_capacity"), (
+            table_number, reservation_id, table_number, record["reservation_date"], duration)).fetchone()[0]
+        if capacity is not None and int(record["number_of_guests"]) > capacity:
+            raise ReservationConflict(f"За столом {table_number} только {capacity} мест")
+
+    def free_tables(self, start_at, duration_minutes=DEFAULT_DURATION, guests=None):
+        engine = self.availability_for(start_at, start_at + duration_minutes * 60)
+        return engine.free_tables(start_at, duration_minutes, guests)
+
+    def free_slots(self, window_start, window_end, duration_minutes=DEFAULT_DURATION, guests=None):
+        engine = self.availability_for(window_start, window_end)
+        return engine.free_slots(window_start, window_end, duration_minutes, guests)
+
+    def invalidate_caches(self, table_name, row_ids=None):
+        # row_ids - какие строки изменились, если это известно: блюда тогда заменяются
+        # в кэше блюд, а брони - в движке занятости по одной, без их перестройки
+        if table_name == "dishes":
+            if row_ids is None or self.dish_cache is None:
+                self.dish_cache = None
+            else:
+                self.refresh_dish_cache(row_ids)
+        elif table_name == "reservations":
+            if row_ids is None:
+                self.availability = None
+            else:
+                self.refresh_availability(row_ids)
+
+    def poll_changes(self):
+        # Изменения после прошлого опроса, в том числе сделанные другими терминалами:
+        # {таблица: (текущие строки, [id удалённых])}. None - изменений слишком много
+        # или журнал начат заново, и списки проще перечитать целиком. Пока база не менялась,
+        # опрос стоит одного PRAGMA data_version
+        data_version = self.read_cursor.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.change_data_version:
+            return {}
+        self.change_data_version = data_version
+        latest = self.read_cursor.execute("SELECT IFNULL(MAX(version), 0) FROM change_log").fetchone()[0]
+        if self.change_version is None:
+            self.change_version = latest  # первый опрос только запоминает, откуда считать
+            return {}
+        if latest < self.change_version:
+            self.change_version = latest
+            for table_name in self.TABLES:
+                self.invalidate_caches(table_name)
+            return None
+        self.read_cursor.execute(
+            "SELECT table_name, row_id FROM change_log WHERE version > ? AND version <= ? ORDER BY version LIMIT ?",
+            (self.change_version, latest, self.CHANGE_POLL_LIMIT + 1))
+        changed = {}
+        for table_name, row_id in self.read_cursor.fetchall():
+            changed.setdefault(table_name, []).append(row_id)
+        self.change_version = latest
+        too_many = sum(map(len, changed.values())) > self.CHANGE_POLL_LIMIT
+        for table_name, row_ids in changed.items():
+            self.invalidate_caches(table_name, None if too_many else row_ids)
+        if too_many:
+            return None
+        changes = {}
+        for table_name, row_ids in changed.items():
+            rows = self.repository(table_name).get_many(row_ids)
+            found = {row.id for row in rows}
+            changes[table_name] = (rows, [row_id for row_id in row_ids if row_id not in found])
+        return changes
+
+    def drop_stale_caches(self):
+        # Кэши сбрасываются, если базу изменило другое соединение (другой терминал или процесс):
+        # data_version соединения записи меняется только от чужих коммитов
+        version = self.cursor.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.writer_version:
+            self.writer_version = version
+            self.dish_cache = None
+            self.availability = None
+
+    def table_columns(self, table_name):
+        # Колонки таблицы в виде [(имя, not_null), ...]; заодно проверка имени таблицы
+        nullable = NULLABLE.get(table_name, ())
+        return [(name, name not in nullable) for name in STATEMENTS.columns(table_name)]
+
+    def sort_expression(self, table_name, order_by):
+        # Выражение сортировки: NULL приводим к '', чтобы ключ страницы всегда был сравним
+        if order_by not in STATEMENTS.columns(table_name):
+            raise ValueError(f"Неизвестная колонка {order_by} в таблице {table_name}")
+        return sort_expression(table_name, order_by)
+
+    def fetch_page(self, table_name, order_by="id", ascending=True, after=None, limit=200, row_filter=None):
+        # Постраничная выборка по ключу (значение колонки сортировки, id) без OFFSET:
+        # каждая следующая страница начинается сразу после ключа последней строки предыдущей.
+        # row_filter - список категорий для блюд или начало (секунды) для броней
+        if table_name == "dishes" and self.dish_cache is not None and order_by in self.DISH_COLUMNS:
+            return self.dish_cache.page(order_by, ascending, after, limit, row_filter)
+        return self.repository(table_name).page(order_by, ascending, after, limit, row_filter)
+
+# Время каждого метода Database в метриках процесса ("db.fetch_page" и т. д.)
+timed_methods(Database, "db")
+
+# ё и е в поиске не различаем; lower() в SQLite работает только с латиницей,
+# регистр кириллицы приводит сам токенизатор FTS5
+SEARCH_NORMALIZE_SQL = "replace(replace({}, 'ё', 'е'), 'Ё', 'Е')"
+
+def normalize_search_text(text):
+    return text.lower().replace("ё", "е")
+
+def sqlite_order(value):
+    # Ключ для сравнения значений в Python в том же порядке, что и ORDER BY в SQLite:
+    # числа раньше строк, строки раньше BLOB
+    if isinstance(value, (int, float)):
+        return 0, value
+    if isinstance(value, str):
+        return 1, value
+    return 2, value
+
+def _null_to_empty(value):
+    return "" if value is None else value
+
+class DishCache:
+    # Блюда в памяти: строки читаются из базы один раз, перестановка для каждой колонки
+    # сортировки считается один раз (обратный порядок - тот же список с конца),
+    # для каждой категории хранится множество id. Изменённое блюдо заменяется на месте:
+    # его строка вынимается и вставляется бинарным поиском в каждый готовый порядок.
+    MAX_VIEWS = 64
+
+    def __init__(self, rows, columns):
+        self.rows = {row[0]: row for row in rows}
+        self.columns = columns
+        self.category_index = columns.index("category")
+        self.category_ids = {}
+        for row in rows:
+            self.category_ids.setdefault(self.category(row), set()).add(row[0])
+        self._orders = {}  # колонка -> (строки по возрастанию (значение, id), ключи для bisect)
+        self._views = {}  # (колонка, категории) -> (строки, ключи) - только блюда этих категорий
+
+    def category(self, row):
+        return _null_to_empty(row[self.category_index])
+
+    def sort_key(self, row, order_by):
+        return sqlite_order(_null_to_empty(row[self.columns.index(order_by)])), row[0]
+
+    def order(self, order_by):
+        if order_by not in self._orders:
+            index = self.columns.index(order_by)
+            rows = list(self.rows.values())
+            keys = [(sqlite_order(_null_to_empty(row[index])), row[0]) for row in rows]
+            positions = sorted(range(len(rows)), key=keys.__getitem__)
+            self._orders[order_by] = ([rows[position] for position in positions], [keys[position] for position in positions])
+        return self._orders[order_by]
+
+    def view(self, order_by, category_filter=None):
+        if category_filter is None:
+            return self.order(order_by)
+        view_key = (order_by, frozenset(category_filter))
+        if view_key not in self._views:
+            rows, keys = self.order(order_by)
+            ids = set().union(*(self.category_ids.get(category, ()) for category in category_filter))
+            selected = [position for position, row in enumerate(rows) if row[0] in ids]
+            if len(self._views) >= self.MAX_VIEWS:
+                self._views.clear()
+            self._views[view_key] = ([rows[position] for position in selected], [keys[position] for position in selected])
+        return self._views[view_key]
+
+    def sorted_lists(self, row):
+        # (колонка, строки, ключи) каждого готового порядка, в который попадает строка
+        for order_by, (rows, keys) in self._orders.items():
+            yield order_by, rows, keys
+        for (order_by, categories), (rows, keys) in self._views.items():
+            if self.category(row) in categories:
+                yield order_by, rows, keys
+
+    def upsert(self, row):
+        self.remove(row[0])
+        self.rows[row[0]] = row
+        self.category_ids.setdefault(self.category(row), set()).add(row[0])
+        for order_by, rows, keys in self.sorted_lists(row):
+            key = self.sort_key(row, order_by)
+            position = bisect.bisect_left(keys, key)
+            keys.insert(position, key)
+            rows.insert(position, row)
+
+    def remove(self, dish_id):
+        row = self.rows.pop(dish_id, None)
+        if row is None:
+            return
+        self.category_ids[self.category(row)].discard(dish_id)
+        for order_by, rows, keys in self.sorted_lists(row):
+            position = bisect.bisect_left(keys, self.sort_key(row, order_by))
+            del keys[position], rows[position]
+
+    def page(self, order_by, ascending=True, after=None, limit=None, category_filter=None):
+        # Та же семантика, что у Database.fetch_page, но бинарным поиском по готовому списку
+        rows, keys = self.view(order_by, category_filter)
+        if ascending:
+            start = 0 if after is None else bisect.bisect_right(keys, (sqlite_order(after[0]), after[1]))
+            return rows[start:] if limit is None else rows[start:start + limit]
+        end = len(rows) if after is None else bisect.bisect_left(keys, (sqlite_order(after[0]), after[1]))
+        start = 0 if limit is None else max(end - limit, 0)
+        return rows[start:end][::-1]
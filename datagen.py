@@ -0,0 +1,186 @@
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from database import Database, VALID_CATEGORIES
+
+# Синтетические данные для нагрузочной проверки запросов и интерфейса.
+# Одинаковый seed даёт одинаковый набор строк; строки генерируются потоком
+# и пишутся пачками, так что объём (от тысяч до десятков миллионов) ограничен только диском.
+
+INGREDIENT_NAMES = [
+    "Курица", "Говядина", "Свинина", "Индейка", "Лосось", "Креветки", "Картофель", "Морковь", "Лук",
+    "Чеснок", "Помидоры", "Огурцы", "Перец", "Капуста", "Свекла", "Брокколи", "Грибы", "Рис", "Паста",
+    "Мука", "Яйца", "Молоко", "Сливки", "Сметана", "Творог", "Сыр", "Пармезан", "Моцарелла", "Масло",
+    "Сахар", "Мед", "Соль", "Специи", "Зелень", "Базилик", "Укроп", "Лимон", "Ягоды", "Яблоки", "Бананы",
+    "Кофейные зерна", "Чайные листья", "Какао", "Шоколад", "Орехи",
+]
+
+INGREDIENT_UNITS = ["кг", "кг", "кг", "л", "шт", "пакетов", "банок"]
+
+# Категория -> (основы названий, диапазон цен)
+DISH_TEMPLATES = {
+    "Закуска": (["Салат", "Брускетта", "Тартар", "Карпаччо", "Закуска"], (150, 700)),
+    "Супы": (["Суп", "Крем-суп", "Бульон", "Борщ", "Солянка"], (200, 500)),
+    "Основное блюдо": (["Стейк", "Филе", "Котлета", "Паста", "Ризотто", "Пицца"], (400, 2000)),
+    "Десерты": (["Торт", "Пирожное", "Мусс", "Чизкейк", "Блинчики"], (200, 600)),
+    "Напитки": (["Лимонад", "Морс", "Чай", "Кофе", "Коктейль"], (100, 400)),
+}
+
+DISH_STYLES = ["по-домашнему", "от шефа", "с травами", "пикантный", "классический", "сезонный",
+               "по-итальянски", "по-французски", "фирменный", "лёгкий"]
+
+FIRST_NAMES = ["Александр", "Мария", "Екатерина", "Дмитрий", "Ирина", "Сергей", "Анна", "Олег",
+               "Елена", "Иван", "Пётр", "Светлана", "Наталья", "Андрей", "Ольга", "Михаил"]
+
+LAST_NAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Васильев", "Федоров",
+              "Сергеев", "Николаев", "Попов", "Соколов", "Морозов", "Волков", "Лебедев"]
+
+# Должность -> (оклад от, до)
+POSITIONS = {
+    "Официант": (28000, 40000), "Повар": (45000, 80000), "Администратор": (38000, 60000),
+    "Бариста": (30000, 45000), "Уборщица": (18000, 25000), "Сомелье": (40000, 70000),
+}
+
+TABLE_COUNT = 30
+SLOTS_PER_EVENING = ("12:00", "14:00", "16:00", "18:00", "20:00", "22:00")
+# Смены: (начало, часов) - дневная, длинная со сверхурочными, вечерняя и ночная
+SHIFT_TEMPLATES = ((8, 8), (10, 12), (14, 8), (20, 10))
+
+def person_name(rng):
+    last = rng.choice(LAST_NAMES)
+    first = rng.choice(FIRST_NAMES)
+    # Женские имена в списке оканчиваются на "а" или "я" - фамилия ставится в женскую форму
+    return f"{first} {last}а" if first.endswith(("а", "я")) else f"{first} {last}"
+
+def generate_dishes(rng, count):
+    for number in range(1, count + 1):
+        category = rng.choice(VALID_CATEGORIES)
+        bases, (low, high) = DISH_TEMPLATES[category]
+        ingredients = rng.sample(INGREDIENT_NAMES, rng.randint(2, 6))
+        base = rng.choice(bases)
+        name = f"{base} {rng.choice(DISH_STYLES)} №{number}"
+        description = f"{base}: {ingredients[0].lower()} и {ingredients[1].lower()}"
+        yield (name, description, ", ".join(item.lower() for item in ingredients),
+               float(rng.randrange(low, high + 1, 10)), category)
+
+def generate_ingredients(rng, count):
+    for number in range(1, count + 1):
+        name = INGREDIENT_NAMES[(number - 1) % len(INGREDIENT_NAMES)]
+        if number > len(INGREDIENT_NAMES):
+            name = f"{name} (партия {(number - 1) // len(INGREDIENT_NAMES)})"
+        yield name, rng.randint(0, 300), rng.choice(INGREDIENT_UNITS)
+
+def generate_staff(rng, count):
+    first_day = date(2010, 1, 1).toordinal()
+    last_day = date(2026, 1, 1).toordinal()
+    for _ in range(count):
+        position = rng.choice(list(POSITIONS))
+        low, high = POSITIONS[position]
+        hired = date.fromordinal(rng.randint(first_day, last_day))
+        yield person_name(rng), position, float(rng.randrange(low, high + 1, 500)), hired.isoformat()
+
+def generate_reservations(rng, count, start_day=date(2024, 1, 1)):
+    # Брони раскладываются по столам и двухчасовым слотам, поэтому не пересекаются между собой
+    per_day = TABLE_COUNT * len(SLOTS_PER_EVENING)
+    for number in range(count):
+        day, slot = divmod(number, per_day)
+        table_number = slot % TABLE_COUNT + 1
+        time_of_day = SLOTS_PER_EVENING[slot // TABLE_COUNT]
+        when = datetime.combine(start_day + timedelta(days=day), datetime.strptime(time_of_day, "%H:%M").time())
+        yield (person_name(rng), when.strftime("%Y-%m-%d %H:%M"), rng.randint(1, 8), table_number, 120)
+
+# Таблица -> (колонки, генератор)
+GENERATORS = {
+    "dishes": (("name", "description", "ingredients", "price", "category"), generate_dishes),
+    "ingredients": (("name", "quantity", "unit"), generate_ingredients),
+    "staff": (("name", "position", "salary", "hire_date"), generate_staff),
+    "reservations": (("customer_name", "reservation_date", "number_of_guests", "table_number",
+                      "duration_minutes"), generate_reservations),
+}
+
+def generate(db, table_name, count, seed=42, chunk_size=50000, on_progress=None):
+    # Каждая таблица получает свой генератор случайных чисел, чтобы её данные
+    # не зависели от того, какие ещё таблицы заполняются
+    columns, generator = GENERATORS[table_name]
+    rows = generator(random.Random(f"{seed}:{table_name}"), count)
+    written = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        db.add_records(table_name, columns, chunk)
+        written += len(chunk)
+        if on_progress:
+            on_progress(table_name, written, count)
+    if table_name == "ingredients":
+        db.sync_recipes()  # блюда, сгенерированные раньше склада, связываются с ним здесь
+    return written
+
+def generate_shifts(db, days, seed=42, start_day=date(2025, 1, 1), chunk_size=50000, on_progress=None):
+    # Смены всех сотрудников за days дней с start_day, примерно пять смен в неделю на человека
+    rng = random.Random(f"{seed}:shifts")
+    staff_ids = [row[0] for row in db.read_cursor.execute("SELECT id FROM staff ORDER BY id").fetchall()]
+    epoch_day = (start_day - date(1970, 1, 1)).days
+
+    def rows():
+        for day in range(days):
+            day_start = (epoch_day + day) * 86400
+            for staff_id in staff_ids:
+                if rng.random() < 5 / 7:
+                    hour, length = rng.choice(SHIFT_TEMPLATES)
+                    yield staff_id, day_start + hour * 3600, day_start + (hour + length) * 3600
+
+    generated = rows()
+    written = 0
+    while True:
+        chunk = list(islice(generated, chunk_size))
+        if not chunk:
+            break
+        db.add_shifts(chunk)
+        written += len(chunk)
+        if on_progress:
+            on_progress("shifts", written, None)
+    return written
+
+def parse_count(text):
+    # 1000, 100k, 10m
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Генерация синтетических данных для restaurant.db")
+    parser.add_argument("--rows", type=parse_count, default=1000, help="строк на таблицу: 1000, 100k, 10m")
+    parser.add_argument("--tables", default=",".join(GENERATORS), help="таблицы через запятую")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--shift-days", type=int, default=0, help="смены сотрудников за столько дней")
+    parser.add_argument("--db", default="restaurant.db")
+    args = parser.parse_args(argv)
+
+    tables = [name.strip() for name in args.tables.split(",") if name.strip()]
+    unknown = [name for name in tables if name not in GENERATORS]
+    if unknown:
+        parser.error(f"неизвестные таблицы: {', '.join(unknown)}")
+
+    def progress(table_name, written, count):
+        print(f"\r{table_name}: {written}/{count or '?'}", end="", file=sys.stderr)
+
+    db = Database(args.db)
+    for table_name in tables:
+        started = time.perf_counter()
+        written = generate(db, table_name, args.rows, args.seed, args.chunk_size, progress)
+        seconds = time.perf_counter() - started
+        print(f"\r{table_name}: {written} строк за {seconds:.1f} с ({written / max(seconds, 1e-9):.0f} строк/с)")
+    if args.shift_days:
+        started = time.perf_counter()
+        written = generate_shifts(db, args.shift_days, args.seed, chunk_size=args.chunk_size, on_progress=progress)
+        print(f"\rshifts: {written} строк за {time.perf_counter() - started:.1f} с")
+    db.close()
+
+if __name__ == "__main__":
+    main()
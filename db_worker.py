@@ -0,0 +1,129 @@
+import queue
+import sys
+import threading
+import time
+import traceback
+from tkinter import TclError
+
+from database import Database
+from metrics import METRICS
+
+def report_error(error):
+    # Обработчик ошибок по умолчанию, пока окно не задало свой (в приложении - messagebox)
+    print(f"Ошибка базы данных: {error!r}", file=sys.stderr)
+    traceback.print_exception(error, file=sys.stderr)
+
+class DbWorker:
+    # Все обращения к базе из интерфейса идут через этот объект, поток Tk sqlite не трогает.
+    # Записи и всё, что опирается на кэши Database, выполняет один поток-писатель;
+    # чтения без кэшей можно отдать пулу читателей со своими соединениями.
+    # Результаты возвращаются в поток Tk через очередь, которую окно опрашивает по after().
+    POLL_MS = 20
+
+    def __init__(self, database_factory=Database, readers=0):
+        self.database_factory = database_factory
+        self.write_jobs = queue.Queue()
+        self.read_jobs = queue.Queue() if readers else self.write_jobs
+        self.results = queue.Queue()
+        self.generations = {}  # ключ запроса -> номер последнего отправленного запроса
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.widget = None
+        self.on_busy = None  # on_busy(bool) - показать/спрятать индикатор загрузки
+        self.on_error = report_error  # on_error(exception) для запросов без своего обработчика ошибок
+        self.schema_ready = threading.Event()  # читатели открывают базу после того, как писатель создал схему
+        self.threads = [threading.Thread(target=self._run, args=(self.write_jobs, True), daemon=True)]
+        self.threads += [threading.Thread(target=self._run, args=(self.read_jobs, False), daemon=True)
+                         for _ in range(readers)]
+        for thread in self.threads:
+            thread.start()
+
+    def attach(self, widget, on_busy=None, on_error=None):
+        # Доставлять результаты в окно widget (опрос очереди через widget.after)
+        self.on_busy = on_busy
+        self.on_error = on_error or report_error
+        if widget is not self.widget:
+            self.widget = widget
+            self._poll(widget)
+
+    def submit(self, job, callback=None, key=None, read_only=False, on_error=None):
+        # job(db) выполняется в потоке базы, callback(result) - в потоке Tk.
+        # Новый запрос с тем же key отменяет предыдущий, если тот ещё не выполнен или не доставлен.
+        with self.lock:
+            generation = self.generations.get(key, 0) + 1
+            if key is not None:
+                self.generations[key] = generation
+            self.pending += 1
+            became_busy = self.pending == 1
+        if became_busy and self.on_busy:
+            self.on_busy(True)
+        label = key or getattr(job, "__qualname__", "job").replace(".<locals>", "")
+        (self.read_jobs if read_only else self.write_jobs).put(
+            (job, callback, on_error, key, generation, label, time.perf_counter()))
+
+    def close(self):
+        self.widget = None  # опрос очереди результатов прекращается
+        self.write_jobs.put(None)
+        for _ in self.threads[1:]:
+            self.read_jobs.put(None)
+
+    def _is_current(self, key, generation):
+        return key is None or self.generations.get(key) == generation
+
+    def _run(self, jobs, writer):
+        if not writer:
+            self.schema_ready.wait()
+        db = failure = None
+        try:
+            db = self.database_factory()
+        except Exception as error:
+            failure = error  # база не открылась - каждая задача получит эту ошибку
+        finally:
+            if writer:
+                self.schema_ready.set()
+        while True:
+            item = jobs.get()
+            if item is None:
+                break
+            job, callback, on_error, key, generation, label, queued = item
+            # Метрики: ожидание в очереди, работа в потоке базы и (в _poll) обработка результата в Tk
+            started = time.perf_counter()
+            METRICS.record("worker.wait", started - queued)
+            if not self._is_current(key, generation):
+                self.results.put((None, None, False, key, generation, label))  # отменён до выполнения
+                continue
+            try:
+                if failure is not None:
+                    raise failure
+                result = (callback, job(db), False, key, generation, label)
+            except Exception as error:
+                result = (on_error, error, True, key, generation, label)
+            METRICS.record(f"worker.job:{label}", time.perf_counter() - started)
+            self.results.put(result)
+        if db is not None:
+            db.close()
+
+    def _poll(self, widget):
+        if widget is not self.widget:
+            return  # результаты теперь получает другое окно
+        while True:
+            try:
+                callback, value, failed, key, generation, label = self.results.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.pending -= 1
+                became_idle = self.pending == 0
+            if became_idle and self.on_busy:
+                self.on_busy(False)
+            if not self._is_current(key, generation):
+                continue
+            if failed:
+                callback = callback or self.on_error
+            if callback is not None:
+                with METRICS.timer(f"worker.callback:{label}"):
+                    callback(value)
+        try:
+            widget.after(self.POLL_MS, self._poll, widget)
+        except TclError:
+            pass  # окно закрыто
@@ -0,0 +1,137 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+
+from archive import HISTORY_VIEWS
+from database import Database
+
+# Потоковая выгрузка таблиц в CSV или JSON Lines. Строки читаются из базы порциями
+# (Database.iter_rows) и сразу пишутся в файл, поэтому память не зависит от размера таблицы.
+# Файл пишется под временным именем и переименовывается только после успешного завершения.
+
+FORMATS = ("csv", "jsonl")
+PROGRESS_EVERY = 5000  # строк между сообщениями о ходе выгрузки и проверками отмены
+
+class ExportCancelled(Exception):
+    pass
+
+def guess_format(path):
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def write_rows(rows, columns, file, file_format, on_progress=None, cancel=None):
+    if file_format == "csv":
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        write = writer.writerow
+    else:
+        def write(row):
+            file.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+    count = 0
+    for row in rows:
+        write(row)
+        count += 1
+        if count % PROGRESS_EVERY == 0:
+            if cancel is not None and cancel.is_set():
+                raise ExportCancelled()
+            if on_progress:
+                on_progress(count)
+    if on_progress:
+        on_progress(count)
+    return count
+
+def export_table(db, table_name, path, file_format=None, order_by="id", ascending=True, row_filter=None,
+                 on_progress=None, cancel=None, arraysize=1000):
+    # Возвращает число выгруженных строк; cancel - threading.Event для остановки из другого потока
+    file_format = file_format or guess_format(path)
+    if file_format not in FORMATS:
+        raise ValueError(f"Неизвестный формат {file_format}")
+    if table_name in HISTORY_VIEWS:
+        db.attach_archive()
+    columns = [name for name, _ in db.table_columns(table_name)]
+    rows = db.iter_rows(table_name, order_by, ascending, row_filter, arraysize)
+    temporary = f"{path}.part"
+    try:
+        # utf-8-sig: Excel узнаёт кодировку CSV по BOM, bulk_import его пропускает
+        with open(temporary, "w", encoding="utf-8-sig" if file_format == "csv" else "utf-8", newline="") as file:
+            count = write_rows(rows, columns, file, file_format, on_progress, cancel)
+    except BaseException:
+        rows.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    os.replace(temporary, path)
+    return count
+
+class ExportJob:
+    # Выгрузка в отдельном потоке со своим соединением, чтобы не занимать поток базы приложения.
+    # Окно читает done/total/finished по таймеру и может вызвать cancel()
+    def __init__(self, database_factory, table_name, path, **options):
+        self.database_factory = database_factory
+        self.table_name = table_name
+        self.path = path
+        self.options = options
+        self.done = 0
+        self.total = None
+        self.seconds = 0.0
+        self.error = None
+        self.cancelled = False
+        self.finished = False
+        self.cancel_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _progress(self, count):
+        self.done = count
+
+    def _run(self):
+        started = time.perf_counter()
+        db = None
+        try:
+            db = self.database_factory()
+            self.total = db.count_rows(self.table_name, self.options.get("row_filter"))
+            self.done = export_table(db, self.table_name, self.path, on_progress=self._progress,
+                                     cancel=self.cancel_event, **self.options)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as error:
+            self.error = error
+        finally:
+            if db is not None:
+                db.close()
+            self.seconds = time.perf_counter() - started
+            self.finished = True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка таблицы restaurant.db в CSV или JSON Lines")
+    parser.add_argument("table", choices=Database.TABLES[1:])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--order-by", default="id")
+    parser.add_argument("--desc", action="store_true", help="по убыванию")
+    parser.add_argument("--category", action="append", help="только блюда этих категорий (можно несколько раз)")
+    parser.add_argument("--arraysize", type=int, default=1000, help="строк за одно чтение из базы")
+    parser.add_argument("--db", default="restaurant.db")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    started = time.perf_counter()
+    try:
+        count = export_table(db, args.table, args.path, args.format, args.order_by, not args.desc,
+                             args.category if args.table == "dishes" else None,
+                             on_progress=lambda done: print(f"{args.table}: {done} строк", file=sys.stderr),
+                             arraysize=args.arraysize)
+    finally:
+        db.close()
+    seconds = time.perf_counter() - started
+    print(f"{args.table}: выгружено {count} строк в {args.path}, {seconds:.2f} с")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlsplit
+
+import datagen
+from database import Database, VALID_CATEGORIES
+from metrics import percentile
+
+# Нагрузочный тест api.py: несколько клиентов с постоянными соединениями в течение
+# заданного времени отправляют смесь запросов к спискам (и, если нужно, создают брони).
+# Клиенты помнят ETag каждого адреса и шлют If-None-Match, как планшеты официантов.
+# Итог - запросов в секунду и задержки p50/p95/p99 по каждому виду запроса.
+
+DEFAULT_URL = "http://127.0.0.1:8080"
+
+# Вид запроса -> (вес, путь); путь может зависеть от генератора случайных чисел
+READ_MIX = {
+    "dishes:first_page": (4, lambda rng: "/dishes?limit=50"),
+    "dishes:category": (3, lambda rng: f"/dishes?limit=50&order_by=price&category={quote(rng.choice(VALID_CATEGORIES))}"),
+    "dishes:search": (2, lambda rng: f"/dishes?limit=20&q={quote(rng.choice(('суп', 'салат', 'крем')))}"),
+    "reservations:page": (2, lambda rng: "/reservations?limit=50&order_by=reservation_date&order=desc"),
+    "ingredients:page": (2, lambda rng: "/ingredients?limit=100"),
+    "staff:page": (1, lambda rng: "/staff?limit=100"),
+}
+
+class HttpClient:
+    # Клиент HTTP/1.1 на одном постоянном соединении
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(payload)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        length = int(response_headers.get("content-length") or 0)
+        data = await self.reader.readexactly(length) if length else b""
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status, response_headers, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+class LoadTest:
+    def __init__(self, url, clients=16, duration=10.0, write_ratio=0.0, conditional=True, seed=42,
+                 username="admin", password="admin"):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.clients = clients
+        self.duration = duration
+        self.write_ratio = write_ratio
+        self.conditional = conditional
+        self.seed = seed
+        self.username = username
+        self.password = password
+        self.names = list(READ_MIX)
+        self.weights = [weight for weight, _ in READ_MIX.values()]
+        self.latencies = {}  # вид запроса -> [секунды, ...]
+        self.statuses = {}  # код ответа -> количество
+
+    async def run(self):
+        # Без входа API отвечает на чтения 401, поэтому входим всегда
+        client = HttpClient(self.host, self.port)
+        status, _, data = await client.request("POST", "/login",
+                                               {"username": self.username, "password": self.password})
+        client.close()
+        if status != 200:
+            raise RuntimeError(f"Вход не удался: {status} {data.decode('utf-8', 'replace')}")
+        token = json.loads(data)["token"]
+        started = time.perf_counter()
+        deadline = started + self.duration
+        await asyncio.gather(*(self.client_loop(number, deadline, token) for number in range(self.clients)))
+        return self.report(time.perf_counter() - started)
+
+    async def client_loop(self, number, deadline, token):
+        rng = random.Random(f"{self.seed}:{number}")
+        client = HttpClient(self.host, self.port)
+        etags = {}  # путь -> ETag последнего полного ответа
+        authorization = {"Authorization": f"Bearer {token}"}
+        try:
+            while time.perf_counter() < deadline:
+                if self.write_ratio and rng.random() < self.write_ratio:
+                    name, method, path = "reservations:create", "POST", "/reservations"
+                    body = {"customer_name": f"Нагрузка {number}", "number_of_guests": rng.randint(1, 6),
+                            "reservation_date": f"2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                                                f"{rng.randint(10, 22):02d}:{rng.choice(('00', '30'))}",
+                            "table_number": rng.randint(1, datagen.TABLE_COUNT)}
+                    headers = authorization
+                else:
+                    name = rng.choices(self.names, self.weights)[0]
+                    method, path, body = "GET", READ_MIX[name][1](rng), None
+                    headers = authorization
+                    if self.conditional and path in etags:
+                        headers = dict(authorization, **{"If-None-Match": etags[path]})
+                request_started = time.perf_counter()
+                status, response_headers, _ = await client.request(method, path, body, headers)
+                self.latencies.setdefault(name, []).append(time.perf_counter() - request_started)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status == 200 and "etag" in response_headers:
+                    etags[path] = response_headers["etag"]
+        finally:
+            client.close()
+
+    def report(self, seconds):
+        def summary(values):
+            values = sorted(values)
+            return {"requests": len(values), "per_second": round(len(values) / seconds, 1),
+                    "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p95_ms": round(percentile(values, 95) * 1000, 2),
+                    "p99_ms": round(percentile(values, 99) * 1000, 2),
+                    "max_ms": round(values[-1] * 1000, 2) if values else 0.0}
+
+        return {"seconds": round(seconds, 3), "clients": self.clients, "conditional": self.conditional,
+                "write_ratio": self.write_ratio, "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+                "total": summary([value for values in self.latencies.values() for value in values]),
+                "by_request": {name: summary(values) for name, values in sorted(self.latencies.items())}}
+
+def print_report(report):
+    total = report["total"]
+    print(f"{report['clients']} клиентов, {report['seconds']:.1f} с, ответы: {report['statuses']}", file=sys.stderr)
+    print(f"{'запрос':<24} {'запросов':>9} {'в секунду':>10} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}",
+          file=sys.stderr)
+    for name, item in list(report["by_request"].items()) + [("всего", total)]:
+        print(f"{name:<24} {item['requests']:>9} {item['per_second']:>10.1f} {item['p50_ms']:>9.2f} "
+              f"{item['p95_ms']:>9.2f} {item['p99_ms']:>9.2f}", file=sys.stderr)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(db_path, readers):
+    # Сервер в отдельном процессе, чтобы клиенты не делили с ним GIL
+    port = free_port()
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api.py"),
+                                "--db", db_path, "--port", str(port), "--readers", str(readers)])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер API завершился при запуске")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Сервер API не ответил за 30 секунд")
+
+def generate_database(count, seed):
+    path = os.path.join(tempfile.mkdtemp(prefix="restaurant-loadtest-"), "loadtest.db")
+    db = Database(path)
+    for table_name in datagen.GENERATORS:
+        datagen.generate(db, table_name, count, seed)
+    db.close()
+    return path
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP API ресторана")
+    parser.add_argument("--url", default=DEFAULT_URL, help="адрес уже запущенного api.py")
+    parser.add_argument("--start", metavar="DB", help="запустить api.py на этой базе на свободном порту")
+    parser.add_argument("--generate", type=datagen.parse_count, metavar="COUNT",
+                        help="создать временную базу с COUNT строк на таблицу (datagen) и запустить на ней api.py")
+    parser.add_argument("--readers", type=int, default=4, help="потоков чтения у запускаемого сервера")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="доля запросов, создающих брони")
+    parser.add_argument("--no-conditional", action="store_true", help="не отправлять If-None-Match")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="куда записать результаты (JSON)")
+    args = parser.parse_args(argv)
+
+    process = None
+    url = args.url
+    db_path = generate_database(args.generate, args.seed) if args.generate else args.start
+    if db_path:
+        process, url = start_server(db_path, args.readers)
+    try:
+        report = asyncio.run(LoadTest(url, args.clients, args.duration, args.write_ratio,
+                                      not args.no_conditional, args.seed).run())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
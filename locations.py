@@ -0,0 +1,219 @@
+import argparse
+import heapq
+import json
+import os
+import pathlib
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from availability import parse_reservation_date
+from database import Database, sqlite_order
+
+# Несколько ресторанов сети: у каждой точки своя база (файл restaurant.db или любой другой),
+# список точек - в locations.json рядом с приложением. Новая точка - новая строка в списке,
+# схема баз от этого не меняется. Сводные запросы по сети (Federation) читают базы точек
+# только для чтения: пачками через ATTACH к одному соединению или параллельно в пуле процессов.
+# Части результата, отсортированные в SQLite, сливаются heapq.merge без общей сортировки.
+
+LOCATIONS_FILE = "locations.json"
+DEFAULT_LOCATION = "main"
+ATTACH_BATCH = 8  # баз на одно соединение; SQLite по умолчанию позволяет подключить не больше 10
+EVENING_FROM = "17:00"  # "сегодня вечером" для подсчёта гостей
+
+Location = namedtuple("Location", "code name path")
+
+def load_locations(registry=LOCATIONS_FILE):
+    # {код: Location} в порядке списка; без файла - одна точка на restaurant.db
+    if not os.path.exists(registry):
+        return {DEFAULT_LOCATION: Location(DEFAULT_LOCATION, "Ресторан", "restaurant.db")}
+    with open(registry, encoding="utf-8") as file:
+        items = json.load(file)
+    # Относительные пути считаются от папки файла списка
+    base = os.path.dirname(os.path.abspath(registry))
+    return {item["code"]: Location(item["code"], item["name"], os.path.join(base, item["path"]))
+            for item in items}
+
+def save_locations(locations, registry=LOCATIONS_FILE):
+    base = os.path.dirname(os.path.abspath(registry))
+    items = [{"code": location.code, "name": location.name, "path": os.path.relpath(location.path, base)}
+             for location in locations.values()]
+    temporary = f"{registry}.part"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(items, file, ensure_ascii=False, indent=2)
+    os.replace(temporary, registry)
+
+def add_location(code, name, path, registry=LOCATIONS_FILE):
+    # Новая точка: база создаётся (или проверяется) через Database, затем точка попадает в список
+    locations = load_locations(registry)
+    if code in locations:
+        raise ValueError(f"Точка {code} уже есть")
+    if not code.isidentifier():
+        raise ValueError(f"Код точки {code!r}: только буквы, цифры и _")
+    Database(path).close()
+    locations[code] = Location(code, name, os.path.abspath(path))
+    save_locations(locations, registry)
+    return locations[code]
+
+def open_location(code=DEFAULT_LOCATION, registry=LOCATIONS_FILE, **connection_options):
+    locations = load_locations(registry)
+    if code not in locations:
+        raise ValueError(f"Неизвестная точка {code}, есть: {', '.join(locations)}")
+    return Database(locations[code].path, location=locations[code], **connection_options)
+
+def readonly_uri(path):
+    return pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+
+def check_location(location):
+    # Базу точки открываем только для чтения; отсутствующая или устаревшая база - ошибка,
+    # схему обновляет приложение или api.py --location при открытии базы
+    if not os.path.exists(location.path):
+        raise ValueError(f"Точка {location.code}: нет базы {location.path}")
+    connection = sqlite3.connect(readonly_uri(location.path), uri=True)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        connection.close()
+    if version != Database.SCHEMA_VERSION:
+        raise ValueError(f"Точка {location.code}: схема базы {location.path} версии {version}, "
+                         f"нужна {Database.SCHEMA_VERSION} - откройте базу приложением для обновления")
+
+def _query_location(code, path, sql, params, order_by):
+    # Запрос к одной базе в процессе пула; возвращает строки с кодом точки впереди
+    connection = sqlite3.connect(readonly_uri(path), uri=True)
+    try:
+        sql = f"SELECT ?, * FROM ({sql.format(db='main')})"
+        if order_by:
+            sql += " ORDER BY " + ", ".join(str(index + 1) for index in order_by)
+        return connection.execute(sql, (code, *params)).fetchall()
+    finally:
+        connection.close()
+
+class Federation:
+    # Запросы только на чтение по всем точкам сети. Запрос - SELECT, где таблицы записаны
+    # как {db}.dishes; результат - строки (код точки, *колонки). order_by - номера колонок
+    # результата (0 - код точки), по которым каждая часть сортируется в SQLite перед слиянием.
+    def __init__(self, locations, processes=0):
+        self.locations = list(locations.values()) if isinstance(locations, dict) else list(locations)
+        self.processes = processes
+        self.pool = ProcessPoolExecutor(processes) if processes else None
+        # Сводные запросы базы точек не меняют: каждая только проверяется на версию схемы,
+        # чтобы запросы видели одинаковые таблицы
+        for location in self.locations:
+            check_location(location)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def query(self, sql, params=(), order_by=None):
+        if self.pool is not None:
+            parts = self.pool.map(_query_location, *zip(*[
+                (location.code, location.path, sql, params, order_by) for location in self.locations]))
+        else:
+            parts = (self._query_batch(self.locations[start:start + ATTACH_BATCH], sql, params, order_by)
+                     for start in range(0, len(self.locations), ATTACH_BATCH))
+        if not order_by:
+            return [row for part in parts for row in part]
+        return list(heapq.merge(*parts, key=lambda row: tuple(sqlite_order(row[index]) for index in order_by)))
+
+    def _query_batch(self, locations, sql, params, order_by):
+        # Одна пачка баз подключается к соединению в памяти, запрос - один UNION ALL по всем
+        connection = sqlite3.connect(":memory:", uri=True)
+        try:
+            for number, location in enumerate(locations):
+                connection.execute(f"ATTACH DATABASE ? AS loc{number}", (readonly_uri(location.path),))
+            union = " UNION ALL ".join(f"SELECT ?, * FROM ({sql.format(db=f'loc{number}')})"
+                                       for number in range(len(locations)))
+            if order_by:
+                union += " ORDER BY " + ", ".join(str(index + 1) for index in order_by)
+            batch_params = [value for location in locations for value in (location.code, *params)]
+            return connection.execute(union, batch_params).fetchall()
+        finally:
+            connection.close()
+
+def menu_price_comparison(federation):
+    # [(блюдо, мин. цена, макс. цена, {точка: цена}), ...] по названию блюда
+    rows = federation.query("SELECT name, price FROM {db}.dishes", order_by=(1, 0))
+    result = []
+    for name, group in groupby(rows, key=lambda row: row[1]):
+        prices = {code: price for code, _, price in group}
+        result.append((name, min(prices.values()), max(prices.values()), prices))
+    return result
+
+def covers_tonight(federation, day=None, evening_from=EVENING_FROM):
+    # {точка: (броней, гостей)} на вечер дня day ('ГГГГ-ММ-ДД', по умолчанию сегодня)
+    day = day or time.strftime("%Y-%m-%d")
+    start = parse_reservation_date(f"{day} {evening_from}")
+    end = parse_reservation_date(f"{day} 00:00") + 86400
+    rows = federation.query('''
+        SELECT COUNT(*), IFNULL(SUM(number_of_guests), 0) FROM {db}.reservations
+        WHERE start_at >= ? AND start_at < ?
+    ''', (start, end))
+    return {code: (reservations, guests) for code, reservations, guests in rows}
+
+def stock_across_sites(federation):
+    # [(продукт, единица, всего, {точка: остаток}, [точки ниже порога]), ...] по названию
+    rows = federation.query("SELECT name, unit, quantity, reorder_level FROM {db}.ingredients", order_by=(1, 2, 0))
+    result = []
+    for (name, unit), group in groupby(rows, key=lambda row: (row[1], row[2])):
+        quantities = {}
+        low = []
+        for code, _, _, quantity, reorder_level in group:
+            quantities[code] = quantities.get(code, 0) + quantity
+            if reorder_level is not None and quantity <= reorder_level:
+                low.append(code)
+        result.append((name, unit, sum(quantities.values()), quantities, low))
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Точки сети ресторанов и сводные запросы по ним")
+    parser.add_argument("--registry", default=LOCATIONS_FILE)
+    parser.add_argument("--processes", type=int, default=0, help="читать базы в пуле процессов вместо ATTACH")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list")
+    add = commands.add_parser("add")
+    add.add_argument("code")
+    add.add_argument("name")
+    add.add_argument("path")
+    commands.add_parser("menu", help="сравнение цен меню")
+    covers = commands.add_parser("covers", help="гости сегодня вечером")
+    covers.add_argument("--day")
+    commands.add_parser("stock", help="остатки продуктов по точкам")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        location = add_location(args.code, args.name, args.path, args.registry)
+        print(f"Добавлена точка {location.code}: {location.name}, {location.path}")
+        return 0
+    locations = load_locations(args.registry)
+    if args.command == "list":
+        for location in locations.values():
+            print(f"{location.code}\t{location.name}\t{location.path}")
+        return 0
+    with Federation(locations, args.processes) as federation:
+        if args.command == "menu":
+            for name, low, high, prices in menu_price_comparison(federation):
+                print(f"{name}\t{low:.2f}\t{high:.2f}\t" + ", ".join(f"{code}={price:.2f}" for code, price in prices.items()))
+        elif args.command == "covers":
+            result = covers_tonight(federation, args.day)
+            for code, (reservations, guests) in result.items():
+                print(f"{code}\t{reservations}\t{guests}")
+            print(f"всего\t{sum(item[0] for item in result.values())}\t{sum(item[1] for item in result.values())}")
+        else:
+            for name, unit, total, quantities, low in stock_across_sites(federation):
+                print(f"{name}\t{total} {unit}\t" + ", ".join(f"{code}={quantity}" for code, quantity in quantities.items())
+                      + (f"\tмало: {', '.join(low)}" if low else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
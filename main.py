@@ -1,126 +1,309 @@
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from tkinter import Toplevel
-import sqlite3
-
-from unicodedata import category
+from datetime import date, timedelta
+
+from archive import DEFAULT_AGE_DAYS, archive_history
+from availability import DEFAULT_DURATION, ReservationConflict, parse_reservation_date, format_timestamp
+from database import Database, VALID_CATEGORIES, sqlite_order
+from db_worker import DbWorker
+from export import ExportJob
+from locations import load_locations
+from repricing import PriceRule
+from metrics import METRICS, timed_methods
+
+class PagedTreeview:
+    # Виртуальная прокрутка для ttk.Treeview: в дереве держится не больше max_pages страниц
+    # вокруг видимой области, остальные строки подгружаются из базы по мере прокрутки.
+    # Элементы дерева имеют iid = id записи, поэтому отдельные строки можно обновлять на месте.
+    # Полоса прокрутки показывает положение внутри загруженного окна, а не во всём списке:
+    # страницы идут по ключу без OFFSET, перейти к произвольной строке нельзя. Home и End
+    # переходят в начало и в конец списка (go_to_end).
+    JUMP_PAGES = 50  # страниц за один запрос при переходе в конец
+
+    def __init__(self, tree, fetch_page, key, page_size=200, max_pages=5, scrollbar=None, row_tags=None):
+        self.tree = tree
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.scrollbar = scrollbar
+        self.row_tags = row_tags  # row_tags(row) -> теги строки для подсветки
+        self.pages = []
+        self.dropped_above = []
+        self.keys = {}
+        self.exhausted = True
+        self.generation = 0
+        self._loading = False
+        self.configure(fetch_page, key)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.tree.bind("<Home>", lambda event: self.go_to_start())
+        self.tree.bind("<End>", lambda event: self.go_to_end())
+        if scrollbar is not None:
+            scrollbar.configure(command=self.tree.yview)
+
+    def configure(self, fetch_page, key, ascending=True, accept=None):
+        # fetch_page(after, limit, deliver) запрашивает строки после ключа after и
+        # асинхронно передаёт их в deliver(rows) в потоке Tk
+        self.fetch_page = fetch_page
+        self.key = key  # key(row) -> ключ строки (значение колонки сортировки, id)
+        self.ascending = ascending
+        self.accept = accept  # accept(row) -> попадает ли строка под текущий фильтр
+
+    def reset(self):
+        self.tree.delete(*self.tree.get_children())
+        self.pages = []  # [[ключ, после которого загружена страница, [iid, ...]], ...]
+        self.dropped_above = []  # ключи начала страниц, выгруженных сверху
+        self.keys = {}  # iid -> ключ строки
+        self.exhausted = False
+        self.generation += 1  # ответы на запросы до сброса больше не нужны
+        self._loading = False
+        self.load_next()
+
+    def load_next(self):
+        if self.exhausted or self._loading:
+            return
+        after = self.keys[self.pages[-1][1][-1]] if self.pages else None
+        self._request(after, lambda rows: self._append_page(after, rows))
 
+    def load_prev(self):
+        if not self.dropped_above or self._loading:
+            return
+        start = self.dropped_above[-1]
+        self._request(start, lambda rows: self._prepend_page(start, rows))
 
-class Database:
-    def __init__(self):
-        self.connection = sqlite3.connect("restaurant.db")
-        self.cursor = self.connection.cursor()
-        self.create_tables()
-        self.setup_initial_users()
-
-    def create_tables(self):
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL
-                )
-            ''')
+    def go_to_start(self):
+        if self.dropped_above:
+            self.reset()
+        else:
+            self.tree.yview_moveto(0)
 
-        # Таблица для блюд
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS dishes (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    ingredients TEXT,
-                    price REAL NOT NULL,
-                    category TEXT
-                )
-            ''')
+    def go_to_end(self):
+        # Страницы до конца списка запрашиваются крупными порциями по ключу; в дерево попадают
+        # только последние max_pages, начала остальных запоминаются для прокрутки вверх
+        if self._loading:
+            return
+        if self.exhausted or not self.pages:
+            self.tree.yview_moveto(1)
+            return
+        skipped = [start for start, _ in self.pages]
+        tail = []  # [(ключ, после которого начинается страница, строки), ...] - последние max_pages
+
+        def on_rows(after, rows):
+            for offset in range(0, len(rows), self.page_size):
+                tail.append((after, rows[offset:offset + self.page_size]))
+                after = self.key(tail[-1][1][-1])
+                if len(tail) > self.max_pages:
+                    skipped.append(tail.pop(0)[0])
+            if len(rows) == self.page_size * self.JUMP_PAGES:
+                self._request(after, lambda more: on_rows(after, more), self.page_size * self.JUMP_PAGES)
+            else:
+                show(tail)
+
+        def show(pages):
+            if not pages:
+                self.exhausted = True  # за загруженным окном строк не оказалось
+                self.tree.yview_moveto(1)
+                return
+            self.tree.delete(*self.tree.get_children())
+            self.keys = {}
+            self.dropped_above += skipped
+            self.pages = [[start, [self._insert(row, "end") for row in rows]] for start, rows in pages]
+            self.exhausted = True
+            self.tree.yview_moveto(1)
+
+        after = self.keys[self.pages[-1][1][-1]]
+        self._request(after, lambda rows: on_rows(after, rows), self.page_size * self.JUMP_PAGES)
+
+    def _request(self, after, deliver, limit=None):
+        self._loading = True
+        generation = self.generation
+
+        def on_rows(rows):
+            if generation != self.generation:
+                return
+            self._loading = False
+            deliver(rows)
+
+        self.fetch_page(after, limit or self.page_size, on_rows)
+
+    def _append_page(self, after, rows):
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if not rows:
+            return
+        self.pages.append([after, [self._insert(row, "end") for row in rows]])
+        if len(self.pages) > self.max_pages:
+            start, dropped = self.pages.pop(0)
+            self.dropped_above.append(start)
+            self._keep_position(lambda: self._remove(dropped))
+
+    def _prepend_page(self, start, rows):
+        self.dropped_above.pop()
+
+        def insert_above():
+            iids = []
+            for row in rows:
+                if self.tree.exists(str(row[0])):
+                    break  # дошли до уже загруженной страницы
+                iids.append(self._insert(row, len(iids)))
+            self.pages.insert(0, [start, iids])
+            return len(iids)
+
+        self._keep_position(insert_above)
+        if len(self.pages) > self.max_pages:
+            self._remove(self.pages.pop()[1])
+            self.exhausted = False
+
+    def upsert(self, row):
+        # Точечное обновление одной строки после добавления/редактирования записи
+        iid = str(row[0])
+        if self.tree.exists(iid):
+            if self.keys[iid] == self.key(row) and (self.accept is None or self.accept(row)):
+                self.tree.item(iid, values=row, tags=self._tags(row))
+                return
+            self.remove(row[0])
+        if self.accept is not None and not self.accept(row):
+            return
+        self._place(row)
 
-        # Таблица для бронирований
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS reservations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_name TEXT NOT NULL,
-                    reservation_date TEXT NOT NULL,
-                    number_of_guests INTEGER NOT NULL,
-                    table_number INTEGER NOT NULL
-                )
-            ''')
+    def remove(self, record_id):
+        iid = str(record_id)
+        if not self.tree.exists(iid):
+            return
+        for page in self.pages:
+            if iid in page[1]:
+                page[1].remove(iid)
+                if not page[1]:
+                    self.pages.remove(page)
+                break
+        def delete():
+            above = self._above_view(iid)
+            self._remove([iid])
+            return -1 if above else 0
+
+        self._keep_position(delete)
+        if not self.pages:
+            self.reset()  # загруженное окно опустело - начинаем заново с начала списка
+
+    def _place(self, row):
+        # Бинарный поиск позиции новой строки среди загруженных; строки, попадающие
+        # в невыгруженную часть списка, подгрузятся сами при прокрутке
+        key = self._comparable(self.key(row))
+        children = self.tree.get_children()
+        low, high = 0, len(children)
+        while low < high:
+            middle = (low + high) // 2
+            if self._before(self._comparable(self.keys[children[middle]]), key):
+                low = middle + 1
+            else:
+                high = middle
+        if (low == 0 and self.dropped_above) or (low == len(children) and not self.exhausted):
+            return
+        if not self.pages:
+            self.pages.append([None, []])
+        offset = 0
+        for page in self.pages:
+            if low <= offset + len(page[1]) or page is self.pages[-1]:
+                break
+            offset += len(page[1])
+        above = low < len(children) and self._above_view(children[low])
+
+        def insert():
+            page[1].insert(low - offset, self._insert(row, low))
+            return 1 if above else 0
+
+        self._keep_position(insert)
+
+    def _comparable(self, key):
+        return tuple(sqlite_order(value) for value in key)
+
+    def _before(self, a, b):
+        return a < b if self.ascending else a > b
+
+    def _above_view(self, iid):
+        first = self.tree.yview()[0]
+        return self.tree.index(iid) < round(first * len(self.tree.get_children()))
+
+    def _tags(self, row):
+        return self.row_tags(row) if self.row_tags else ()
+
+    def _insert(self, row, index):
+        iid = str(row[0])
+        self.tree.insert("", index, iid=iid, values=row, tags=self._tags(row))
+        self.keys[iid] = self.key(row)
+        return iid
+
+    def _remove(self, iids):
+        self.tree.delete(*iids)
+        for iid in iids:
+            del self.keys[iid]
+        return -len(iids)
+
+    def _keep_position(self, mutate):
+        # Изменение строк выше видимой области не должно сдвигать то, что видит пользователь
+        first = self.tree.yview()[0]
+        anchor = round(first * len(self.tree.get_children()))
+        shift = mutate()
+        total = len(self.tree.get_children())
+        if total:
+            self.tree.yview_moveto(max(anchor + shift, 0) / total)
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        if float(last) > 0.9:
+            self.load_next()
+        elif float(first) < 0.1:
+            self.load_prev()
+
+def is_low_stock(row):
+    # Строка склада (id, название, количество, единица, порог дозаказа)
+    try:
+        return float(row[2]) <= float(row[4])
+    except (TypeError, ValueError, IndexError):
+        return False
+
+def show_db_error(error):
+    messagebox.showerror("Ошибка базы данных", str(error))
+
+class StartupTimer:
+    # Отметки этапов запуска: сколько прошло от предыдущей отметки до каждой из них
+    def __init__(self):
+        self.last = time.perf_counter()
+        self.marks = []
 
-        # Таблица для персонала
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS staff (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    position TEXT NOT NULL,
-                    salary REAL NOT NULL,
-                    hire_date TEXT NOT NULL
-                )
-            ''')
-
-        # Таблица для остатков продуктов
-        self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ingredients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit TEXT NOT NULL
-                )
-            ''')
-        self.connection.commit()
-
-    def setup_initial_users(self):
-        self.cursor.execute("SELECT COUNT(*) FROM users")
-        count = self.cursor.fetchone()[0]
-        if count == 0:
-            # Добавляем админа и обычного пользователя
-            self.add_user("admin", "admin", "admin")
-            self.add_user("user", "user", "user")
-
-    def add_user(self, username, password, role):
-        self.cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", (username, password, role))
-        self.connection.commit()
-
-    def fetch_user(self, username, password):
-        self.cursor.execute("SELECT * FROM users WHERE username=? AND password=?", (username, password))
-        return self.cursor.fetchone()
-
-    def fetch_all(self, table_name):
-        self.cursor.execute(f"SELECT * FROM {table_name}")
-        return self.cursor.fetchall()
-
-    def add_record(self, table_name, record):
-        self.cursor.execute(f"INSERT INTO {table_name} VALUES (NULL, {','.join('?' * len(record))})", record)
-        self.connection.commit()
-
-    def update_record(self, table_name, record):
-        record_id = record.pop('id')
-        set_clause = ', '.join([f"{key}=?" for key in record.keys()])
-        self.cursor.execute(f"UPDATE {table_name} SET {set_clause} WHERE id=?", (*record.values(), record_id))
-        self.connection.commit()
-
-    def delete_record(self, table_name, record_id):
-        self.cursor.execute(f"DELETE FROM {table_name} WHERE id=?", (record_id,))
-        self.connection.commit()
-
-    def fetch_all_dishes(self, order_by="id", ascending=True, category_filter=None):
-        order = "ASC" if ascending else "DESC"
-        if category_filter:
-            placeholders = ', '.join('?' for _ in category_filter)
-            query = f"SELECT * FROM dishes WHERE category IN ({placeholders}) ORDER BY {order_by} {order}"
-            self.cursor.execute(query, category_filter)
-        else:
-            query = f"SELECT * FROM dishes ORDER BY {order_by} {order}"
-            self.cursor.execute(query)
+    def mark(self, name):
+        now = time.perf_counter()
+        self.marks.append((name, now - self.last))
+        self.last = now
 
-        return self.cursor.fetchall()
+    def report(self, background=()):
+        # background - этапы, выполненные в потоке базы параллельно с окнами
+        lines = ["Запуск:"] + [f"  {name:<40} {seconds * 1000:8.1f} мс" for name, seconds in self.marks]
+        lines += [f"  {'(в фоне) ' + name:<40} {seconds * 1000:8.1f} мс" for name, seconds in background]
+        print("\n".join(lines))
 
 class LoginWindow:
-    def __init__(self, master):
+    def __init__(self, master, timer=None):
         self.master = master
         self.master.title("Вход")
         self.master.geometry("300x200")
-
-        self.db = Database()
+        self.timer = timer or StartupTimer()
+
+        # База открывается в фоне, пока вводится пароль; тот же поток и соединения потом
+        # достаются главному окну. Если в locations.json несколько точек - база выбранной
+        self.locations = list(load_locations().values())
+        self.location = self.locations[0]
+        self.worker = self.open_worker(self.location)
+
+        if len(self.locations) > 1:
+            self.master.geometry("300x250")
+            tk.Label(master, text="Ресторан:").pack(pady=5)
+            self.location_combobox = ttk.Combobox(master, state="readonly",
+                                                  values=[location.name for location in self.locations])
+            self.location_combobox.current(0)
+            self.location_combobox.bind("<<ComboboxSelected>>", self.select_location)
+            self.location_combobox.pack(pady=5)
 
         tk.Label(master, text="Имя пользователя:").pack(pady=5)
         self.username_entry = tk.Entry(master)
@@ -136,32 +319,64 @@ class LoginWindow:
         self.show_password_button.pack()
 
         tk.Button(master, text="Войти", command=self.login).pack(pady=5)
+        self.timer.mark("окно входа")
+
+    def open_worker(self, location):
+        worker = DbWorker(lambda: Database(location.path, location=location))
+        worker.attach(self.master, on_error=show_db_error)
+        return worker
+
+    def select_location(self, event=None):
+        location = self.locations[self.location_combobox.current()]
+        if location is not self.location:
+            self.worker.close()
+            self.location = location
+            self.worker = self.open_worker(location)
 
     def toggle_password(self):
         self.password_entry.config(show='' if self.show_password_var.get() else '*')
 
     def login(self):
+        self.timer.mark("ввод имени и пароля")
         username = self.username_entry.get()
         password = self.password_entry.get()
-        user = self.db.fetch_user(username, password)
+        self.worker.submit(lambda db: db.fetch_user(username, password), self.on_login, key="login")
 
+    def on_login(self, user):
         if user:
+            self.timer.mark("проверка пароля")
             self.master.destroy()
-            self.open_main_window(user[3])
+            self.open_main_window(user.role)
         else:
             messagebox.showerror("Ошибка", "Неверное имя пользователя или пароль")
 
     def open_main_window(self, role):
-        self.main_window = RestaurantApp(role)
+        location = self.location if len(self.locations) > 1 else None
+        self.main_window = RestaurantApp(role, self.worker, self.timer, location)
 
 class RestaurantApp:
-    def __init__(self, user_role):
+    SEARCH_DELAY_MS = 250
+    LOW_STOCK_POLL_MS = 30000  # остатки списывают и другие терминалы - проверяем список тревог периодически
+    CHANGE_POLL_MS = 1000  # опрос журнала изменений других терминалов
+    LOOP_PROBE_MS = 250  # проверка задержки цикла событий Tk для метрик
+    REPORT_DAYS = 30
+    PRICE_PREVIEW_ROWS = 500  # строк предпросмотра изменения цен в окне; итоги считаются по всем
+    # Режим списка броней -> (таблица или представление, только с сегодняшнего дня)
+    RESERVATION_SCOPES = {"Предстоящие": ("reservations", True), "Все": ("reservations", False),
+                          "Все с архивом": ("reservations_history", False)}
+
+    def __init__(self, user_role, worker=None, timer=None, location=None):
         self.user_role = user_role
-        self.db = Database()
+        self.worker = worker or DbWorker()
+        self.timer = timer or StartupTimer()
+        self.location = location
+        self.archive_attached = False  # архив подключён в потоке базы (load_reservations)
 
         self.window = tk.Tk()
-        self.window.title("Управление Рестораном")
+        self.window.title(f"Управление Рестораном - {location.name}" if location else "Управление Рестораном")
         self.window.geometry("600x400")
+        self.busy_bar = ttk.Progressbar(self.window, mode="indeterminate", length=80)
+        self.worker.attach(self.window, on_busy=self.show_busy, on_error=show_db_error)
 
         self.tab_control = ttk.Notebook(self.window)
 
@@ -170,41 +385,51 @@ class RestaurantApp:
         self.tab_reservations = ttk.Frame(self.tab_control)
         self.tab_ingredients = ttk.Frame(self.tab_control)
         self.tab_staff = ttk.Frame(self.tab_control)
+        self.tab_reports = ttk.Frame(self.tab_control)
 
         self.tab_control.add(self.tab_dishes, text='Блюда')
         self.tab_control.add(self.tab_reservations, text='Резервации')
         self.tab_control.add(self.tab_ingredients, text='Остатки Ингредиентов')
         self.tab_control.add(self.tab_staff, text='Персонал')
+        self.tab_control.add(self.tab_reports, text='Отчеты')
 
         self.tab_control.pack(expand=1, fill='both')
+        self.setup_toolbar()
 
         self.sort_order = {"id": True, "name": True, "price": True, "category": True}
         self.category_filter = None
         # Список допустимых категорий
-        self.valid_categories = ["Закуска", "Супы", "Основное блюдо", "Десерты", "Напитки"]
+        self.valid_categories = list(VALID_CATEGORIES)
         self.selected_categories = {category: True for category in self.valid_categories}
-
-        self.setup_dishes_tab()
-        self.setup_reservations_tab()
-        self.setup_ingredients_tab()
-        self.setup_staff_tab()
+        self.dishes_order_by = "id"
+        self.dishes_ascending = True
+
+        # Вкладка строится и загружает данные при первом открытии, а не при запуске
+        self.tab_setups = {
+            str(self.tab_dishes): self.setup_dishes_tab,
+            str(self.tab_reservations): self.setup_reservations_tab,
+            str(self.tab_ingredients): self.setup_ingredients_tab,
+            str(self.tab_staff): self.setup_staff_tab,
+            str(self.tab_reports): self.setup_reports_tab,
+        }
+        self.tab_control.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.views = {}  # таблица -> PagedTreeview построенной вкладки, для изменений из журнала
+        # Первый опрос журнала до загрузки списков: всё, что изменится после, придёт построчно
+        self.worker.submit(lambda db: db.poll_changes())
+        self.ingredients_tree = None  # до открытия вкладки остатков тревоги приходят только сообщением
+        # Обработчики новых тревог о заканчивающихся продуктах: handler(alerts)
+        self.low_stock_hooks = [self.show_low_stock_alerts]
+        self.on_tab_changed()
+        self.timer.mark("главное окно и вкладка блюд")
+        # Задачи выполняются по порядку, так что ответ придёт после первой страницы блюд
+        self.worker.submit(lambda db: db.startup_timings, self.report_startup)
+        self.check_low_stock()
+        self.window.after(self.CHANGE_POLL_MS, self.poll_changes)
+        self.probe_loop(time.perf_counter() + self.LOOP_PROBE_MS / 1000)
 
         self.window.mainloop()
 
-
-    def setup_dishes_tab(self):
-        # Таблица для блюд
-        self.dishes_tree = ttk.Treeview(self.tab_dishes,
-                                        columns=("ID", "Name", "Description", "Ingredients", "Price", "Category"),
-                                        show='headings')
-        self.dishes_tree.heading("ID", text="ID", command=lambda: self.sort_by("id"))
-        self.dishes_tree.heading("Name", text="Название", command=lambda: self.sort_by("name"))
-        self.dishes_tree.heading("Description", text="Описание")
-        self.dishes_tree.heading("Ingredients", text="Ингредиенты")
-        self.dishes_tree.heading("Price", text="Цена", command=lambda: self.sort_by("price"))
-        self.dishes_tree.heading("Category", text="Категория", command=lambda: self.sort_by("category"))
-        self.dishes_tree.pack(expand=True, fill='both')
-
+    def setup_toolbar(self):
         # Панель управления
         self.refresh_button = tk.Button(self.window, text="Обновить список", command=self.refresh_dishes)
         self.refresh_button.pack(side=tk.LEFT)
@@ -212,12 +437,99 @@ class RestaurantApp:
         # Кнопка для выхода
         self.exit_button = tk.Button(self.window, text="Выход", command=self.window.quit)
         self.exit_button.pack(side=tk.RIGHT, padx=10, pady=10)
+        self.busy_bar.pack(side=tk.RIGHT)
 
         # Кнопка для выбора категорий
         self.category_button = tk.Button(self.window, text="Выбрать категории", command=self.open_category_selection)
         self.category_button.pack(side=tk.LEFT)
 
-        self.refresh_dishes()
+        self.diagnostics_button = tk.Button(self.window, text="Диагностика", command=lambda: DiagnosticsWindow(self.window))
+        self.diagnostics_button.pack(side=tk.LEFT)
+
+    def probe_loop(self, expected):
+        # Насколько позже срока Tk выполнил отложенный вызов: если задержка растёт, а запросы
+        # к базе быстрые, занят сам цикл событий (перерисовка, обработчики)
+        now = time.perf_counter()
+        METRICS.record("ui.loop_lag", max(now - expected, 0.0))
+        self.window.after(self.LOOP_PROBE_MS, self.probe_loop, now + self.LOOP_PROBE_MS / 1000)
+
+    def on_tab_changed(self, event=None):
+        setup = self.tab_setups.pop(str(self.tab_control.select()), None)
+        if setup is not None:
+            setup()
+
+    def poll_changes(self):
+        # Правки других терминалов применяются к открытым спискам построчно, без перезагрузки
+        def load(db):
+            changes = db.poll_changes()
+            if changes and "dishes" in changes:
+                rows, deleted = changes["dishes"]
+                changes["dishes"] = (db.with_portions(rows), deleted)
+            return changes
+
+        self.worker.submit(load, self.apply_changes, key="changes")
+        self.window.after(self.CHANGE_POLL_MS, self.poll_changes)
+
+    def apply_changes(self, changes):
+        if changes is None:
+            # Изменений слишком много - открытые списки проще перечитать
+            for table_name in self.views:
+                self.reload_view(table_name)
+        elif not changes:
+            return
+        else:
+            for table_name, (rows, deleted) in changes.items():
+                view = self.views.get(table_name)
+                if view is None:
+                    continue
+                if table_name == "dishes" and self.search_var.get().strip():
+                    self.refresh_dishes()  # в режиме поиска порядок задает релевантность
+                    continue
+                for row in rows:
+                    view.upsert(row)
+                for record_id in deleted:
+                    view.remove(record_id)
+        if changes is None or "ingredients" in changes:
+            self.refresh_portions()
+        if str(self.tab_reports) not in self.tab_setups:
+            self.load_reports()
+
+    def reload_view(self, table_name):
+        if table_name == "dishes":
+            self.refresh_dishes()
+        else:
+            self.views[table_name].reset()
+
+    def report_startup(self, db_timings):
+        self.timer.mark("первая страница блюд")
+        self.timer.report(db_timings)
+
+    def setup_dishes_tab(self):
+        # Поиск по названию, описанию и ингредиентам
+        search_frame = tk.Frame(self.tab_dishes)
+        search_frame.pack(fill="x")
+        tk.Label(search_frame, text="Поиск:").pack(side="left")
+        self.search_var = tk.StringVar()
+        tk.Entry(search_frame, textvariable=self.search_var).pack(side="left", fill="x", expand=True)
+        self.search_job = None
+        self.search_var.trace_add("write", self.schedule_search)
+
+        # Таблица для блюд
+        self.dishes_tree = ttk.Treeview(self.tab_dishes,
+                                        columns=("ID", "Name", "Description", "Ingredients", "Price", "Category", "Portions"),
+                                        show='headings')
+        self.dishes_tree.heading("ID", text="ID", command=lambda: self.sort_by("id"))
+        self.dishes_tree.heading("Name", text="Название", command=lambda: self.sort_by("name"))
+        self.dishes_tree.heading("Description", text="Описание")
+        self.dishes_tree.heading("Ingredients", text="Ингредиенты")
+        self.dishes_tree.heading("Price", text="Цена", command=lambda: self.sort_by("price"))
+        self.dishes_tree.heading("Category", text="Категория", command=lambda: self.sort_by("category"))
+        self.dishes_tree.heading("Portions", text="Порций")
+        dishes_scrollbar = ttk.Scrollbar(self.tab_dishes, orient="vertical")
+        dishes_scrollbar.pack(side="right", fill="y")
+        self.dishes_tree.pack(expand=True, fill='both')
+        self.dishes_view = PagedTreeview(self.dishes_tree, None, None, scrollbar=dishes_scrollbar)
+        self.views["dishes"] = self.dishes_view
 
         # Кнопки для блюд
         button_frame = tk.Frame(self.tab_dishes)
@@ -227,32 +539,20 @@ class RestaurantApp:
             tk.Button(button_frame, text="Добавить", command=self.open_add_dish_window).pack(side="left")
             tk.Button(button_frame, text="Редактировать", command=self.open_edit_dish_window).pack(side="left")
             tk.Button(button_frame, text="Удалить", command=self.delete_dish).pack(side="left")  # Исправленная строка
+            tk.Button(button_frame, text="Цены", command=self.open_repricing_window).pack(side="left")
+        tk.Button(button_frame, text="Экспорт", command=lambda: self.export_table("dishes")).pack(side="left")
 
         self.load_dishes()
 
-    def load_dishes(self):
-        for record in self.dishes_tree.get_children():
-            self.dishes_tree.delete(record)
-        for row in self.db.fetch_all("dishes"):
-            self.dishes_tree.insert("", "end", values=row)
-
-    def delete_dish(self):
-        selected_item = self.dishes_tree.selection()
-        if not selected_item:
-            print("Не выбрано ни одного блюда для удаления.")
-            return
-
-        # Получаем ID выбранного блюда
-        dish_id = self.dishes_tree.item(selected_item)["values"][0]
+    def show_busy(self, busy):
+        # Индикатор работы фоновых запросов к базе
+        if busy:
+            self.busy_bar.start(10)
+        else:
+            self.busy_bar.stop()
 
-        # Подтверждение удаления
-        confirm = tk.messagebox.askyesno("Удаление", "Вы уверены, что хотите удалить выбранное блюдо?")
-        if confirm:
-            # Удаление записи из базы данных
-            self.db.delete_record("dishes", dish_id)
-            # Обновление списка блюд
-            self.load_dishes()
-            print(f"Блюдо с ID {dish_id} удалено.")
+    def load_dishes(self):
+        self.refresh_dishes()
 
     def open_add_dish_window(self):
         self.open_dish_window("Добавить Блюдо")
@@ -260,6 +560,144 @@ class RestaurantApp:
     def open_category_selection(self):
         category_selection_window = CategorySelectionWindow(self)
 
+    def open_repricing_window(self):
+        # Массовое изменение цен: правило по категориям, предпросмотр, применение одной транзакцией
+        # и журнал пачек с отменой
+        window = Toplevel(self.window)
+        window.title("Изменение цен")
+        window.geometry("640x560")
+        selected = {category: False for category in self.valid_categories}
+        state = {"rule": None}
+
+        form = tk.Frame(window)
+        form.pack(pady=5)
+        categories_label = tk.Label(form, text="Категории: не выбраны")
+        categories_label.grid(row=0, column=0, columnspan=2, sticky="w")
+
+        def show_categories():
+            chosen = [category for category, flag in selected.items() if flag]
+            categories_label.config(text=f"Категории: {', '.join(chosen) or 'не выбраны'}")
+
+        tk.Button(form, text="Выбрать категории", command=lambda: CategorySelectionWindow(
+            self, selected, show_categories)).grid(row=0, column=2, padx=5)
+        entries = {}
+        for row, (name, label) in enumerate((("percent", "Процент (+/-):"), ("delta", "Сдвиг на сумму (+/-):"),
+                                              ("round_to", "Округлять до (пусто - до копеек):")), start=1):
+            tk.Label(form, text=label).grid(row=row, column=0, sticky="e")
+            entries[name] = tk.Entry(form, width=12)
+            entries[name].grid(row=row, column=1, sticky="w")
+
+        preview_tree = ttk.Treeview(window, columns=("Name", "Category", "Old", "New"), show='headings', height=10)
+        for column, text, width in (("Name", "Название", 240), ("Category", "Категория", 120),
+                                    ("Old", "Было", 80), ("New", "Станет", 80)):
+            preview_tree.heading(column, text=text)
+            preview_tree.column(column, width=width)
+        summary_label = tk.Label(window)
+        batches_tree = ttk.Treeview(window, columns=("ID", "Time", "Rule", "Dishes", "Undone"), show='headings', height=5)
+        for column, text, width in (("ID", "ID", 40), ("Time", "Когда", 130), ("Rule", "Правило", 260),
+                                    ("Dishes", "Блюд", 60), ("Undone", "Отменена", 130)):
+            batches_tree.heading(column, text=text)
+            batches_tree.column(column, width=width)
+
+        def read_rule():
+            try:
+                numbers = {name: float(entry.get().replace(",", ".")) if entry.get().strip() else None
+                           for name, entry in entries.items()}
+                return PriceRule([category for category, flag in selected.items() if flag],
+                                 numbers["percent"] or 0.0, numbers["delta"] or 0.0, numbers["round_to"])
+            except ValueError as error:
+                messagebox.showerror("Ошибка", f"Неверное правило: {error}", parent=window)
+                return None
+
+        def calculate():
+            rule = read_rule()
+            if rule is None:
+                return
+            limit = self.PRICE_PREVIEW_ROWS
+
+            def load(db):
+                rows = db.reprice_preview(rule)
+                return rule, rows[:limit], len(rows), sum(row[3] for row in rows), sum(row[4] for row in rows)
+
+            self.worker.submit(load, show_preview, key="reprice-preview", read_only=True, on_error=rejected)
+
+        def rejected(error):
+            # Правило, после которого цена блюда стала бы 0 или меньше, не считается и не применяется
+            messagebox.showerror("Ошибка", str(error), parent=window)
+
+        def show_preview(result):
+            if not window.winfo_exists():
+                return
+            rule, rows, count, old_total, new_total = result
+            state["rule"] = rule
+            preview_tree.delete(*preview_tree.get_children())
+            for _, name, category, old_price, new_price in rows:
+                preview_tree.insert("", "end", values=(name, category, f"{old_price:.2f}", f"{new_price:.2f}"))
+            shown = f" (показаны первые {len(rows)})" if len(rows) < count else ""
+            summary_label.config(text=f"Изменится блюд: {count}{shown}; сумма цен {old_total:.2f} -> {new_total:.2f}")
+
+        def apply():
+            rule = state["rule"]
+            if rule is None:
+                messagebox.showinfo("Изменение цен", "Сначала посмотрите результат", parent=window)
+                return
+            if not messagebox.askyesno("Изменение цен", f"Применить: {rule.describe()}?", parent=window):
+                return
+
+            def on_applied(result):
+                state["rule"] = None
+                preview_tree.delete(*preview_tree.get_children())
+                summary_label.config(text=f"Пачка {result[0]}: изменено блюд {result[1]}")
+                self.refresh_dishes()
+                load_batches()
+
+            self.worker.submit(lambda db: db.reprice(rule), on_applied, on_error=rejected)
+
+        def undo():
+            selected_batch = batches_tree.selection()
+            if not selected_batch:
+                return
+            batch_id = batches_tree.item(selected_batch)["values"][0]
+
+            def undo_batch(db):
+                try:
+                    return db.undo_repricing(batch_id)
+                except ValueError as error:
+                    return str(error)
+
+            def on_undone(result):
+                if isinstance(result, str):
+                    messagebox.showerror("Ошибка", result, parent=window)
+                    return
+                restored, skipped = result
+                summary_label.config(text=f"Пачка {batch_id} отменена: возвращено цен {restored}"
+                                          + (f", пропущено (цена менялась позже) {skipped}" if skipped else ""))
+                self.refresh_dishes()
+                load_batches()
+
+            self.worker.submit(undo_batch, on_undone)
+
+        def load_batches():
+            self.worker.submit(lambda db: db.price_batches(), show_batches, key="price-batches", read_only=True)
+
+        def show_batches(rows):
+            if not window.winfo_exists():
+                return
+            batches_tree.delete(*batches_tree.get_children())
+            for batch_id, created_at, rule, dishes, undone_at in rows:
+                batches_tree.insert("", "end", values=(batch_id, created_at, rule, dishes, undone_at or ""))
+
+        buttons = tk.Frame(window)
+        buttons.pack(pady=5)
+        tk.Button(buttons, text="Предпросмотр", command=calculate).pack(side="left")
+        tk.Button(buttons, text="Применить", command=apply).pack(side="left", padx=5)
+        preview_tree.pack(expand=True, fill='both')
+        summary_label.pack(pady=5)
+        tk.Label(window, text="Журнал изменений цен").pack()
+        batches_tree.pack(fill='x')
+        tk.Button(window, text="Отменить пачку", command=undo).pack(pady=5)
+        load_batches()
+
     def open_edit_dish_window(self):
         selected_item = self.dishes_tree.selection()
         if selected_item:
@@ -297,59 +735,91 @@ class RestaurantApp:
         category_entry.grid(row=4, column=1, padx=5, pady=5)
 
         if dish_id:
-            dish_data = self.db.cursor.execute("SELECT * FROM dishes WHERE id=?", (dish_id,)).fetchone()
-            name_entry.insert(0, dish_data[1])
-            description_entry.insert(0, dish_data[2])
-            ingredients_entry.insert(0, dish_data[3])
-            price_entry.insert(0, dish_data[4])
-            category_entry.insert(0, dish_data[5])
+            def fill(dish_data):
+                if dish_data is None or not window.winfo_exists():
+                    return
+                name_entry.insert(0, dish_data.name)
+                description_entry.insert(0, dish_data.description)
+                ingredients_entry.insert(0, dish_data.ingredients)
+                price_entry.insert(0, dish_data.price)
+                category_entry.insert(0, dish_data.category)
+
+            self.worker.submit(lambda db: db.fetch_record("dishes", dish_id), fill, read_only=True)
 
         save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_dish(dish_id, name_entry.get(), description_entry.get(), ingredients_entry.get(), price_entry.get(), category_entry.get()))
         save_button.grid(row=5, column=0, columnspan=2, pady=10)
 
     def save_dish(self, dish_id, name, description, ingredients, price, category):
-        if dish_id:
-            self.db.update_record("dishes",
-                                  {'id': dish_id, 'name': name, 'description': description, 'ingredients': ingredients,
-                                   'price': price, 'category': category})
-        else:
-            self.db.add_record("dishes", (name, description, ingredients, price, category))
-        self.load_dishes()
+        def save(db):
+            if dish_id:
+                row = db.update_record("dishes", {'id': dish_id, 'name': name, 'description': description, 'ingredients': ingredients, 'price': price, 'category': category})
+            else:
+                row = db.add_record("dishes", (name, description, ingredients, price, category))
+            return db.with_portions([row])[0] if row else row
 
-    # Здесь также должны быть другие методы класса RestaurantApp для работы с другими вкладками, как в оригинальном коде
+        self.worker.submit(save, self.on_dish_saved)
 
-    def save_dish(self, dish_id, name, description, ingredients, price, category):
-        if dish_id:
-            self.db.update_record("dishes", {'id': dish_id, 'name': name, 'description': description, 'ingredients': ingredients, 'price': price, 'category': category})
-        else:
-            self.db.add_record("dishes", (name, description, ingredients, price, category))
-        self.load_dishes()
+    def on_dish_saved(self, row):
+        if self.search_var.get().strip():
+            self.refresh_dishes()  # в режиме поиска порядок задает релевантность - повторяем поиск
+        elif row:
+            self.dishes_view.upsert(row)
 
     def refresh_dishes(self):
-        if self.selected_categories:
-            category_filter = [category for category, selected in self.selected_categories.items() if selected]
-            if category_filter:
-                dishes = self.db.fetch_all_dishes(category_filter=category_filter)
-                self.display_dishes(dishes)
-            else:
-                self.display_dishes([])
+        # Перезапуск виртуального списка с текущими сортировкой и фильтром категорий
+        order_by, ascending = self.dishes_order_by, self.dishes_ascending
+        category_filter = [category for category, selected in self.selected_categories.items() if selected]
+        search_text = self.search_var.get().strip()
+        index = Database.DISH_COLUMNS.index(order_by)
+        if search_text:
+            # Результаты поиска приходят одной страницей, отсортированной по релевантности
+            def fetch_page(after, limit, deliver):
+                if after:
+                    deliver([])
+                else:
+                    self.worker.submit(lambda db: db.with_portions(db.search_dishes(search_text, limit, category_filter)),
+                                       deliver, key="dishes-page", read_only=True)
+
+            self.dishes_view.configure(fetch_page, lambda row: (0, row[0]))
         else:
-            dishes = self.db.fetch_all_dishes()
-            self.display_dishes(dishes)
+            def fetch(db, after, limit):
+                # Первая страница приходит из базы по индексу, кэш блюд прогревается к следующим;
+                # записи в dishes он дальше переживает, обновляясь на месте
+                if after is not None:
+                    db.warm_dish_cache()
+                return db.with_portions(db.fetch_page("dishes", order_by, ascending, after, limit, category_filter))
+
+            # Повторные клики по заголовку отменяют ещё не выполненные запросы (общий key)
+            self.dishes_view.configure(
+                lambda after, limit, deliver: self.worker.submit(lambda db: fetch(db, after, limit),
+                                                                 deliver, key="dishes-page"),
+                lambda row: (row[index] if row[index] is not None else "", row[0]),
+                ascending, lambda row: row[5] in category_filter)
+        self.dishes_view.reset()
+
+    def refresh_portions(self):
+        # Остатки на складе изменились - обновляем колонку "Порций" у загруженных строк без перезагрузки списка
+        def apply(portions):
+            for iid in self.dishes_tree.get_children():
+                self.dishes_tree.set(iid, "Portions", portions.get(int(iid), ""))
+
+        self.worker.submit(lambda db: db.dish_portions(), apply, key="dish-portions", read_only=True)
+
+    def schedule_search(self, *args):
+        # Запрос уходит только после паузы в наборе, а не на каждую нажатую клавишу
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(self.SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        self.refresh_dishes()
 
     def sort_by(self, column):
         self.sort_order[column] = not self.sort_order[column]
-        dishes = self.db.fetch_all_dishes(order_by=column, ascending=self.sort_order[column],
-                                          category_filter=[category for category, selected in
-                                                           self.selected_categories.items() if selected])
-        self.display_dishes(dishes)
-
-    def display_dishes(self, dishes):
-        for i in self.dishes_tree.get_children():
-            self.dishes_tree.delete(i)
-
-        for dish in dishes:
-            self.dishes_tree.insert("", "end", values=dish)
+        self.dishes_order_by = column
+        self.dishes_ascending = self.sort_order[column]
+        self.refresh_dishes()
 
     def delete_dish(self):
         selected_item = self.dishes_tree.selection()
@@ -363,21 +833,59 @@ class RestaurantApp:
         # Подтверждение удаления
         confirm = tk.messagebox.askyesno("Удаление", "Вы уверены, что хотите удалить выбранное блюдо?")
         if confirm:
-            # Удаление записи из базы данных
-            self.db.delete_record("dishes", dish_id)
-            # Обновление списка блюд
-            self.load_dishes()
-            print(f"Блюдо с ID {dish_id} удалено.")
+            # Удаление записи из базы данных и обновление списка блюд
+            self.worker.submit(lambda db: db.delete_record("dishes", dish_id), lambda _: self.on_dish_deleted(dish_id))
+
+    def on_dish_deleted(self, dish_id):
+        self.dishes_view.remove(dish_id)
+        print(f"Блюдо с ID {dish_id} удалено.")
+
+    def export_table(self, table_name):
+        # Выгрузка всей таблицы, для блюд - с текущими сортировкой и фильтром категорий,
+        # для броней - в выбранном на вкладке режиме
+        path = filedialog.asksaveasfilename(parent=self.window, title="Экспорт", initialfile=f"{table_name}.csv",
+                                            defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        options = {}
+        if table_name == "dishes":
+            options = {"order_by": self.dishes_order_by, "ascending": self.dishes_ascending,
+                       "row_filter": [category for category, selected in self.selected_categories.items()
+                                      if selected]}
+        elif table_name == "reservations":
+            table_name, options["row_filter"] = self.reservations_source()
+        ExportWindow(self.window, ExportJob(self.worker.database_factory, table_name, path, **options))
+
+    def make_paged_view(self, tree, table_name, row_tags=None):
+        # Виртуальный список по id для вкладок без сортировки
+        view = PagedTreeview(tree, lambda after, limit, deliver: self.worker.submit(
+                                 lambda db: db.fetch_page(table_name, after=after, limit=limit),
+                                 deliver, key=f"{table_name}-page", read_only=True),
+                             lambda row: (row[0], row[0]), row_tags=row_tags)
+        self.views[table_name] = view
+        return view
 
     def setup_reservations_tab(self):
+        # По умолчанию видны только брони с сегодняшнего дня, прошлые и архив - по выбору
+        scope_frame = tk.Frame(self.tab_reservations)
+        scope_frame.pack(fill="x")
+        tk.Label(scope_frame, text="Показывать:").pack(side="left")
+        self.reservations_scope = ttk.Combobox(scope_frame, values=list(self.RESERVATION_SCOPES), state="readonly")
+        self.reservations_scope.set("Предстоящие")
+        self.reservations_scope.pack(side="left")
+        self.reservations_scope.bind("<<ComboboxSelected>>", lambda event: self.load_reservations())
+
         # Таблица для бронирований
-        self.reservations_tree = ttk.Treeview(self.tab_reservations, columns=("ID", "Customer Name", "Reservation Date", "Guests", "Table Number"), show='headings')
+        self.reservations_tree = ttk.Treeview(self.tab_reservations, columns=("ID", "Customer Name", "Reservation Date", "Guests", "Table Number", "Duration"), show='headings')
         self.reservations_tree.heading("ID", text="ID")
         self.reservations_tree.heading("Customer Name", text="Имя клиента")
         self.reservations_tree.heading("Reservation Date", text="Дата бронирования")
         self.reservations_tree.heading("Guests", text="Количество гостей")
         self.reservations_tree.heading("Table Number", text="Номер стола")
+        self.reservations_tree.heading("Duration", text="Длительность, мин")
         self.reservations_tree.pack(expand=True, fill='both')
+        self.reservations_view = self.make_paged_view(self.reservations_tree, "reservations")
 
         # Кнопки для бронирований
         button_frame = tk.Frame(self.tab_reservations)
@@ -387,14 +895,54 @@ class RestaurantApp:
             tk.Button(button_frame, text="Добавить", command=self.open_add_reservation_window).pack(side="left")
             tk.Button(button_frame, text="Редактировать", command=self.open_edit_reservation_window).pack(side="left")
             tk.Button(button_frame, text="Удалить", command=self.delete_reservation).pack(side="left")
+        tk.Button(button_frame, text="Свободные столы", command=self.open_free_tables_window).pack(side="left")
+        tk.Button(button_frame, text="Авторассадка", command=self.open_seating_window).pack(side="left")
+        if self.user_role == "admin":
+            tk.Button(button_frame, text="Столы", command=self.open_tables_window).pack(side="left")
+        tk.Button(button_frame, text="Экспорт", command=lambda: self.export_table("reservations")).pack(side="left")
+        if self.user_role == "admin":
+            tk.Button(button_frame, text="Архив", command=self.archive_history).pack(side="left")
 
         self.load_reservations()
 
+    def reservations_source(self):
+        # (таблица или представление, начало списка в секундах или None) для выбранного режима
+        table_name, upcoming = self.RESERVATION_SCOPES[self.reservations_scope.get()]
+        return table_name, parse_reservation_date(time.strftime("%Y-%m-%d 00:00")) if upcoming else None
+
     def load_reservations(self):
-        for record in self.reservations_tree.get_children():
-            self.reservations_tree.delete(record)
-        for row in self.db.fetch_all("reservations"):
-            self.reservations_tree.insert("", "end", values=row)
+        table_name, since = self.reservations_source()
+        if table_name != "reservations" and not self.archive_attached:
+            # Архив подключается один раз задачей писателя (ATTACH и таблицы архива меняют
+            # соединения и файл), а листание страниц остаётся чтением. У DbWorker приложения
+            # нет пула читателей, поэтому чтения идут в той же Database, где подключён архив
+            def attached(_):
+                self.archive_attached = True
+                self.load_reservations()
+
+            self.worker.submit(lambda db: db.attach_archive(), attached, key="attach-archive")
+            return
+
+        def fetch_page(after, limit, deliver):
+            self.worker.submit(lambda db: db.fetch_page(table_name, after=after, limit=limit, row_filter=since),
+                               deliver, key="reservations-page", read_only=True)
+
+        accept = None if since is None else (lambda row: row.start_at is None or row.start_at >= since)
+        self.reservations_view.configure(fetch_page, lambda row: (row[0], row[0]), accept=accept)
+        self.reservations_view.reset()
+
+    def archive_history(self):
+        days = simpledialog.askinteger("Архив", "Перенести в архив брони и заказы старше, дней:",
+                                       parent=self.window, initialvalue=DEFAULT_AGE_DAYS, minvalue=1)
+        if not days:
+            return
+
+        def on_archived(moved):
+            messagebox.showinfo("Архив", "Перенесено в архив: " + ", ".join(
+                f"{table_name} - {count}" for table_name, count in moved.items()))
+            self.load_reservations()
+
+        self.worker.submit(lambda db: archive_history(db, days), on_archived)
 
     def open_add_reservation_window(self):
         self.open_reservation_window("Добавить Бронирование")
@@ -408,13 +956,13 @@ class RestaurantApp:
     def open_reservation_window(self, title, reservation_id=None):
         window = Toplevel(self.window)
         window.title(title)
-        window.geometry("300x250")
+        window.geometry("300x320")
 
         tk.Label(window, text="Имя клиента:").pack(pady=5)
         customer_name_entry = tk.Entry(window)
         customer_name_entry.pack(pady=5)
 
-        tk.Label(window, text="Дата бронирования:").pack(pady=5)
+        tk.Label(window, text="Дата бронирования (ГГГГ-ММ-ДД ЧЧ:ММ):").pack(pady=5)
         reservation_date_entry = tk.Entry(window)
         reservation_date_entry.pack(pady=5)
 
@@ -426,38 +974,277 @@ class RestaurantApp:
         table_number_entry = tk.Entry(window)
         table_number_entry.pack(pady=5)
 
+        tk.Label(window, text="Длительность, мин:").pack(pady=5)
+        duration_entry = tk.Entry(window)
+        duration_entry.pack(pady=5)
+
         if reservation_id:
-            reservation_data = self.db.cursor.execute("SELECT * FROM reservations WHERE id=?", (reservation_id,)).fetchone()
-            customer_name_entry.insert(0, reservation_data[1])
-            reservation_date_entry.insert(0, reservation_data[2])
-            guests_entry.insert(0, reservation_data[3])
-            table_number_entry.insert(0, reservation_data[4])
+            def fill(reservation_data):
+                if reservation_data is None or not window.winfo_exists():
+                    return
+                customer_name_entry.insert(0, reservation_data.customer_name)
+                reservation_date_entry.insert(0, reservation_data.reservation_date)
+                guests_entry.insert(0, reservation_data.number_of_guests)
+                table_number_entry.insert(0, reservation_data.table_number)
+                duration_entry.insert(0, reservation_data.duration_minutes)
+
+            self.worker.submit(lambda db: db.fetch_record("reservations", reservation_id), fill, read_only=True)
+        else:
+            duration_entry.insert(0, DEFAULT_DURATION)
 
-        save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_reservation(reservation_id, customer_name_entry.get(), reservation_date_entry.get(), guests_entry.get(), table_number_entry.get()))
+        save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_reservation(reservation_id, customer_name_entry.get(), reservation_date_entry.get(), guests_entry.get(), table_number_entry.get(), duration_entry.get()))
         save_button.pack(pady=5)
 
-    def save_reservation(self, reservation_id, customer_name, reservation_date, guests, table_number):
-        if reservation_id:
-            self.db.update_record("reservations", {'id': reservation_id, 'customer_name': customer_name, 'reservation_date': reservation_date, 'number_of_guests': guests, 'table_number': table_number})
-        else:
-            self.db.add_record("reservations", (customer_name, reservation_date, guests, table_number))
-        self.load_reservations()
+    def save_reservation(self, reservation_id, customer_name, reservation_date, guests, table_number, duration=DEFAULT_DURATION):
+        try:
+            start_at = parse_reservation_date(reservation_date)
+            table_number, duration, guest_count = int(table_number), int(duration), int(guests)
+        except ValueError as error:
+            messagebox.showerror("Ошибка", f"Неверные данные бронирования: {error}")
+            return
+
+        def save(db):
+            # Двойное бронирование одного стола и компанию больше стола не допускаем: проверка
+            # и запись идут в одной транзакции базы (Database.save_reservation)
+            fields = {'customer_name': customer_name, 'reservation_date': reservation_date, 'number_of_guests': guest_count,
+                      'table_number': table_number, 'duration_minutes': duration}
+            try:
+                return None, db.save_reservation(fields, reservation_id)
+            except ReservationConflict as error:
+                return str(error), None
+
+        def on_saved(result):
+            error, row = result
+            if error:
+                messagebox.showerror("Ошибка", error)
+            elif row:
+                self.reservations_view.upsert(row)
+
+        self.worker.submit(save, on_saved)
+
+    def open_free_tables_window(self):
+        window = Toplevel(self.window)
+        window.title("Свободные столы")
+        window.geometry("420x350")
+
+        form = tk.Frame(window)
+        form.pack(pady=5)
+        tk.Label(form, text="Дата и время:").grid(row=0, column=0, sticky="e")
+        date_entry = tk.Entry(form)
+        date_entry.grid(row=0, column=1)
+        tk.Label(form, text="Гостей:").grid(row=1, column=0, sticky="e")
+        guests_entry = tk.Entry(form)
+        guests_entry.grid(row=1, column=1)
+        tk.Label(form, text="Длительность, мин:").grid(row=2, column=0, sticky="e")
+        duration_entry = tk.Entry(form)
+        duration_entry.insert(0, DEFAULT_DURATION)
+        duration_entry.grid(row=2, column=1)
+
+        result_tree = ttk.Treeview(window, columns=("Table", "Slots"), show='headings')
+        result_tree.heading("Table", text="Стол")
+        result_tree.heading("Slots", text="Свободные окна до конца дня")
+        result_tree.column("Table", width=60)
+
+        def search():
+            try:
+                start_at = parse_reservation_date(date_entry.get())
+                guests = int(guests_entry.get()) if guests_entry.get().strip() else None
+                duration = int(duration_entry.get())
+            except ValueError as error:
+                messagebox.showerror("Ошибка", str(error), parent=window)
+                return
+            end_of_day = start_at - start_at % 86400 + 86400
+            self.worker.submit(lambda db: (db.free_tables(start_at, duration, guests),
+                                           db.free_slots(start_at, end_of_day, duration, guests)),
+                               show, key="free-tables")
+
+        def show(result):
+            if not window.winfo_exists():
+                return
+            free_tables, slots = result
+            result_tree.delete(*result_tree.get_children())
+            for table_number in free_tables:
+                windows = ", ".join(f"{format_timestamp(start)[11:]}-{format_timestamp(end)[11:]}"
+                                    for start, end in slots.get(table_number, []))
+                result_tree.insert("", "end", values=(table_number, windows))
+
+        tk.Button(form, text="Найти", command=search).grid(row=3, column=0, columnspan=2, pady=5)
+        result_tree.pack(expand=True, fill='both')
+
+    def open_seating_window(self):
+        # Предпросмотр автоматической рассадки на день; применяет план только администратор
+        window = Toplevel(self.window)
+        window.title("Авторассадка")
+        window.geometry("640x420")
+
+        form = tk.Frame(window)
+        form.pack(pady=5)
+        tk.Label(form, text="День (ГГГГ-ММ-ДД):").pack(side="left")
+        day_entry = tk.Entry(form, width=12)
+        day_entry.insert(0, time.strftime("%Y-%m-%d"))
+        day_entry.pack(side="left")
+
+        plan_tree = ttk.Treeview(window, columns=("Time", "Name", "Guests", "Current", "New"), show='headings')
+        plan_tree.heading("Time", text="Время")
+        plan_tree.heading("Name", text="Имя клиента")
+        plan_tree.heading("Guests", text="Гостей")
+        plan_tree.heading("Current", text="Сейчас")
+        plan_tree.heading("New", text="По плану")
+        for column, width in (("Time", 90), ("Guests", 60), ("Current", 80), ("New", 80)):
+            plan_tree.column(column, width=width)
+        plan_tree.tag_configure("moved", background="#fff2cc")
+        plan_tree.tag_configure("unseated", background="#ffd6d6")
+        summary_label = tk.Label(window)
+        state = {"plan": None}
+
+        def tables_text(tables):
+            return "+".join(map(str, tables)) if tables else "-"
+
+        def calculate():
+            day = day_entry.get().strip()
+            try:
+                parse_reservation_date(f"{day} 00:00")
+            except ValueError as error:
+                messagebox.showerror("Ошибка", str(error), parent=window)
+                return
+
+            def load(db):
+                plan = db.seating_plan(day)
+                rows = db.reservations.get_many([reservation[0] for reservation in plan.reservations])
+                return plan, {row.id: row.customer_name for row in rows}
+
+            self.worker.submit(load, show, key="seating", read_only=True)
+
+        def show(result):
+            if not window.winfo_exists():
+                return
+            plan, names = result
+            state["plan"] = plan
+            changed = set(plan.changed())
+            plan_tree.delete(*plan_tree.get_children())
+            for reservation_id, guests, start, end, _ in plan.reservations:
+                new_tables = plan.assignments.get(reservation_id)
+                tags = ("unseated",) if new_tables is None else ("moved",) if reservation_id in changed else ()
+                plan_tree.insert("", "end", values=(f"{format_timestamp(start)[11:]}-{format_timestamp(end)[11:]}",
+                                                    names.get(reservation_id, ""), guests,
+                                                    tables_text(plan.current.get(reservation_id)),
+                                                    tables_text(new_tables) if new_tables else "нет места"), tags=tags)
+            summary_label.config(text=f"Рассажено гостей: {plan.seated_guests} из {plan.total_guests}, "
+                                      f"переносов: {len(changed)}, без места: {len(plan.unseated)}, "
+                                      f"расчёт {plan.seconds * 1000:.0f} мс")
+
+        def apply():
+            plan = state["plan"]
+            if plan is None or not plan.changed():
+                return
+
+            def on_applied(count):
+                state["plan"] = None
+                self.load_reservations()
+                messagebox.showinfo("Авторассадка", f"Перенесено броней: {count}", parent=window)
+                calculate()
+
+            def apply_plan(db):
+                try:
+                    return len(db.apply_seating(plan))
+                except ValueError as error:
+                    return str(error)
+
+            self.worker.submit(apply_plan, lambda result: on_applied(result) if isinstance(result, int)
+                               else messagebox.showerror("Ошибка", result, parent=window))
+
+        tk.Button(form, text="Рассчитать", command=calculate).pack(side="left", padx=5)
+        if self.user_role == "admin":
+            tk.Button(form, text="Применить", command=apply).pack(side="left")
+        plan_tree.pack(expand=True, fill='both')
+        summary_label.pack(pady=5)
+        calculate()
+
+    def open_tables_window(self):
+        # Столы зала: вместимость и соседние столы, которые можно сдвинуть
+        window = Toplevel(self.window)
+        window.title("Столы")
+        window.geometry("420x400")
+
+        tables_tree = ttk.Treeview(window, columns=("Number", "Capacity", "Neighbours"), show='headings')
+        tables_tree.heading("Number", text="Стол")
+        tables_tree.heading("Capacity", text="Мест")
+        tables_tree.heading("Neighbours", text="Соседние столы")
+        tables_tree.column("Number", width=60)
+        tables_tree.column("Capacity", width=60)
+        tables_tree.pack(expand=True, fill='both')
+
+        form = tk.Frame(window)
+        form.pack(pady=5)
+        tk.Label(form, text="Стол:").grid(row=0, column=0, sticky="e")
+        number_entry = tk.Entry(form)
+        number_entry.grid(row=0, column=1)
+        tk.Label(form, text="Мест:").grid(row=1, column=0, sticky="e")
+        capacity_entry = tk.Entry(form)
+        capacity_entry.grid(row=1, column=1)
+        tk.Label(form, text="Соседние (через запятую):").grid(row=2, column=0, sticky="e")
+        neighbours_entry = tk.Entry(form)
+        neighbours_entry.grid(row=2, column=1)
+
+        def load():
+            self.worker.submit(lambda db: db.fetch_tables(), show, key="tables", read_only=True)
+
+        def show(tables):
+            if not window.winfo_exists():
+                return
+            tables_tree.delete(*tables_tree.get_children())
+            for number, capacity, neighbours in tables:
+                tables_tree.insert("", "end", values=(number, capacity, ", ".join(map(str, neighbours))))
+
+        def on_select(event=None):
+            selected_item = tables_tree.selection()
+            if selected_item:
+                values = tables_tree.item(selected_item)["values"]
+                for entry, value in zip((number_entry, capacity_entry, neighbours_entry), values):
+                    entry.delete(0, tk.END)
+                    entry.insert(0, value)
+
+        def save():
+            try:
+                number, capacity = int(number_entry.get()), int(capacity_entry.get())
+                neighbours = [int(value) for value in neighbours_entry.get().replace(",", " ").split()]
+                if number <= 0 or capacity <= 0:
+                    raise ValueError("номер стола и число мест должны быть больше нуля")
+            except ValueError as error:
+                messagebox.showerror("Ошибка", f"Неверные данные стола: {error}", parent=window)
+                return
+            self.worker.submit(lambda db: db.save_table(number, capacity, neighbours), lambda _: load())
+
+        def delete():
+            selected_item = tables_tree.selection()
+            if selected_item:
+                number = tables_tree.item(selected_item)["values"][0]
+                self.worker.submit(lambda db: db.delete_table(number), lambda _: load())
+
+        tables_tree.bind("<<TreeviewSelect>>", on_select)
+        tk.Button(form, text="Сохранить", command=save).grid(row=3, column=0, pady=5)
+        tk.Button(form, text="Удалить", command=delete).grid(row=3, column=1, pady=5)
+        load()
 
     def delete_reservation(self):
         selected_item = self.reservations_tree.selection()
         if selected_item:
             reservation_id = self.reservations_tree.item(selected_item)["values"][0]
-            self.db.delete_record("reservations", reservation_id)
-            self.load_reservations()
+            self.worker.submit(lambda db: db.delete_record("reservations", reservation_id),
+                               lambda _: self.reservations_view.remove(reservation_id))
 
     def setup_ingredients_tab(self):
         # Таблица для остатков ингредиентов
-        self.ingredients_tree = ttk.Treeview(self.tab_ingredients, columns=("ID", "Name", "Quantity", "Unit"), show='headings')
+        self.ingredients_tree = ttk.Treeview(self.tab_ingredients, columns=("ID", "Name", "Quantity", "Unit", "Reorder"), show='headings')
         self.ingredients_tree.heading("ID", text="ID")
         self.ingredients_tree.heading("Name", text="Название")
         self.ingredients_tree.heading("Quantity", text="Количество")
         self.ingredients_tree.heading("Unit", text="Единица измерения")
+        self.ingredients_tree.heading("Reorder", text="Порог дозаказа")
+        self.ingredients_tree.tag_configure("low_stock", background="#f8d7da")
         self.ingredients_tree.pack(expand=True, fill='both')
+        self.ingredients_view = self.make_paged_view(self.ingredients_tree, "ingredients",
+                                                     lambda row: ("low_stock",) if is_low_stock(row) else ())
 
         # Кнопки для остатков
         button_frame = tk.Frame(self.tab_ingredients)
@@ -467,14 +1254,13 @@ class RestaurantApp:
             tk.Button(button_frame, text="Добавить", command=self.open_add_ingredient_window).pack(side="left")
             tk.Button(button_frame, text="Редактировать", command=self.open_edit_ingredient_window).pack(side="left")
             tk.Button(button_frame, text="Удалить", command=self.delete_ingredient).pack(side="left")
+        tk.Button(button_frame, text="Заканчиваются", command=self.open_low_stock_window).pack(side="left")
+        tk.Button(button_frame, text="Экспорт", command=lambda: self.export_table("ingredients")).pack(side="left")
 
         self.load_ingredients()
 
     def load_ingredients(self):
-        for record in self.ingredients_tree.get_children():
-            self.ingredients_tree.delete(record)
-        for row in self.db.fetch_all("ingredients"):
-            self.ingredients_tree.insert("", "end", values=row)
+        self.ingredients_view.reset()
 
     def open_add_ingredient_window(self):
         self.open_ingredient_window("Добавить Ингредиент")
@@ -502,28 +1288,90 @@ class RestaurantApp:
         unit_entry = tk.Entry(window)
         unit_entry.pack(pady=5)
 
+        tk.Label(window, text="Порог дозаказа:").pack(pady=5)
+        reorder_entry = tk.Entry(window)
+        reorder_entry.pack(pady=5)
+
         if ingredient_id:
-            ingredient_data = self.db.cursor.execute("SELECT * FROM ingredients WHERE id=?", (ingredient_id,)).fetchone()
-            name_entry.insert(0, ingredient_data[1])
-            quantity_entry.insert(0, ingredient_data[2])
-            unit_entry.insert(0, ingredient_data[3])
+            def fill(ingredient_data):
+                if ingredient_data is None or not window.winfo_exists():
+                    return
+                name_entry.insert(0, ingredient_data.name)
+                quantity_entry.insert(0, ingredient_data.quantity)
+                unit_entry.insert(0, ingredient_data.unit)
+                reorder_entry.insert(0, ingredient_data.reorder_level)
 
-        save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_ingredient(ingredient_id, name_entry.get(), quantity_entry.get(), unit_entry.get()))
+            self.worker.submit(lambda db: db.fetch_record("ingredients", ingredient_id), fill, read_only=True)
+
+        save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_ingredient(ingredient_id, name_entry.get(), quantity_entry.get(), unit_entry.get(), reorder_entry.get()))
         save_button.pack(pady=5)
 
-    def save_ingredient(self, ingredient_id, name, quantity, unit):
-        if ingredient_id:
-            self.db.update_record("ingredients", {'id': ingredient_id, 'name': name, 'quantity': quantity, 'unit': unit})
-        else:
-            self.db.add_record("ingredients", (name, quantity, unit))
-        self.load_ingredients()
+    def save_ingredient(self, ingredient_id, name, quantity, unit, reorder_level=""):
+        reorder_level = reorder_level.strip() or 0
+
+        def save(db):
+            if ingredient_id:
+                return db.update_record("ingredients", {'id': ingredient_id, 'name': name, 'quantity': quantity, 'unit': unit, 'reorder_level': reorder_level})
+            return db.add_record("ingredients", (name, quantity, unit, reorder_level))
+
+        self.worker.submit(save, self.on_ingredient_saved)
+
+    def on_ingredient_saved(self, row):
+        if row:
+            self.ingredients_view.upsert(row)
+        self.refresh_portions()
+        self.check_low_stock(reschedule=False)
+
+    def check_low_stock(self, reschedule=True):
+        # Список тревог ведут триггеры; здесь забираем только новые записи из него
+        def deliver(alerts):
+            for ingredient_id, _, quantity, *_ in alerts:
+                iid = str(ingredient_id)
+                if self.ingredients_tree is not None and self.ingredients_tree.exists(iid):
+                    self.ingredients_tree.set(iid, "Quantity", quantity)
+                    self.ingredients_tree.item(iid, tags=("low_stock",))
+            if alerts:
+                for hook in self.low_stock_hooks:
+                    hook(alerts)
+
+        self.worker.submit(lambda db: db.take_low_stock_alerts(), deliver)
+        if reschedule:
+            self.window.after(self.LOW_STOCK_POLL_MS, self.check_low_stock)
+
+    def show_low_stock_alerts(self, alerts):
+        lines = [f"{name}: {quantity:g} {unit} (порог {reorder_level:g})"
+                 for _, name, quantity, reorder_level, unit, _ in alerts[:15]]
+        if len(alerts) > 15:
+            lines.append(f"... и ещё {len(alerts) - 15}")
+        messagebox.showwarning("Заканчиваются продукты", "\n".join(lines))
+
+    def open_low_stock_window(self):
+        window = Toplevel(self.window)
+        window.title("Заканчивающиеся продукты")
+        window.geometry("500x300")
+        tree = ttk.Treeview(window, columns=("ID", "Name", "Quantity", "Reorder", "Unit", "Since"), show='headings')
+        for column, text in zip(tree["columns"], ("ID", "Название", "Остаток", "Порог", "Ед.", "С")):
+            tree.heading(column, text=text)
+        tree.pack(expand=True, fill='both')
+
+        def show(rows):
+            if not window.winfo_exists():
+                return
+            for row in rows:
+                tree.insert("", "end", values=row)
+
+        self.worker.submit(lambda db: db.low_stock(), show, read_only=True)
 
     def delete_ingredient(self):
         selected_item = self.ingredients_tree.selection()
         if selected_item:
             ingredient_id = self.ingredients_tree.item(selected_item)["values"][0]
-            self.db.delete_record("ingredients", ingredient_id)
-            self.load_ingredients()
+            self.worker.submit(lambda db: db.delete_record("ingredients", ingredient_id),
+                               lambda _: self.on_ingredient_deleted(ingredient_id))
+
+    def on_ingredient_deleted(self, ingredient_id):
+        self.ingredients_view.remove(ingredient_id)
+        self.refresh_portions()
 
     def setup_staff_tab(self):
         # Таблица для персонала
@@ -534,6 +1382,7 @@ class RestaurantApp:
         self.staff_tree.heading("Salary", text="Зарплата")
         self.staff_tree.heading("Hire Date", text="Дата приема на работу")
         self.staff_tree.pack(expand=True, fill='both')
+        self.staff_view = self.make_paged_view(self.staff_tree, "staff")
 
         # Кнопки для персонала
         button_frame = tk.Frame(self.tab_staff)
@@ -543,14 +1392,15 @@ class RestaurantApp:
             tk.Button(button_frame, text="Добавить", command=self.open_add_staff_window).pack(side="left")
             tk.Button(button_frame, text="Редактировать", command=self.open_edit_staff_window).pack(side="left")
             tk.Button(button_frame, text="Удалить", command=self.delete_staff).pack(side="left")
+        tk.Button(button_frame, text="Смены", command=self.open_shifts_window).pack(side="left")
+        if self.user_role == "admin":
+            tk.Button(button_frame, text="Зарплата", command=self.open_payroll_window).pack(side="left")
+        tk.Button(button_frame, text="Экспорт", command=lambda: self.export_table("staff")).pack(side="left")
 
         self.load_staff()
 
     def load_staff(self):
-        for record in self.staff_tree.get_children():
-            self.staff_tree.delete(record)
-        for row in self.db.fetch_all("staff"):
-            self.staff_tree.insert("", "end", values=row)
+        self.staff_view.reset()
 
     def open_add_staff_window(self):
         self.open_staff_window("Добавить Персонал")
@@ -583,40 +1433,239 @@ class RestaurantApp:
         hire_date_entry.pack(pady=5)
 
         if staff_id:
-            staff_data = self.db.cursor.execute("SELECT * FROM staff WHERE id=?", (staff_id,)).fetchone()
-            name_entry.insert(0, staff_data[1])
-            position_entry.insert(0, staff_data[2])
-            salary_entry.insert(0, staff_data[3])
-            hire_date_entry.insert(0, staff_data[4])
+            def fill(staff_data):
+                if staff_data is None or not window.winfo_exists():
+                    return
+                name_entry.insert(0, staff_data.name)
+                position_entry.insert(0, staff_data.position)
+                salary_entry.insert(0, staff_data.salary)
+                hire_date_entry.insert(0, staff_data.hire_date)
+
+            self.worker.submit(lambda db: db.fetch_record("staff", staff_id), fill, read_only=True)
 
         save_button = tk.Button(window, text="Сохранить", command=lambda: self.save_staff(staff_id, name_entry.get(), position_entry.get(), salary_entry.get(), hire_date_entry.get()))
         save_button.pack(pady=5)
 
     def save_staff(self, staff_id, name, position, salary, hire_date):
-        if staff_id:
-            self.db.update_record("staff", {'id': staff_id, 'name': name, 'position': position, 'salary': salary, 'hire_date': hire_date})
-        else:
-            self.db.add_record("staff", (name, position, salary, hire_date))
-        self.load_staff()
+        def save(db):
+            if staff_id:
+                return db.update_record("staff", {'id': staff_id, 'name': name, 'position': position, 'salary': salary, 'hire_date': hire_date})
+            return db.add_record("staff", (name, position, salary, hire_date))
+
+        self.worker.submit(save, lambda row: row and self.staff_view.upsert(row))
 
     def delete_staff(self):
         selected_item = self.staff_tree.selection()
         if selected_item:
             staff_id = self.staff_tree.item(selected_item)["values"][0]
-            self.db.delete_record("staff", staff_id)
-            self.load_staff()
+            self.worker.submit(lambda db: db.delete_record("staff", staff_id),
+                               lambda _: self.staff_view.remove(staff_id))
+
+    def period_form(self, window, first_day, last_day, on_show):
+        # Поля "с ... по ..." (дни ГГГГ-ММ-ДД) и кнопка "Показать"; on_show(первый, последний день).
+        # Возвращает функцию, которая перечитывает период из полей
+        form = tk.Frame(window)
+        form.pack(pady=5)
+        entries = []
+        for label, value in (("С:", first_day), ("по:", last_day)):
+            tk.Label(form, text=label).pack(side="left")
+            entry = tk.Entry(form, width=12)
+            entry.insert(0, value.isoformat())
+            entry.pack(side="left", padx=2)
+            entries.append(entry)
+
+        def show():
+            days = [entry.get().strip() for entry in entries]
+            try:
+                for day in days:
+                    parse_reservation_date(f"{day} 00:00")
+            except ValueError as error:
+                messagebox.showerror("Ошибка", str(error), parent=window)
+                return
+            on_show(*days)
+
+        tk.Button(form, text="Показать", command=show).pack(side="left", padx=5)
+        return show
+
+    def open_shifts_window(self):
+        # График смен за период: всех сотрудников или выбранного во вкладке; смены правит администратор
+        staff = None
+        selected_item = self.staff_tree.selection()
+        if selected_item:
+            staff = self.staff_tree.item(selected_item)["values"][:2]
+        window = Toplevel(self.window)
+        window.title(f"Смены: {staff[1]}" if staff else "Смены")
+        window.geometry("640x420")
+        monday = date.today() - timedelta(days=date.today().weekday())
+
+        shifts_tree = ttk.Treeview(window, columns=("ID", "Day", "Time", "Name", "Position", "Hours"), show='headings')
+        for column, text, width in (("ID", "ID", 50), ("Day", "День", 90), ("Time", "Время", 110),
+                                    ("Name", "Имя", 160), ("Position", "Должность", 110), ("Hours", "Часов", 60)):
+            shifts_tree.heading(column, text=text)
+            shifts_tree.column(column, width=width)
+        total_label = tk.Label(window)
+
+        def load(first_day, last_day):
+            staff_id = staff[0] if staff else None
+            self.worker.submit(lambda db: db.fetch_shifts(first_day, last_day, staff_id), show_shifts,
+                               key="shifts", read_only=True)
+
+        def show_shifts(rows):
+            if not window.winfo_exists():
+                return
+            shifts_tree.delete(*shifts_tree.get_children())
+            hours = 0
+            for shift_id, _, name, position, start_at, end_at in rows:
+                start, end = format_timestamp(start_at), format_timestamp(end_at)
+                hours += (end_at - start_at) / 3600
+                shifts_tree.insert("", "end", values=(shift_id, start[:10], f"{start[11:]}-{end[11:]}", name, position,
+                                                      f"{(end_at - start_at) / 3600:g}"))
+            total_label.config(text=f"Смен: {len(rows)}, часов: {hours:g}")
+
+        reload = self.period_form(window, monday, monday + timedelta(days=6), load)
+        shifts_tree.pack(expand=True, fill='both')
+        total_label.pack()
+
+        if self.user_role == "admin" and staff:
+            form = tk.Frame(window)
+            form.pack(pady=5)
+            tk.Label(form, text="Начало (ГГГГ-ММ-ДД ЧЧ:ММ):").grid(row=0, column=0, sticky="e")
+            start_entry = tk.Entry(form)
+            start_entry.grid(row=0, column=1)
+            tk.Label(form, text="Конец:").grid(row=1, column=0, sticky="e")
+            end_entry = tk.Entry(form)
+            end_entry.grid(row=1, column=1)
+
+            def add():
+                try:
+                    start_at = parse_reservation_date(start_entry.get())
+                    end_at = parse_reservation_date(end_entry.get())
+                except ValueError as error:
+                    messagebox.showerror("Ошибка", str(error), parent=window)
+                    return
+
+                def add_shift(db):
+                    try:
+                        return db.add_shift(staff[0], start_at, end_at)
+                    except ValueError as error:
+                        return str(error)
+
+                self.worker.submit(add_shift, lambda result: reload() if isinstance(result, int)
+                                   else messagebox.showerror("Ошибка", result, parent=window))
+
+            def delete():
+                selected_shift = shifts_tree.selection()
+                if selected_shift:
+                    shift_id = shifts_tree.item(selected_shift)["values"][0]
+                    self.worker.submit(lambda db: db.delete_shift(shift_id), lambda _: reload())
+
+            tk.Button(form, text="Добавить смену", command=add).grid(row=2, column=0, pady=5)
+            tk.Button(form, text="Удалить смену", command=delete).grid(row=2, column=1, pady=5)
+        reload()
+
+    def open_payroll_window(self):
+        # Зарплата всех сотрудников за период: часы смен, ночные и сверхурочные надбавки, надбавка за стаж
+        window = Toplevel(self.window)
+        window.title("Зарплата")
+        window.geometry("820x420")
+        first_day = date.today().replace(day=1)
+        last_day = (first_day + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+        columns = (("Name", "Имя", 150), ("Position", "Должность", 100), ("Hours", "Часов", 60),
+                   ("Night", "Ночных", 60), ("Overtime", "Сверхурочных", 90), ("Base", "По ставке", 80),
+                   ("Extra", "Надбавки", 70), ("Tenure", "Стаж, лет", 60), ("Bonus", "За стаж", 70),
+                   ("Total", "Итого", 90))
+        payroll_tree = ttk.Treeview(window, columns=[column for column, _, _ in columns], show='headings')
+        for column, text, width in columns:
+            payroll_tree.heading(column, text=text)
+            payroll_tree.column(column, width=width)
+        total_label = tk.Label(window)
+
+        def load(first, last):
+            def calculate(db):
+                started = time.perf_counter()
+                return db.payroll(first, last), time.perf_counter() - started
+
+            self.worker.submit(calculate, show_payroll, key="payroll", read_only=True)
+
+        def show_payroll(result):
+            if not window.winfo_exists():
+                return
+            slips, seconds = result
+            payroll_tree.delete(*payroll_tree.get_children())
+            for slip in slips:
+                payroll_tree.insert("", "end", values=(
+                    slip.name, slip.position, f"{slip.hours:g}", f"{slip.night_hours:g}", f"{slip.overtime_hours:g}",
+                    f"{slip.base:.2f}", f"{slip.night_pay + slip.overtime_pay:.2f}", slip.tenure_years,
+                    f"{slip.tenure_bonus:.2f}", f"{slip.total:.2f}"))
+            total_label.config(text=f"Сотрудников: {len(slips)}, фонд оплаты: {sum(slip.total for slip in slips):.2f}, "
+                                    f"расчёт {seconds * 1000:.0f} мс")
+
+        reload = self.period_form(window, first_day, last_day, load)
+        payroll_tree.pack(expand=True, fill='both')
+        total_label.pack(pady=5)
+        reload()
+
+    def setup_reports_tab(self):
+        # Отчеты читают сводные таблицы, которые поддерживают триггеры, поэтому обновление
+        # не зависит от объема истории
+        self.report_trees = {}
+        reports = [
+            ("menu", "Меню по категориям", ("Категория", "Блюд", "Средняя цена")),
+            ("sales", "Выручка по категориям", ("Категория", "Продано", "Выручка")),
+            ("covers", f"Гости по дням (последние {self.REPORT_DAYS} дней)", ("День", "Броней", "Гостей")),
+            ("payroll", "Фонд оплаты по должностям", ("Должность", "Сотрудников", "Сумма")),
+        ]
+        for index, (name, title, headings) in enumerate(reports):
+            frame = tk.LabelFrame(self.tab_reports, text=title)
+            frame.grid(row=index // 2, column=index % 2, sticky="nsew", padx=5, pady=5)
+            tree = ttk.Treeview(frame, columns=headings, show='headings', height=6)
+            for heading in headings:
+                tree.heading(heading, text=heading)
+                tree.column(heading, width=90)
+            tree.pack(expand=True, fill='both')
+            self.report_trees[name] = tree
+        self.tab_reports.columnconfigure((0, 1), weight=1)
+        self.tab_reports.rowconfigure((0, 1), weight=1)
+        tk.Button(self.tab_reports, text="Обновить", command=self.load_reports).grid(row=2, column=0, columnspan=2, pady=5)
+        self.load_reports()
+
+    def load_reports(self):
+        today = date.today()
+        first_day = (today - timedelta(days=self.REPORT_DAYS - 1)).isoformat()
+
+        def load(db):
+            return {
+                "menu": db.menu_by_category(),
+                "sales": db.sales_by_category(),
+                "covers": db.covers_by_day(first_day, today.isoformat()),
+                "payroll": db.payroll_by_position(),
+            }
+
+        def show(reports):
+            for name, rows in reports.items():
+                tree = self.report_trees[name]
+                tree.delete(*tree.get_children())
+                for row in rows:
+                    tree.insert("", "end", values=[f"{value:.2f}" if isinstance(value, float) else value
+                                                   for value in row])
+
+        self.worker.submit(load, show, key="reports", read_only=True)
 
 class CategorySelectionWindow(tk.Toplevel):
-    def __init__(self, parent):
+    def __init__(self, parent, selected=None, on_apply=None):
         super().__init__(parent.window)  # Инициализация окна выбора категорий
         self.parent = parent
+        # Выбор {категория: флажок} и действие после "Применить"; по умолчанию - фильтр списка блюд
+        self.selected = parent.selected_categories if selected is None else selected
+        self.on_apply = on_apply or parent.refresh_dishes
         self.title("Выбор категории")
         self.geometry("300x200")
 
         # Флажки для выбора категорий
         self.check_buttons = {}
         for category in parent.valid_categories:
-            var = tk.BooleanVar(value=parent.selected_categories[category])
+            var = tk.BooleanVar(value=self.selected[category])
             chk = tk.Checkbutton(self, text=category, variable=var)
             chk.pack(anchor="w")
             self.check_buttons[category] = var
@@ -635,8 +1684,8 @@ class CategorySelectionWindow(tk.Toplevel):
     def apply_selection(self):
         # Обновление выбора категорий в основном окне
         for category, var in self.check_buttons.items():
-            self.parent.selected_categories[category] = var.get()
-        self.parent.refresh_dishes()  # Обновление списка блюд
+            self.selected[category] = var.get()
+        self.on_apply()  # Обновление списка блюд или другого получателя выбора
         self.destroy()  # Закрытие окна выбора категорий
 
     def select_all(self):
@@ -644,7 +1693,116 @@ class CategorySelectionWindow(tk.Toplevel):
         for var in self.check_buttons.values():
             var.set(True)
 
+class ExportWindow(tk.Toplevel):
+    POLL_MS = 100
+
+    def __init__(self, master, job):
+        super().__init__(master)
+        self.job = job
+        self.title("Экспорт")
+        self.geometry("360x120")
+        self.progress = ttk.Progressbar(self, mode="determinate", length=320)
+        self.progress.pack(pady=10)
+        self.status = tk.Label(self, text="Подготовка...")
+        self.status.pack()
+        tk.Button(self, text="Отмена", command=self.job.cancel).pack(pady=5)
+        self.protocol("WM_DELETE_WINDOW", self.job.cancel)  # окно закроется, когда выгрузка остановится
+        self.poll()
+
+    def poll(self):
+        job = self.job
+        if job.total:
+            self.progress["value"] = 100 * job.done / job.total
+            self.status.config(text=f"{job.done} из {job.total} строк")
+        if not job.finished:
+            self.after(self.POLL_MS, self.poll)
+            return
+        self.destroy()
+        if job.error is not None:
+            messagebox.showerror("Экспорт", f"Не удалось выгрузить {job.table_name}: {job.error}")
+        elif not job.cancelled:
+            messagebox.showinfo("Экспорт", f"Выгружено {job.done} строк в {job.path} за {job.seconds:.1f} с")
+
+class DiagnosticsWindow(tk.Toplevel):
+    # Метрики процесса (metrics.METRICS) и журнал медленных запросов, обновляются раз в секунду
+    REFRESH_MS = 1000
+    COLUMNS = (("count", "Вызовов", 70), ("mean_ms", "Среднее, мс", 80), ("p50_ms", "p50, мс", 70),
+               ("p95_ms", "p95, мс", 70), ("p99_ms", "p99, мс", 70), ("max_ms", "Макс, мс", 70),
+               ("rows", "Строк", 70), ("steps", "Шагов VM", 80), ("programs", "Программ", 70))
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Диагностика")
+        self.geometry("900x560")
+
+        form = tk.Frame(self)
+        form.pack(fill="x", pady=5)
+        tk.Label(form, text="Медленные запросы от, мс:").pack(side="left")
+        self.slow_entry = tk.Entry(form, width=8)
+        self.slow_entry.insert(0, f"{METRICS.slow_query_ms:g}")
+        self.slow_entry.pack(side="left")
+        tk.Button(form, text="Применить", command=self.apply_threshold).pack(side="left")
+        # Трассировка включается для соединений, открытых позже (например, после перезапуска потока базы)
+        self.trace_var = tk.BooleanVar(value=METRICS.trace)
+        tk.Checkbutton(form, text="Трассировка SQL", variable=self.trace_var,
+                       command=lambda: METRICS.configure(trace=self.trace_var.get())).pack(side="left", padx=5)
+        tk.Button(form, text="Сохранить...", command=self.save).pack(side="right")
+        tk.Button(form, text="Сбросить", command=self.reset).pack(side="right")
+
+        self.metrics_tree = ttk.Treeview(self, columns=[name for name, _, _ in self.COLUMNS])
+        self.metrics_tree.heading("#0", text="Метрика")
+        self.metrics_tree.column("#0", width=300)
+        for name, title, width in self.COLUMNS:
+            self.metrics_tree.heading(name, text=title)
+            self.metrics_tree.column(name, width=width, anchor="e")
+        self.metrics_tree.pack(expand=True, fill="both")
+
+        tk.Label(self, text="Медленные запросы").pack(anchor="w")
+        self.slow_tree = ttk.Treeview(self, columns=("Time", "Connection", "Ms", "Rows", "Sql"), show="headings", height=6)
+        for name, title, width in (("Time", "Время", 130), ("Connection", "Соединение", 80), ("Ms", "мс", 70),
+                                   ("Rows", "Строк", 60), ("Sql", "SQL", 520)):
+            self.slow_tree.heading(name, text=title)
+            self.slow_tree.column(name, width=width)
+        self.slow_tree.pack(fill="x")
+        self.refresh()
+
+    def apply_threshold(self):
+        try:
+            METRICS.configure(slow_query_ms=float(self.slow_entry.get()))
+        except ValueError:
+            messagebox.showerror("Ошибка", "Порог должен быть числом", parent=self)
+
+    def reset(self):
+        METRICS.reset()
+        self.refresh(reschedule=False)
+
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Метрики", initialfile="metrics.json",
+                                            defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path:
+            METRICS.dump(path)
+
+    def refresh(self, reschedule=True):
+        if not self.winfo_exists():
+            return
+        selected = self.metrics_tree.selection()
+        self.metrics_tree.delete(*self.metrics_tree.get_children())
+        for name, item in METRICS.snapshot().items():
+            self.metrics_tree.insert("", "end", iid=name, text=name,
+                                     values=[item[column] for column, _, _ in self.COLUMNS])
+        self.metrics_tree.selection_set([iid for iid in selected if self.metrics_tree.exists(iid)])
+        self.slow_tree.delete(*self.slow_tree.get_children())
+        for entry in reversed(list(METRICS.slow_queries)):
+            self.slow_tree.insert("", "end", values=entry)
+        if reschedule:
+            self.after(self.REFRESH_MS, self.refresh)
+
+# Время перерисовки списков и загрузки вкладок в метриках ("ui.list._append_page", "ui.load_reservations"...)
+timed_methods(PagedTreeview, "ui.list", lambda name: name in ("reset", "upsert", "remove", "_append_page", "_prepend_page"))
+timed_methods(RestaurantApp, "ui", lambda name: name.startswith(("load_", "refresh_", "apply_changes", "reload_view")))
+
 if __name__ == "__main__":
+    timer = StartupTimer()
     root = tk.Tk()
-    app = LoginWindow(root)  # Замените "admin" на "user" для ограниченного доступа
+    app = LoginWindow(root, timer)  # Замените "admin" на "user" для ограниченного доступа
     root.mainloop()
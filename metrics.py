@@ -0,0 +1,173 @@
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Метрики процесса: длительности по именам - методы Database ("db.fetch_page"), запросы SQL
+# ("sql:SELECT ..."), задачи потока базы ("worker.job:...") и перерисовка списков ("ui...").
+# Счётчики и суммы копятся за всё время, перцентили считаются по последним SAMPLES значениям.
+# Запросы дольше slow_query_ms попадают в журнал медленных запросов (и в файл, если он задан).
+# Подробная трассировка (trace=True) включает в новых соединениях sqlite3 trace callback и
+# progress handler. Первый считает программы, выполненные запросом, - сам оператор и каждый
+# сработавший триггер, второй - шаги виртуальной машины SQLite: так видно, где работа, а где
+# ожидание блокировки. Текст из trace callback не сохраняется - в нём подставлены параметры.
+
+SAMPLES = 2048  # значений на имя для перцентилей
+SLOW_QUERY_MS = 100.0
+SLOW_LOG_SIZE = 200
+PROGRESS_STEPS = 1000  # шагов виртуальной машины между вызовами progress handler
+SQL_NAME_LENGTH = 160
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)]
+
+def sql_name(sql):
+    return "sql:" + " ".join(sql.split())[:SQL_NAME_LENGTH]
+
+class Series:
+    __slots__ = ("count", "total", "max", "rows", "steps", "programs", "samples")
+
+    def __init__(self, samples):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.steps = 0
+        self.programs = 0
+        self.samples = deque(maxlen=samples)
+
+class Metrics:
+    def __init__(self, samples=SAMPLES, slow_query_ms=SLOW_QUERY_MS, slow_log_path=None, trace=False):
+        self.samples = samples
+        self.slow_query_ms = slow_query_ms
+        self.slow_log_path = slow_log_path
+        self.trace = trace
+        self.enabled = True
+        self.started = time.time()
+        self.series = {}
+        self.slow_queries = deque(maxlen=SLOW_LOG_SIZE)  # [(время, соединение, мс, строк, SQL), ...]
+        self.lock = threading.Lock()
+
+    def configure(self, slow_query_ms=None, slow_log_path=None, trace=None, enabled=None):
+        # trace действует на соединения, открытые после вызова
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        if slow_log_path is not None:
+            self.slow_log_path = slow_log_path or None
+        if trace is not None:
+            self.trace = trace
+        if enabled is not None:
+            self.enabled = enabled
+
+    def record(self, name, seconds, rows=None, steps=0, programs=0):
+        if not self.enabled:
+            return
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = Series(self.samples)
+            series.count += 1
+            series.total += seconds
+            series.max = max(series.max, seconds)
+            series.rows += rows or 0
+            series.steps += steps
+            series.programs += programs
+            series.samples.append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record_query(self, sql, seconds, rows, role, steps=0, programs=0):
+        if not self.enabled:
+            return
+        self.record(sql_name(sql), seconds, rows, steps, programs)
+        milliseconds = seconds * 1000
+        if milliseconds < self.slow_query_ms:
+            return
+        entry = (time.strftime("%Y-%m-%d %H:%M:%S"), role, round(milliseconds, 2), rows, " ".join(sql.split()))
+        self.slow_queries.append(entry)
+        if self.slow_log_path:
+            with self.lock, open(self.slow_log_path, "a", encoding="utf-8") as file:
+                file.write("\t".join(map(str, entry)) + "\n")
+
+    def snapshot(self):
+        # {имя: {count, total_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms, rows, steps, programs}}
+        with self.lock:
+            items = [(name, series.count, series.total, series.max, series.rows, series.steps, series.programs,
+                      sorted(series.samples)) for name, series in self.series.items()]
+        result = {}
+        for name, count, total, maximum, rows, steps, programs, samples in sorted(items):
+            result[name] = {"count": count, "total_ms": round(total * 1000, 3),
+                            "mean_ms": round(total * 1000 / count, 3) if count else 0.0,
+                            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+                            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+                            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+                            "max_ms": round(maximum * 1000, 3), "rows": rows, "steps": steps,
+                            "programs": programs}
+        return result
+
+    def report(self):
+        return {"since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                "slow_query_ms": self.slow_query_ms, "metrics": self.snapshot(),
+                "slow_queries": [dict(zip(("time", "connection", "ms", "rows", "sql"), entry))
+                                 for entry in list(self.slow_queries)]}
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+            self.slow_queries.clear()
+            self.started = time.time()
+
+METRICS = Metrics()
+
+def install_tracing(connection, metrics=METRICS):
+    # Подробная трассировка одного соединения, если она включена (см. Metrics.trace)
+    if not metrics.trace:
+        return
+
+    def on_statement(sql):
+        connection.programs += 1
+
+    def on_progress():
+        connection.steps += PROGRESS_STEPS
+        return 0  # не прерывать запрос
+
+    connection.set_trace_callback(on_statement)
+    connection.set_progress_handler(on_progress, PROGRESS_STEPS)
+
+def timed_methods(cls, prefix, include=None, metrics=METRICS):
+    # Оборачивает методы класса замером времени под именем "prefix.метод".
+    # include(name) - какие методы оборачивать (по умолчанию все открытые)
+    for name, function in list(vars(cls).items()):
+        if not inspect.isfunction(function) or name.startswith("__"):
+            continue
+        if not (include(name) if include is not None else not name.startswith("_")):
+            continue
+        setattr(cls, name, _timed(function, f"{prefix}.{name}", metrics))
+    return cls
+
+def _timed(function, name, metrics):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.record(name, time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,146 @@
+import json
+import time
+
+from recipes import to_stock_units
+
+# Заказы зала. Заказы пишутся пачками: одна транзакция на пачку, SAVEPOINT на каждый заказ.
+# Вместе с заказом в той же транзакции со склада списываются ингредиенты по рецептам
+# (dish_ingredients); если остатка не хватает, заказ отклоняется или помечается.
+
+STATUS_ACCEPTED = "accepted"
+STATUS_FLAGGED = "flagged"  # принят, но списание увело остаток в минус
+STATUS_REJECTED = "rejected"
+
+def create_order_tables(cursor):
+    cursor.execute('''
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')),
+                table_number INTEGER,
+                status TEXT NOT NULL,
+                note TEXT
+            )
+        ''')
+    cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER NOT NULL,
+                dish_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                price REAL NOT NULL
+            )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_dish ON order_items (dish_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at)")
+
+class OrderIngest:
+    # Приём заказов поверх Database. submit() копит заказы и сбрасывает их пачкой, когда
+    # набралось batch_size или самый старый ждёт дольше max_delay секунд; flush() - сразу.
+    # on_shortage: "reject" - заказ без списания со статусом rejected, "flag" - списать в минус
+    # и пометить flagged.
+    def __init__(self, db, batch_size=100, max_delay=0.5, on_shortage="reject"):
+        if on_shortage not in ("reject", "flag"):
+            raise ValueError(f"Неизвестный режим on_shortage: {on_shortage}")
+        self.db = db
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.on_shortage = on_shortage
+        self.pending = []
+        self.oldest = None
+        self.results = []  # результаты сброшенных пачек, пока их не забрали take_results()
+
+    def submit(self, order):
+        # order = {"table_number": 5, "items": [(id блюда, количество), ...]}
+        if not order.get("items"):
+            raise ValueError("Заказ без позиций")
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append(order)
+        if len(self.pending) >= self.batch_size or time.monotonic() - self.oldest >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return []
+        batch, self.pending = self.pending, []
+        results = self.record_orders(batch)
+        self.results.extend(results)
+        return results
+
+    def take_results(self):
+        results, self.results = self.results, []
+        return results
+
+    def record_orders(self, orders):
+        # Возвращает [(id заказа, статус, {id ингредиента: нехватка}), ...] в порядке заказов
+        cursor = self.db.cursor
+        dish_ids = sorted({dish_id for order in orders for dish_id, _ in order["items"]})
+        recipes, prices = self.load_dishes(dish_ids)
+        results = []
+        with self.db.transaction():
+            for order in orders:
+                cursor.execute("SAVEPOINT order_ingest")
+                status, shortages, note = self._deplete(cursor, order, recipes, prices)
+                if status == STATUS_REJECTED:
+                    # Откатываем частичное списание; сам заказ сохраняем как отклонённый
+                    cursor.execute("ROLLBACK TO order_ingest")
+                order_id = self._insert_order(cursor, order, status, note, prices)
+                cursor.execute("RELEASE order_ingest")
+                results.append((order_id, status, shortages))
+        return results
+
+    def load_dishes(self, dish_ids):
+        # Рецепты в единицах склада и текущие цены блюд пачки
+        recipes = {dish_id: [] for dish_id in dish_ids}
+        prices = {}
+        cursor = self.db.cursor
+        ids = json.dumps(dish_ids)
+        cursor.execute('''
+            SELECT r.dish_id, r.ingredient_id, r.quantity, r.unit, i.unit
+            FROM dish_ingredients r JOIN ingredients i ON i.id = r.ingredient_id
+            WHERE r.dish_id IN (SELECT value FROM json_each(?))
+        ''', (ids,))
+        for dish_id, ingredient_id, quantity, unit, stock_unit in cursor.fetchall():
+            quantity = to_stock_units(quantity, unit, stock_unit)
+            if quantity is not None:
+                recipes[dish_id].append((ingredient_id, quantity))
+        cursor.execute("SELECT id, price FROM dishes WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+        prices.update(cursor.fetchall())
+        return recipes, prices
+
+    def _deplete(self, cursor, order, recipes, prices):
+        # Списание по рецептам; возвращает (статус, {id ингредиента: нехватка}, примечание)
+        missing = sorted({dish_id for dish_id, _ in order["items"] if dish_id not in prices})
+        if missing:
+            return STATUS_REJECTED, {}, f"Нет блюд: {', '.join(map(str, missing))}"
+        needed = {}
+        for dish_id, quantity in order["items"]:
+            for ingredient_id, per_portion in recipes[dish_id]:
+                needed[ingredient_id] = needed.get(ingredient_id, 0) + per_portion * quantity
+        shortages = {}
+        for ingredient_id, amount in sorted(needed.items()):
+            amount = round(amount, 6)  # без хвостов вида 0.30000000000000004 в остатках
+            # Условное списание: проверка остатка и уменьшение - одна команда, без гонки между терминалами
+            cursor.execute("UPDATE ingredients SET quantity = round(quantity - ?, 6) WHERE id = ? AND quantity >= ?",
+                           (amount, ingredient_id, amount))
+            if cursor.rowcount:
+                continue
+            left = cursor.execute("SELECT quantity FROM ingredients WHERE id = ?", (ingredient_id,)).fetchone()
+            shortages[ingredient_id] = amount - (left[0] if left else 0)
+            if self.on_shortage == "reject":
+                break
+            cursor.execute("UPDATE ingredients SET quantity = round(quantity - ?, 6) WHERE id = ?", (amount, ingredient_id))
+        if not shortages:
+            return STATUS_ACCEPTED, shortages, None
+        note = "Не хватает: " + ", ".join(f"#{ingredient_id} {amount:g}" for ingredient_id, amount in shortages.items())
+        return (STATUS_REJECTED if self.on_shortage == "reject" else STATUS_FLAGGED), shortages, note
+
+    def _insert_order(self, cursor, order, status, note, prices):
+        cursor.execute("INSERT INTO orders (table_number, status, note) VALUES (?, ?, ?)",
+                       (order.get("table_number"), status, note))
+        order_id = cursor.lastrowid
+        cursor.executemany("INSERT INTO order_items (order_id, dish_id, quantity, price) VALUES (?, ?, ?, ?)",
+                           [(order_id, dish_id, quantity, prices.get(dish_id, 0))
+                            for dish_id, quantity in order["items"]])
+        return order_id
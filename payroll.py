@@ -0,0 +1,145 @@
+from collections import namedtuple
+
+from repositories import STATEMENTS
+
+try:
+    import numpy
+except ImportError:  # без numpy группы смен считаются обычным циклом
+    numpy = None
+
+# Смены персонала и зарплата за период. Часовая ставка - оклад staff.salary, делённый на норму
+# часов в месяце. К часам смен добавляются надбавки за ночные часы (22:00-06:00) и за часы
+# сверх нормы смены, к заработку за период - надбавка за полные годы стажа от hire_date.
+# Время смен - "настенные" секунды, как reservations.start_at (availability.parse_reservation_date).
+# Ночные и сверхурочные часы зависят только от времени начала смены и её длины, поэтому SQLite
+# сначала сворачивает смены периода в группы (сотрудник, начало от полуночи, длина, число смен):
+# год смен тысяч сотрудников - несколько тысяч групп. Группы считаются массивами numpy за один
+# проход, суммы по сотрудникам - bincount; без numpy - циклом по группам.
+
+MONTH_HOURS = 164  # норма часов в месяце: оклад / норма = часовая ставка
+SHIFT_HOURS = 8  # часы смены сверх этого - сверхурочные
+MAX_SHIFT_HOURS = 24
+NIGHT_START = 22 * 3600
+NIGHT_LENGTH = 8 * 3600  # 22:00-06:00
+NIGHT_MULTIPLIER = 1.2
+OVERTIME_MULTIPLIER = 1.5
+# (полных лет стажа, надбавка к заработку за период) по возрастанию стажа
+TENURE_BONUSES = ((1, 0.05), (3, 0.10), (5, 0.15), (10, 0.20))
+
+Payslip = namedtuple("Payslip", "staff_id name position hours night_hours overtime_hours "
+                                "base night_pay overtime_pay tenure_years tenure_bonus total")
+
+def create_shift_tables(cursor):
+    cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS shifts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                staff_id INTEGER NOT NULL,
+                start_at INTEGER NOT NULL,
+                end_at INTEGER NOT NULL CHECK (end_at > start_at AND end_at - start_at <= {MAX_SHIFT_HOURS * 3600})
+            )
+        ''')
+    # Покрывающий индекс: свёртка смен периода (shift_groups) читает только его
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shifts_start ON shifts (start_at, staff_id, end_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_shifts_staff ON shifts (staff_id, start_at)")
+    cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS staff_shifts_delete AFTER DELETE ON staff BEGIN
+                DELETE FROM shifts WHERE staff_id = old.id;
+            END
+        ''')
+
+def shift_groups(cursor, start, end):
+    # [(id сотрудника, начало от полуночи, длина, число смен), ...] смен, начавшихся в [start, end)
+    return cursor.execute(STATEMENTS.get("shifts", "groups"), (start, end)).fetchall()
+
+def check_shift(start_at, end_at):
+    if end_at <= start_at:
+        raise ValueError("Смена должна заканчиваться позже, чем начинается")
+    if end_at - start_at > MAX_SHIFT_HOURS * 3600:
+        raise ValueError(f"Смена длиннее {MAX_SHIFT_HOURS} часов")
+
+def tenure_rate(years):
+    rate = 0.0
+    for threshold, bonus in TENURE_BONUSES:
+        if years >= threshold:
+            rate = bonus
+    return rate
+
+def night_seconds(start_at, end_at):
+    # Пересечение смены с ночами: смена не длиннее суток задевает не больше трёх окон
+    # 22:00-06:00 - начатого накануне, в день начала и на следующий день
+    day_start = start_at - start_at % 86400
+    total = 0
+    for offset in (-86400, 0, 86400):
+        window_start = day_start + offset + NIGHT_START
+        total += max(min(end_at, window_start + NIGHT_LENGTH) - max(start_at, window_start), 0)
+    return total
+
+def compute_payroll(staff, groups):
+    # staff - [(id, имя, должность, оклад, полных лет стажа), ...], groups - смены периода
+    # из shift_groups. Результат - Payslip на каждого сотрудника в порядке staff;
+    # смены сотрудников не из списка не считаются
+    if not staff:
+        return []
+    if numpy is not None:
+        return _compute_payroll_numpy(staff, groups)
+    index = {row[0]: position for position, row in enumerate(staff)}
+    totals = [[0, 0, 0] for _ in staff]  # секунды: всего, ночных, сверхурочных
+    for staff_id, time_of_day, seconds, count in groups:
+        position = index.get(staff_id)
+        if position is None:
+            continue
+        item = totals[position]
+        item[0] += seconds * count
+        item[1] += night_seconds(time_of_day, time_of_day + seconds) * count
+        item[2] += max(seconds - SHIFT_HOURS * 3600, 0) * count
+    return [_payslip(row, seconds / 3600, night / 3600, overtime / 3600)
+            for row, (seconds, night, overtime) in zip(staff, totals)]
+
+def _payslip(row, hours, night_hours, overtime_hours):
+    staff_id, name, position, salary, tenure_years = row
+    rate = (salary or 0) / MONTH_HOURS
+    base = hours * rate
+    night_pay = night_hours * rate * (NIGHT_MULTIPLIER - 1)
+    overtime_pay = overtime_hours * rate * (OVERTIME_MULTIPLIER - 1)
+    tenure_bonus = (base + night_pay + overtime_pay) * tenure_rate(tenure_years)
+    return Payslip(staff_id, name, position, round(hours, 2), round(night_hours, 2), round(overtime_hours, 2),
+                   round(base, 2), round(night_pay, 2), round(overtime_pay, 2), tenure_years,
+                   round(tenure_bonus, 2), round(base + night_pay + overtime_pay + tenure_bonus, 2))
+
+def _compute_payroll_numpy(staff, groups):
+    count = len(staff)
+    ids = numpy.fromiter((row[0] for row in staff), dtype=numpy.int64, count=count)
+    salaries = numpy.fromiter((row[3] or 0 for row in staff), dtype=numpy.float64, count=count)
+    years = numpy.fromiter((row[4] for row in staff), dtype=numpy.int64, count=count)
+    table = numpy.array(groups, dtype=numpy.int64).reshape(-1, 4)
+    # Номер сотрудника для каждой группы - поиском по отсортированным id
+    order = numpy.argsort(ids, kind="stable")
+    found = numpy.minimum(numpy.searchsorted(ids[order], table[:, 0]), count - 1)
+    positions = order[found]
+    known = ids[positions] == table[:, 0]
+    positions, starts, seconds, shifts = positions[known], table[known, 1], table[known, 2], table[known, 3]
+
+    ends = starts + seconds
+    night = numpy.zeros_like(seconds)
+    for offset in (-86400, 0, 86400):
+        window_starts = offset + NIGHT_START
+        night += numpy.maximum(numpy.minimum(ends, window_starts + NIGHT_LENGTH)
+                               - numpy.maximum(starts, window_starts), 0)
+    overtime = numpy.maximum(seconds - SHIFT_HOURS * 3600, 0)
+
+    hours = numpy.bincount(positions, weights=seconds * shifts, minlength=count) / 3600
+    night_hours = numpy.bincount(positions, weights=night * shifts, minlength=count) / 3600
+    overtime_hours = numpy.bincount(positions, weights=overtime * shifts, minlength=count) / 3600
+    rates = salaries / MONTH_HOURS
+    base = hours * rates
+    night_pay = night_hours * rates * (NIGHT_MULTIPLIER - 1)
+    overtime_pay = overtime_hours * rates * (OVERTIME_MULTIPLIER - 1)
+    thresholds = numpy.array([threshold for threshold, _ in TENURE_BONUSES])
+    bonuses = numpy.array([0.0] + [bonus for _, bonus in TENURE_BONUSES])
+    tenure_bonus = (base + night_pay + overtime_pay) * bonuses[numpy.searchsorted(thresholds, years, side="right")]
+    total = base + night_pay + overtime_pay + tenure_bonus
+    columns = [numpy.round(column, 2).tolist() for column in
+               (hours, night_hours, overtime_hours, base, night_pay, overtime_pay)]
+    return [Payslip(row[0], row[1], row[2], *values, row[4], bonus, amount)
+            for row, values, bonus, amount in zip(staff, zip(*columns), numpy.round(tenure_bonus, 2).tolist(),
+                                                  numpy.round(total, 2).tolist())]
@@ -0,0 +1,108 @@
+import bisect
+import math
+import re
+
+try:
+    import numpy
+except ImportError:  # без numpy порции считаются обычным циклом
+    numpy = None
+
+# Количество на порцию для связей, созданных из текстового списка ингредиентов блюда,
+# в единицах склада; для единиц не из списка - 1
+DEFAULT_PORTION = {"кг": 0.1, "л": 0.1, "г": 100, "мл": 100}
+
+# (единица рецепта, единица склада) -> множитель
+UNIT_FACTORS = {("г", "кг"): 0.001, ("кг", "г"): 1000, ("мл", "л"): 0.001, ("л", "мл"): 1000}
+
+ENDINGS = "аеёиоуыьъйэюя"
+
+def normalize_name(text):
+    return " ".join((text or "").lower().replace("ё", "е").split())
+
+def stem(name):
+    # Грубая основа слова без окончания: "курица" и "курицу", "ягоды" и "ягода" совпадут
+    stripped = name.rstrip(ENDINGS)
+    return stripped if len(stripped) >= 3 else name
+
+def stem_key(name):
+    return " ".join(stem(word) for word in name.split())
+
+def split_ingredients(text):
+    return [normalize_name(part) for part in re.split(r"[,;\n]", text or "") if part.strip()]
+
+def default_portion(stock_unit):
+    return DEFAULT_PORTION.get(normalize_name(stock_unit), 1)
+
+def to_stock_units(quantity, unit, stock_unit):
+    # Количество из рецепта в единицах склада; None, если единицы несовместимы
+    unit, stock_unit = normalize_name(unit), normalize_name(stock_unit)
+    if not unit or unit == stock_unit:
+        return quantity
+    factor = UNIT_FACTORS.get((unit, stock_unit))
+    return None if factor is None else quantity * factor
+
+class IngredientMatcher:
+    # Сопоставление названий из текста блюда со складом: сначала точное совпадение,
+    # затем по основе каждого слова названия. При совпадении нескольких позиций
+    # выигрывает меньший id; add/remove правят сопоставитель без перестройки
+    def __init__(self, stock_rows):
+        self.names = {}  # id ингредиента -> нормализованное название
+        self.exact = {}  # название -> [id по возрастанию]
+        self.stems = {}  # основы слов названия -> [id по возрастанию]
+        for ingredient_id, name in stock_rows:
+            self.add(ingredient_id, name)
+
+    def add(self, ingredient_id, name):
+        name = normalize_name(name)
+        self.names[ingredient_id] = name
+        bisect.insort(self.exact.setdefault(name, []), ingredient_id)
+        bisect.insort(self.stems.setdefault(stem_key(name), []), ingredient_id)
+
+    def remove(self, ingredient_id):
+        name = self.names.pop(ingredient_id, None)
+        if name is None:
+            return
+        for index, key in ((self.exact, name), (self.stems, stem_key(name))):
+            index[key].remove(ingredient_id)
+            if not index[key]:
+                del index[key]
+
+    def match(self, item):
+        item = normalize_name(item)
+        ids = self.exact.get(item) or self.stems.get(stem_key(item))
+        return ids[0] if ids else None
+
+    def match_text(self, text):
+        result = []
+        for item in split_ingredients(text):
+            ingredient_id = self.match(item)
+            if ingredient_id is not None and ingredient_id not in result:
+                result.append(ingredient_id)
+        return result
+
+def max_portions(links, stock):
+    # links - разреженная матрица рецептов [(id блюда, id ингредиента, количество на порцию), ...]
+    # в единицах склада, stock - {id ингредиента: остаток}. Результат - {id блюда: порций}
+    # для блюд, у которых есть хотя бы одна связь со складом
+    links = [link for link in links if link[2] and link[2] > 0]
+    if not links:
+        return {}
+    if numpy is not None:
+        return _max_portions_numpy(links, stock)
+    result = {}
+    for dish_id, ingredient_id, quantity in links:
+        portions = max(math.floor(stock.get(ingredient_id, 0) / quantity + 1e-9), 0)
+        result[dish_id] = min(result.get(dish_id, portions), portions)
+    return result
+
+def _max_portions_numpy(links, stock):
+    # Один проход по всей матрице: остаток / норма для каждой связи, затем минимум по строкам блюд
+    dish_ids = sorted({link[0] for link in links})
+    dish_index = {dish_id: index for index, dish_id in enumerate(dish_ids)}
+    rows = numpy.fromiter((dish_index[link[0]] for link in links), dtype=numpy.int64, count=len(links))
+    needed = numpy.fromiter((link[2] for link in links), dtype=numpy.float64, count=len(links))
+    available = numpy.fromiter((stock.get(link[1], 0) for link in links), dtype=numpy.float64, count=len(links))
+    ratios = numpy.maximum(numpy.floor(available / needed + 1e-9), 0)
+    portions = numpy.full(len(dish_ids), numpy.inf)
+    numpy.minimum.at(portions, rows, ratios)
+    return dict(zip(dish_ids, portions.astype(numpy.int64).tolist()))
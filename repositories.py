@@ -0,0 +1,348 @@
+import json
+from collections import namedtuple
+
+# Строки основных таблиц - именованные кортежи: поля читаются по имени (dish.price),
+# а в памяти строка занимает столько же, сколько обычный кортеж, без словаря на каждую запись
+User = namedtuple("User", "id username password role")
+Dish = namedtuple("Dish", "id name description ingredients price category")
+Reservation = namedtuple("Reservation",
+                         "id customer_name reservation_date number_of_guests table_number duration_minutes start_at")
+Staff = namedtuple("Staff", "id name position salary hire_date")
+Ingredient = namedtuple("Ingredient", "id name quantity unit reorder_level")
+
+ROW_TYPES = {"users": User, "dishes": Dish, "reservations": Reservation, "staff": Staff, "ingredients": Ingredient}
+
+# Колонки, допускающие NULL: в сортировке NULL приводится к '', чтобы ключ страницы был сравним
+NULLABLE = {"dishes": {"description", "ingredients", "category"}, "reservations": {"start_at"}}
+
+# Колонки, которые заполняют триггеры, а не приложение
+GENERATED = {"reservations": {"start_at"}}
+
+# Фильтр по списку категорий одним параметром (JSON-массив), чтобы текст запроса не зависел от длины списка
+CATEGORY_FILTER = "IFNULL({column}, '') IN (SELECT value FROM json_each(?))"
+
+# Брони, начинающиеся не раньше заданного момента; бронь с неразобранной датой показываем всегда
+UPCOMING_FILTER = "(start_at IS NULL OR start_at >= ?)"
+
+# Занятость столов для availability.AvailabilityEngine: бронь занимает основной стол и сдвинутые
+# к ней столы (reservation_tables). Условие подставляется в обе части и получает параметры дважды.
+# Без ORDER BY: иначе SQLite читает все брони по индексу сортировки, а не по индексу конца брони
+RESERVATION_END = "r.start_at + r.duration_minutes * 60"
+AVAILABILITY_QUERY = '''
+    SELECT r.id, r.table_number, r.start_at, r.duration_minutes FROM reservations r
+    WHERE r.start_at IS NOT NULL AND {condition}
+    UNION ALL
+    SELECT r.id, j.table_number, r.start_at, r.duration_minutes
+    FROM reservation_tables j JOIN reservations r ON r.id = j.reservation_id
+    WHERE r.start_at IS NOT NULL AND {condition}
+'''
+AVAILABILITY_CONDITIONS = {
+    "since": f"{RESERVATION_END} > ?",  # не закончившиеся к моменту
+    "ids": f"r.id IN (SELECT value FROM json_each(?)) AND {RESERVATION_END} > ?",
+    "window": f"r.start_at < ? AND {RESERVATION_END} > ?",  # пересекающие окно
+}
+
+# Поиск блюд: FTS5 по индексу dishes_fts с ранжированием bm25 или, без FTS5, LIKE по
+# нормализованному тексту - одно условие на слово запроса
+SEARCH_COLUMNS = ", ".join(f"d.{column}" for column in Dish._fields)
+SEARCH_FILTER = CATEGORY_FILTER.format(column="d.category")
+SEARCH_TEXT = "normalize_search_text(d.name || ' ' || IFNULL(d.description, '') || ' ' || IFNULL(d.ingredients, ''))"
+
+# Запросы рецептов, рассадки, смен и отчётов: постоянный текст, значения - только параметрами
+QUERIES = {
+    # Связи блюд со складом (Database.sync_recipes и sync_ingredient)
+    ("ingredients", "names_version"): "SELECT version, previous FROM stock_names_version",
+    ("ingredients", "names"): "SELECT id, name, unit FROM ingredients",
+    ("ingredients", "name_unit"): "SELECT name, unit FROM ingredients WHERE id = ?",
+    ("dishes", "ingredient_texts", "all"): "SELECT id, ingredients FROM dishes",
+    ("dishes", "ingredient_texts", "after"): "SELECT id, ingredients FROM dishes WHERE id > ?",
+    ("dishes", "ingredient_texts", "ids"):
+        "SELECT id, ingredients FROM dishes WHERE id IN (SELECT value FROM json_each(?))",
+    ("dish_ingredients", "pairs", False): "SELECT dish_id, ingredient_id FROM dish_ingredients",
+    ("dish_ingredients", "pairs", True):
+        "SELECT dish_id, ingredient_id FROM dish_ingredients WHERE dish_id IN (SELECT value FROM json_each(?))",
+    ("dish_ingredients", "unlink"): "DELETE FROM dish_ingredients WHERE dish_id = ? AND ingredient_id = ?",
+    ("dish_ingredients", "link"):
+        "INSERT OR IGNORE INTO dish_ingredients (dish_id, ingredient_id, quantity) VALUES (?, ?, ?)",
+    # Блюда, где может упоминаться ингредиент: по началам слов названия и уже связанные с ним
+    ("dish_ingredients", "mentions", "linked"): "SELECT dish_id FROM dish_ingredients WHERE ingredient_id = ?",
+    ("dish_ingredients", "mentions", "fts"): '''
+        SELECT rowid FROM dishes_fts WHERE dishes_fts MATCH ?
+        UNION SELECT dish_id FROM dish_ingredients WHERE ingredient_id = ?
+    ''',
+    ("dish_ingredients", "mentions", "like"): '''
+        SELECT id FROM dishes WHERE normalize_search_text(IFNULL(ingredients, '')) LIKE ?
+        UNION SELECT dish_id FROM dish_ingredients WHERE ingredient_id = ?
+    ''',
+    # Столы зала и рассадка
+    ("tables", "all"): "SELECT number, capacity FROM tables ORDER BY number",
+    ("tables", "neighbours"): "SELECT table_number, neighbour FROM table_neighbours ORDER BY table_number, neighbour",
+    ("tables", "seated_capacity"): '''
+        SELECT SUM(capacity) FROM tables WHERE number = ? OR number IN (
+            SELECT j.table_number FROM reservation_tables j JOIN reservations r ON r.id = j.reservation_id
+            WHERE r.id = ? AND r.table_number = ? AND r.reservation_date = ? AND r.duration_minutes = ?)
+    ''',
+    ("tables", "save"):
+        "INSERT INTO tables (number, capacity) VALUES (?, ?) ON CONFLICT (number) DO UPDATE SET capacity = excluded.capacity",
+    ("tables", "delete"): "DELETE FROM tables WHERE number = ?",
+    ("tables", "clear_neighbours"): "DELETE FROM table_neighbours WHERE table_number = ? OR neighbour = ?",
+    ("tables", "add_neighbour"): "INSERT INTO table_neighbours (table_number, neighbour) VALUES (?, ?)",
+    # Брони стола, пересекающие [начало, конец), кроме изменяемой; проверяется перед записью брони.
+    # Обе части идут по idx_reservations_end (только брони, не закончившиеся к началу), а не
+    # по idx_reservations_table_start со всей историей стола: "+" отключает индекс по столу,
+    # CROSS JOIN оставляет reservations внешней таблицей. Бронь может повториться - дубли убирает вызывающий
+    ("reservations", "conflicts"): f'''
+        SELECT r.id FROM reservations r
+        WHERE +r.table_number = ? AND r.start_at < ? AND {RESERVATION_END} > ? AND r.id IS NOT ?
+        UNION ALL
+        SELECT r.id FROM reservations r CROSS JOIN reservation_tables j ON j.reservation_id = r.id
+        WHERE j.table_number = ? AND r.start_at < ? AND {RESERVATION_END} > ? AND r.id IS NOT ?
+    ''',
+    ("reservations", "seating", "day"): '''
+        SELECT id, number_of_guests, start_at, start_at + duration_minutes * 60, table_number
+        FROM reservations WHERE start_at >= ? AND start_at < ? ORDER BY start_at, id
+    ''',
+    ("reservations", "seating", "joined"): '''
+        SELECT j.reservation_id, j.table_number FROM reservation_tables j
+        JOIN reservations r ON r.id = j.reservation_id WHERE r.start_at >= ? AND r.start_at < ?
+    ''',
+    # Брони прошлого дня, заходящие за полночь
+    ("reservations", "seating", "overnight"): '''
+        SELECT table_number, start_at, start_at + duration_minutes * 60 FROM reservations
+        WHERE start_at >= ? AND start_at < ? AND start_at + duration_minutes * 60 > ?
+    ''',
+    ("reservations", "seating", "move"): "UPDATE reservations SET table_number = ? WHERE id = ?",
+    ("reservations", "seating", "unjoin"): "DELETE FROM reservation_tables WHERE reservation_id = ?",
+    ("reservations", "seating", "join"): "INSERT INTO reservation_tables (reservation_id, table_number) VALUES (?, ?)",
+    # Смены и зарплата
+    ("shifts", "period"): '''
+        SELECT sh.id, sh.staff_id, s.name, s.position, sh.start_at, sh.end_at
+        FROM shifts sh JOIN staff s ON s.id = sh.staff_id
+        WHERE sh.start_at >= ? AND sh.start_at < ? AND (? IS NULL OR sh.staff_id = ?)
+        ORDER BY sh.start_at, s.name, sh.id
+    ''',
+    # Группы смен периода для payroll.compute_payroll: (сотрудник, начало от полуночи, длина, число смен)
+    ("shifts", "groups"): '''
+        SELECT staff_id, start_at % 86400, end_at - start_at, COUNT(*) FROM shifts
+        WHERE start_at >= ? AND start_at < ? GROUP BY 1, 2, 3
+    ''',
+    ("shifts", "staff_exists"): "SELECT 1 FROM staff WHERE id = ?",
+    ("shifts", "insert"): "INSERT INTO shifts (staff_id, start_at, end_at) VALUES (?, ?, ?)",
+    ("shifts", "delete"): "DELETE FROM shifts WHERE id = ?",
+    # Сотрудники с полными годами стажа на день (параметр дважды); неразборчивая дата найма - 0
+    ("shifts", "payroll_staff"): '''
+        SELECT id, name, position, salary,
+               MAX(IFNULL(CAST(strftime('%Y', ?) AS INTEGER) - CAST(strftime('%Y', hire_date) AS INTEGER)
+                          - (strftime('%m-%d', ?) < strftime('%m-%d', hire_date)), 0), 0)
+        FROM staff ORDER BY name, id
+    ''',
+    # Отчёты из сводных таблиц (analytics.py)
+    ("reports", "menu_by_category"):
+        "SELECT category, dishes, ROUND(price_total / dishes, 2) FROM menu_by_category ORDER BY category",
+    ("reports", "sales_by_category", False): "SELECT category, items, revenue FROM sales_by_category ORDER BY revenue DESC",
+    ("reports", "sales_by_category", True): '''
+        SELECT category, SUM(items), TOTAL(revenue) FROM sales_by_day
+        WHERE day BETWEEN ? AND ? GROUP BY category ORDER BY 3 DESC
+    ''',
+    ("reports", "covers_by_day"):
+        "SELECT day, reservations, guests FROM covers_by_day WHERE day BETWEEN ? AND ? ORDER BY day",
+    ("reports", "payroll_by_position"):
+        "SELECT position, staff, salary_total FROM payroll_by_position ORDER BY salary_total DESC",
+}
+
+# Представления только для чтения -> таблица, чьи колонки и тип строки они повторяют.
+# reservations_history - брони вместе с архивом, создаётся при подключении архива (archive.py)
+VIEWS = {"reservations_history": "reservations"}
+
+# Фильтр строк таблицы с одним параметром: для блюд - список категорий, для броней - момент начала
+TABLE_FILTERS = {"dishes": CATEGORY_FILTER.format(column="category"), "reservations": UPCOMING_FILTER,
+                 "reservations_history": UPCOMING_FILTER}
+
+def row_factory(row_type):
+    make = row_type._make
+    return lambda cursor, row: make(row)
+
+def sort_expression(table_name, column):
+    table_name = VIEWS.get(table_name, table_name)
+    return f"IFNULL({column}, '')" if column in NULLABLE.get(table_name, ()) else column
+
+def filter_params(table_name, row_filter):
+    if row_filter is None:
+        return []
+    if table_name == "dishes":
+        return [json.dumps(list(row_filter), ensure_ascii=False)]
+    return [row_filter]
+
+class StatementRegistry:
+    # Все тексты SQL для основных таблиц строятся заранее из списка колонок выше. Имена таблиц
+    # и колонок попадают в запрос только отсюда, а одинаковый текст запроса позволяет sqlite3
+    # брать уже подготовленный statement из своего кэша вместо разбора SQL на каждый вызов.
+    def __init__(self):
+        self.statements = {}
+        for table_name in [*ROW_TYPES, *VIEWS]:
+            columns = self.columns(table_name)
+            select = f"SELECT {', '.join(columns)} FROM {table_name}"
+            self.statements[(table_name, "all")] = select
+            self.statements[(table_name, "get")] = f"{select} WHERE id = ?"
+            self.statements[(table_name, "get_many")] = f"{select} WHERE id IN (SELECT value FROM json_each(?))"
+            self.statements[(table_name, "max_id")] = f"SELECT IFNULL(MAX(id), 0) FROM {table_name}"
+            self.statements[(table_name, "count", False)] = f"SELECT COUNT(*) FROM {table_name}"
+            if table_name in TABLE_FILTERS:
+                self.statements[(table_name, "count", True)] = (
+                    f"SELECT COUNT(*) FROM {table_name} WHERE {TABLE_FILTERS[table_name]}")
+            for order_by in columns:
+                sort_expr = sort_expression(table_name, order_by)
+                for ascending in (True, False):
+                    order = "ASC" if ascending else "DESC"
+                    for after in (False, True):
+                        for filtered in (False, True) if table_name in TABLE_FILTERS else (False,):
+                            conditions = [TABLE_FILTERS[table_name]] if filtered else []
+                            if after:
+                                conditions.append(f"({sort_expr}, id) {'>' if ascending else '<'} (?, ?)")
+                            where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+                            self.statements[(table_name, "page", order_by, ascending, after, filtered)] = (
+                                f"{select}{where} ORDER BY {sort_expr} {order}, id {order} LIMIT ?")
+            if table_name in VIEWS:
+                continue
+            self.statements[(table_name, "delete")] = f"DELETE FROM {table_name} WHERE id = ?"
+            writable = self.writable(table_name)
+            self.insert(table_name, writable)
+            self.update(table_name, writable)
+        for mode, condition in AVAILABILITY_CONDITIONS.items():
+            self.statements[("reservations", "availability", mode)] = AVAILABILITY_QUERY.format(condition=condition)
+        self.statements[("users", "login")] = f"{self.statements[('users', 'all')]} WHERE username = ? AND password = ?"
+        for filtered in (False, True):
+            category = f" AND {SEARCH_FILTER}" if filtered else ""
+            self.statements[("dishes", "search", "fts", filtered)] = (
+                f"SELECT {SEARCH_COLUMNS} FROM dishes_fts JOIN dishes d ON d.id = dishes_fts.rowid "
+                f"WHERE dishes_fts MATCH ?{category} ORDER BY bm25(dishes_fts, 10.0, 1.0, 3.0) LIMIT ?")
+        self.statements.update(QUERIES)
+
+    def get(self, table_name, *name):
+        try:
+            return self.statements[(table_name, *name)]
+        except KeyError:
+            raise ValueError(f"Недопустимый запрос к таблице {table_name}: {name}") from None
+
+    def columns(self, table_name):
+        if table_name not in ROW_TYPES and table_name not in VIEWS:
+            raise ValueError(f"Неизвестная таблица: {table_name}")
+        return ROW_TYPES[VIEWS.get(table_name, table_name)]._fields
+
+    def writable(self, table_name):
+        if table_name in VIEWS:
+            raise ValueError(f"Представление {table_name} только для чтения")
+        generated = GENERATED.get(table_name, ())
+        return tuple(column for column in self.columns(table_name)[1:] if column not in generated)
+
+    def check_columns(self, table_name, columns):
+        allowed = self.writable(table_name)
+        unknown = [column for column in columns if column not in allowed]
+        if unknown:
+            raise ValueError(f"Неизвестные колонки {unknown} в таблице {table_name}")
+        return tuple(columns)
+
+    def insert(self, table_name, columns):
+        # Набор колонок проверяется по списку таблицы; текст запроса запоминается для повторного использования
+        columns = self.check_columns(table_name, columns)
+        key = (table_name, "insert", columns)
+        if key not in self.statements:
+            self.statements[key] = (f"INSERT INTO {table_name} ({', '.join(columns)}) "
+                                    f"VALUES ({', '.join('?' * len(columns))})")
+        return self.statements[key]
+
+    def update(self, table_name, columns):
+        columns = self.check_columns(table_name, columns)
+        key = (table_name, "update", columns)
+        if key not in self.statements:
+            self.statements[key] = (f"UPDATE {table_name} SET {', '.join(f'{column} = ?' for column in columns)} "
+                                    f"WHERE id = ?")
+        return self.statements[key]
+
+    def search(self, fts, word_count, filtered):
+        # Поиск блюд: с FTS5 всё выражение поиска - один параметр MATCH, без него текст
+        # зависит от числа слов и запоминается для каждого числа
+        if fts:
+            return self.get("dishes", "search", "fts", filtered)
+        key = ("dishes", "search", "like", word_count, filtered)
+        if key not in self.statements:
+            conditions = [SEARCH_FILTER] if filtered else []
+            conditions += [f"{SEARCH_TEXT} LIKE ?"] * word_count
+            self.statements[key] = (f"SELECT {SEARCH_COLUMNS} FROM dishes d WHERE {' AND '.join(conditions)} "
+                                    f"ORDER BY d.name LIMIT ?")
+        return self.statements[key]
+
+STATEMENTS = StatementRegistry()
+
+class Repository:
+    # Доступ к одной таблице: чтения через курсор с row_factory типа строки, записи через
+    # курсор записи Database. Транзакции, кэши и связанные таблицы остаются заботой Database.
+    def __init__(self, db, table_name):
+        self.db = db
+        self.table_name = table_name
+        self.row_type = ROW_TYPES[VIEWS.get(table_name, table_name)]
+        self.reader = db.read_connection.cursor()
+        self.reader.row_factory = row_factory(self.row_type)
+
+    def query(self, name, params=()):
+        self.reader.execute(STATEMENTS.get(self.table_name, *name), params)
+        return self.reader
+
+    def all(self):
+        return self.query(("all",)).fetchall()
+
+    def get(self, record_id):
+        return self.query(("get",), (record_id,)).fetchone()
+
+    def get_many(self, record_ids):
+        return self.query(("get_many",), (json.dumps(list(record_ids)),)).fetchall()
+
+    def count(self, row_filter=None):
+        return self.db.read_cursor.execute(STATEMENTS.get(self.table_name, "count", row_filter is not None),
+                                           filter_params(self.table_name, row_filter)).fetchone()[0]
+
+    def iterate(self, order_by="id", ascending=True, row_filter=None, arraysize=1000):
+        # Все строки в порядке сортировки порциями по arraysize через отдельный курсор,
+        # чтобы запросы между порциями не сбрасывали выборку
+        cursor = self.db.read_connection.cursor()
+        cursor.row_factory = self.reader.row_factory
+        cursor.arraysize = arraysize
+        cursor.execute(STATEMENTS.get(self.table_name, "page", order_by, bool(ascending), False,
+                                      row_filter is not None), (*filter_params(self.table_name, row_filter), -1))
+        try:
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cursor.close()
+
+    def page(self, order_by="id", ascending=True, after=None, limit=200, row_filter=None):
+        params = filter_params(self.table_name, row_filter)
+        if after is not None:
+            params.extend(after)
+        params.append(limit)
+        name = ("page", order_by, bool(ascending), after is not None, row_filter is not None)
+        return self.query(name, params).fetchall()
+
+    def add(self, values):
+        # Значения идут по порядку колонок после id; не переданные колонки получают значения по умолчанию
+        columns = STATEMENTS.writable(self.table_name)[:len(values)]
+        self.db.cursor.execute(STATEMENTS.insert(self.table_name, columns), tuple(values))
+        return self.db.cursor.lastrowid
+
+    def add_many(self, columns, rows):
+        self.db.cursor.executemany(STATEMENTS.insert(self.table_name, columns), rows)
+        return self.db.cursor.rowcount
+
+    def update(self, record_id, fields):
+        self.db.cursor.execute(STATEMENTS.update(self.table_name, list(fields)), (*fields.values(), record_id))
+        return self.db.cursor.rowcount
+
+    def delete(self, record_id):
+        self.db.cursor.execute(STATEMENTS.get(self.table_name, "delete"), (record_id,))
+        return self.db.cursor.rowcount
+
+    def max_id(self):
+        return self.db.cursor.execute(STATEMENTS.get(self.table_name, "max_id")).fetchone()[0]
@@ -0,0 +1,124 @@
+import json
+
+from repositories import CATEGORY_FILTER
+
+# Массовое изменение цен меню. Правило - процент, сдвиг на сумму и округление до шага;
+# новая цена считается в SQL одним выражением, поэтому предпросмотр и применение видят одно
+# и то же. Применение - одна транзакция: журнал price_history получает старую и новую цену
+# каждого блюда пачки, затем один UPDATE с подзапросом к журналу меняет цены (UPDATE ... FROM
+# появился только в SQLite 3.33). Правило, после которого хоть одно блюдо стоило бы 0 или
+# меньше, отклоняется целиком. Отмена пачки возвращает старые цены тем блюдам, цену которых
+# с тех пор никто не менял.
+
+MIN_STEP = 0.01  # без округления цена округляется до копеек
+
+# Новая цена: процент, затем сдвиг, затем округление до шага.
+# Параметры - процент, сдвиг, шаг, шаг
+NEW_PRICE = "ROUND(ROUND((price * (100 + ?) / 100.0 + ?) / ?) * ?, 2)"
+DISH_FILTER = CATEGORY_FILTER.format(column="category")
+
+def create_price_tables(cursor):
+    cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price_batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')),
+                rule TEXT NOT NULL,
+                dishes INTEGER NOT NULL,
+                undone_at TEXT
+            )
+        ''')
+    cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price_history (
+                batch_id INTEGER NOT NULL,
+                dish_id INTEGER NOT NULL,
+                old_price REAL NOT NULL,
+                new_price REAL NOT NULL,
+                PRIMARY KEY (batch_id, dish_id)
+            ) WITHOUT ROWID
+        ''')
+
+class PriceRule:
+    def __init__(self, categories, percent=0.0, delta=0.0, round_to=None):
+        if round_to is not None and round_to <= 0:
+            raise ValueError("Шаг округления должен быть больше нуля")
+        if not categories:
+            raise ValueError("Не выбрано ни одной категории")
+        self.categories = list(categories)
+        self.percent = percent
+        self.delta = delta
+        self.round_to = round_to
+
+    def params(self):
+        # Параметры выражения NEW_PRICE и фильтра категорий
+        step = self.round_to or MIN_STEP
+        return (self.percent, self.delta, step, step), (json.dumps(self.categories, ensure_ascii=False),)
+
+    def describe(self):
+        parts = []
+        if self.percent:
+            parts.append(f"{self.percent:+g}%")
+        if self.delta:
+            parts.append(f"{self.delta:+g}")
+        if self.round_to:
+            parts.append(f"округление до {self.round_to:g}")
+        return f"{', '.join(parts) or 'без изменений'}: {', '.join(self.categories)}"
+
+def check_prices(cursor, rule):
+    # ValueError, если правило сделает цену какого-нибудь блюда нулевой или отрицательной
+    price_params, filter_params = rule.params()
+    count, name, price, new_price = cursor.execute(f'''
+        SELECT COUNT(*), name, price, new_price FROM (
+            SELECT name, price, {NEW_PRICE} AS new_price FROM dishes WHERE {DISH_FILTER}
+        ) WHERE new_price <= 0 AND new_price != price
+    ''', (*price_params, *filter_params)).fetchone()
+    if count:
+        raise ValueError(f"Правило сделает цену {count} блюд нулевой или отрицательной, "
+                         f"например «{name}»: {price:.2f} -> {new_price:.2f}")
+
+def preview(cursor, rule):
+    # [(id, название, категория, старая цена, новая цена), ...] блюд, цена которых изменится
+    check_prices(cursor, rule)
+    price_params, filter_params = rule.params()
+    return cursor.execute(f'''
+        SELECT id, name, category, price, new_price FROM (
+            SELECT id, name, category, price, {NEW_PRICE} AS new_price FROM dishes WHERE {DISH_FILTER}
+        ) WHERE new_price != price ORDER BY category, name, id
+    ''', (*price_params, *filter_params)).fetchall()
+
+def apply_rule(cursor, rule):
+    # Выполняется внутри транзакции; возвращает (id пачки, блюд изменено)
+    check_prices(cursor, rule)
+    price_params, filter_params = rule.params()
+    cursor.execute("INSERT INTO price_batches (rule, dishes) VALUES (?, 0)", (rule.describe(),))
+    batch_id = cursor.lastrowid
+    cursor.execute(f'''
+        INSERT INTO price_history (batch_id, dish_id, old_price, new_price)
+        SELECT ?, id, price, new_price FROM (
+            SELECT id, price, {NEW_PRICE} AS new_price FROM dishes WHERE {DISH_FILTER}
+        ) WHERE new_price != price
+    ''', (batch_id, *price_params, *filter_params))
+    count = cursor.rowcount
+    cursor.execute('''
+        UPDATE dishes SET price = (SELECT h.new_price FROM price_history h WHERE h.batch_id = ? AND h.dish_id = dishes.id)
+        WHERE id IN (SELECT dish_id FROM price_history WHERE batch_id = ?)
+    ''', (batch_id, batch_id))
+    cursor.execute("UPDATE price_batches SET dishes = ? WHERE id = ?", (count, batch_id))
+    return batch_id, count
+
+def undo_batch(cursor, batch_id):
+    # Выполняется внутри транзакции; возвращает (блюд возвращено, пропущено - цена изменилась
+    # после пачки или блюдо удалено)
+    row = cursor.execute("SELECT dishes, undone_at FROM price_batches WHERE id = ?", (batch_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"Нет пачки изменения цен {batch_id}")
+    if row[1] is not None:
+        raise ValueError(f"Пачка {batch_id} уже отменена {row[1]}")
+    cursor.execute('''
+        UPDATE dishes SET price = (SELECT h.old_price FROM price_history h WHERE h.batch_id = ? AND h.dish_id = dishes.id)
+        WHERE id IN (SELECT dish_id FROM price_history WHERE batch_id = ?)
+            AND price = (SELECT h.new_price FROM price_history h WHERE h.batch_id = ? AND h.dish_id = dishes.id)
+    ''', (batch_id, batch_id, batch_id))
+    restored = cursor.rowcount
+    cursor.execute("UPDATE price_batches SET undone_at = strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime') "
+                   "WHERE id = ?", (batch_id,))
+    return restored, row[0] - restored
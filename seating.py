@@ -0,0 +1,112 @@
+import bisect
+import time
+
+from availability import TableSchedule
+
+# Автоматическая рассадка броней одного дня. Каждой брони подбирается стол или группа
+# соседних столов, которые можно сдвинуть: среди свободных на всё время брони берётся
+# самый маленький подходящий вариант (best-fit), при равной вместимости - меньше столов,
+# текущий стол брони и самый плотный стык с предыдущей бронью стола. Жадный проход
+# повторяется в нескольких порядках броней и остаётся план, где рассажено больше гостей.
+
+DEFAULT_TABLE_CAPACITY = 4
+MAX_JOINED_TABLES = 3  # больше столов под одну компанию не сдвигаем
+
+# Порядки обхода броней: крупные компании первыми, по времени начала, по "площади" гости x время
+ORDERS = (
+    lambda reservation: (-reservation[1], reservation[2], reservation[0]),
+    lambda reservation: (reservation[2], -reservation[1], reservation[0]),
+    lambda reservation: (-reservation[1] * (reservation[3] - reservation[2]), reservation[2], reservation[0]),
+)
+
+class SeatingPlan:
+    def __init__(self, reservations, current):
+        self.reservations = reservations  # [(id, гостей, начало, конец, стол), ...], секунды от эпохи
+        self.current = current  # id брони -> кортеж столов до рассадки
+        self.assignments = {}  # id брони -> кортеж столов по плану
+        self.unseated = []  # id броней, для которых не нашлось места
+        self.seconds = 0.0
+
+    @property
+    def total_guests(self):
+        return sum(reservation[1] for reservation in self.reservations)
+
+    @property
+    def seated_guests(self):
+        guests = {reservation[0]: reservation[1] for reservation in self.reservations}
+        return sum(guests[reservation_id] for reservation_id in self.assignments)
+
+    def changed(self):
+        return [reservation_id for reservation_id, tables in self.assignments.items()
+                if tables != self.current.get(reservation_id)]
+
+    def score(self):
+        # Больше гостей за столами, меньше сдвинутых столов, меньше переносов
+        joined = sum(len(tables) - 1 for tables in self.assignments.values())
+        return self.seated_guests, -joined, -len(self.changed())
+
+def table_units(capacities, neighbours, max_joined=MAX_JOINED_TABLES):
+    # Варианты посадки: одиночные столы и связные группы соседей до max_joined столов,
+    # по возрастанию вместимости -> [(кортеж столов, вместимость), ...]
+    units = {(table_number,): capacity for table_number, capacity in capacities.items()}
+    frontier = list(units)
+    for _ in range(max_joined - 1):
+        grown = []
+        for group in frontier:
+            for table_number in group:
+                for neighbour in neighbours.get(table_number, ()):
+                    if neighbour not in capacities or neighbour in group:
+                        continue
+                    candidate = tuple(sorted(group + (neighbour,)))
+                    if candidate not in units:
+                        units[candidate] = sum(capacities[number] for number in candidate)
+                        grown.append(candidate)
+        frontier = grown
+    return sorted(units.items(), key=lambda unit: (unit[1], len(unit[0]), unit[0]))
+
+def plan_seating(reservations, capacities, neighbours, current=None, blocked=()):
+    # reservations - [(id, гостей, начало, конец, стол), ...]; capacities - {стол: мест};
+    # neighbours - {стол: [соседи]}; current - {id брони: кортеж столов сейчас};
+    # blocked - [(стол, начало, конец), ...] занятые интервалы, которые план не трогает
+    started = time.perf_counter()
+    current = current or {reservation[0]: (reservation[4],) for reservation in reservations}
+    units = table_units(capacities, neighbours)
+    unit_capacities = [capacity for _, capacity in units]
+    best = None
+    for order in ORDERS:
+        plan = SeatingPlan(reservations, current)
+        _greedy(plan, sorted(reservations, key=order), units, unit_capacities, blocked)
+        if best is None or plan.score() > best.score():
+            best = plan
+    best.seconds = time.perf_counter() - started
+    return best
+
+def _greedy(plan, ordered, units, unit_capacities, blocked):
+    schedules = {}
+    for table_number, start, end in blocked:
+        schedules.setdefault(table_number, TableSchedule()).add(start, end, "занято")
+    for reservation_id, guests, start, end, _ in ordered:
+        choice = None
+        for group, capacity in units[bisect.bisect_left(unit_capacities, guests):]:
+            if choice is not None and capacity > choice[1]:
+                break  # варианты дальше только просторнее уже найденного
+            if not all(table_number not in schedules or schedules[table_number].is_free(start, end)
+                       for table_number in group):
+                continue
+            key = (len(group), group != plan.current.get(reservation_id),
+                   sum(_gap_before(schedules.get(table_number), start) for table_number in group))
+            if choice is None or key < choice[2]:
+                choice = (group, capacity, key)
+        if choice is None:
+            plan.unseated.append(reservation_id)
+            continue
+        plan.assignments[reservation_id] = choice[0]
+        for table_number in choice[0]:
+            schedules.setdefault(table_number, TableSchedule()).add(start, end, reservation_id)
+
+def _gap_before(schedule, start):
+    # Простой стола перед бронью: чем меньше, тем плотнее рассадка и больше длинных окон остаётся
+    if schedule is None:
+        return 24 * 3600
+    index = bisect.bisect_right(schedule.starts, start) - 1
+    return start - schedule.max_ends[index] if index >= 0 else 24 * 3600
@@ -0,0 +1,25 @@
+import pathlib
+import sys
+
+import pytest
+
+# Модули приложения лежат в корне репозитория, а не в пакете
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from database import Database  # noqa: E402
+
+def pytest_report_header(config):
+    # numpy необязателен (payroll считает и без него), но тогда варианты "numpy"
+    # в test_payroll пропускаются - пусть это будет видно в начале прогона
+    try:
+        import numpy
+    except ImportError:
+        return "numpy: не установлен, варианты расчёта зарплаты на numpy пропускаются"
+    return f"numpy: {numpy.__version__}"
+
+@pytest.fixture
+def db(tmp_path):
+    # Новая база во временном файле: схема, пользователи и 10 столов по 4 места, соседи по номерам
+    database = Database(str(tmp_path / "restaurant.db"))
+    yield database
+    database.close()
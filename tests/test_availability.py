@@ -0,0 +1,91 @@
+import pytest
+
+from availability import ReservationConflict, TableSchedule
+from database import Database
+
+def schedule(*intervals):
+    result = TableSchedule()
+    for reservation_id, (start, end) in enumerate(intervals, 1):
+        result.add(start, end, reservation_id)
+    return result
+
+def test_overlapping_finds_intervals_hidden_behind_a_long_one():
+    # Длинная бронь 1 закрывает короткую 2: обход назад не должен останавливаться на ней
+    table = schedule((0, 100), (10, 20), (30, 40), (120, 130))
+    assert sorted(table.overlapping(35, 50)) == [1, 3]
+    assert sorted(table.overlapping(15, 16)) == [1, 2]
+    assert table.overlapping(100, 120) == []
+    assert table.overlapping(130, 200) == []
+
+def test_intervals_are_half_open():
+    table = schedule((10, 20))
+    assert table.is_free(0, 10)
+    assert table.is_free(20, 30)
+    assert not table.is_free(19, 21)
+    assert table.is_free(15, 25, exclude_id=1)
+
+def test_remove_restores_prefix_maximum():
+    table = schedule((0, 100), (10, 20), (30, 40))
+    table.remove(1)
+    assert table.max_ends == [20, 40]
+    assert table.overlapping(50, 60) == []
+    table.remove(99)  # неизвестная бронь ничего не меняет
+    assert table.ids == [2, 3]
+
+def test_free_slots():
+    table = schedule((10, 20), (25, 40), (30, 35), (70, 80))
+    assert table.free_slots(0, 100, 5) == [(0, 10), (20, 25), (40, 70), (80, 100)]
+    assert table.free_slots(0, 100, 15) == [(40, 70), (80, 100)]
+    # Окно начинается внутри брони: свободно только после её конца
+    assert table.free_slots(15, 60, 10) == [(40, 60)]
+    assert TableSchedule().free_slots(0, 50, 50) == [(0, 50)]
+    assert table.free_slots(70, 80, 1) == []
+
+def test_save_reservation_sees_other_terminals(db, tmp_path):
+    # Второй терминал занимает стол после того, как движок первого уже построен:
+    # проверка при записи идёт по базе, а не по движку
+    fields = {"customer_name": "Первая", "reservation_date": "2030-05-01 19:00", "number_of_guests": 2,
+              "table_number": 1, "duration_minutes": 120}
+    db.availability_engine()
+    other = Database(str(tmp_path / "restaurant.db"))
+    try:
+        first = other.save_reservation(fields)
+    finally:
+        other.close()
+    with pytest.raises(ReservationConflict, match=f"брони № {first.id}"):
+        db.save_reservation(dict(fields, customer_name="Вторая", reservation_date="2030-05-01 20:00"))
+    second = db.save_reservation(dict(fields, customer_name="Вторая", reservation_date="2030-05-01 21:00"))
+    # Своя бронь себе не мешает; переезд на занятое время - конфликт
+    assert db.save_reservation({"duration_minutes": 90}, second.id).duration_minutes == 90
+    with pytest.raises(ReservationConflict):
+        db.save_reservation({"reservation_date": "2030-05-01 20:30"}, second.id)
+    with pytest.raises(ReservationConflict, match="мест"):
+        db.save_reservation(dict(fields, number_of_guests=9, table_number=2))
+    assert db.save_reservation({"customer_name": "Нет"}, 999) is None
+
+class CountingList(list):
+    def __init__(self, values):
+        super().__init__(values)
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return super().__getitem__(index)
+
+def test_overlapping_cost_is_bounded():
+    # Непересекающиеся брони (обычный случай): обход назад - найденные брони плюс один шаг
+    table = schedule(*((start, start + 50) for start in range(0, 100_000, 100)))
+    table.max_ends = CountingList(table.max_ends)
+    assert table.overlapping(50_020, 50_230) == [503, 502, 501]
+    assert table.max_ends.reads <= 4
+    # Худший случай - брони за одной длинной: обход линейный, но не длиннее расписания
+    table = schedule((0, 200_000), *((start, start + 50) for start in range(100, 100_000, 100)))
+    table.max_ends = CountingList(table.max_ends)
+    assert table.overlapping(150_000, 150_010) == [1]
+    assert table.max_ends.reads <= len(table.ids)
+
+def test_appending_later_reservation_recomputes_one_maximum():
+    table = schedule(*((start, start + 50) for start in range(0, 10_000, 100)))
+    table.max_ends = CountingList(table.max_ends)
+    table.add(20_000, 20_050, "новая")
+    assert table.max_ends.reads <= 1 and table.max_ends[-1] == 20_050
@@ -0,0 +1,38 @@
+def add_staff(db, name):
+    return db.add_record("staff", (name, "Официант", 30000, "2024-01-01")).id
+
+def test_first_poll_only_remembers_the_position(db):
+    add_staff(db, "Анна")
+    assert db.poll_changes() == {}
+    assert db.poll_changes() == {}  # база не менялась - опрос стоит одного PRAGMA
+
+def test_changes_since_last_poll(db):
+    db.poll_changes()
+    anna = add_staff(db, "Анна")
+    boris = add_staff(db, "Борис")
+    db.update_record("staff", {"id": anna, "salary": 35000})
+    db.delete_record("staff", boris)
+    rows, deleted = db.poll_changes()["staff"]
+    assert [(row.id, row.salary) for row in rows] == [(anna, 35000)]
+    assert deleted == [boris]
+    assert db.poll_changes() == {}
+
+def test_too_many_changes_ask_for_a_full_reload(db):
+    db.CHANGE_POLL_LIMIT = 2
+    db.poll_changes()
+    for name in ("Анна", "Борис", "Вера"):
+        add_staff(db, name)
+    assert db.poll_changes() is None
+    # После перезагрузки опрос продолжается с последней версии журнала
+    add_staff(db, "Глеб")
+    assert len(db.poll_changes()["staff"][0]) == 1
+
+def test_restarted_journal_asks_for_a_full_reload(db):
+    db.poll_changes()
+    add_staff(db, "Анна")
+    db.poll_changes()
+    with db.transaction():
+        db.cursor.execute("DELETE FROM change_log")
+    assert db.poll_changes() is None
+    add_staff(db, "Борис")
+    assert [row.name for row in db.poll_changes()["staff"][0]] == ["Борис"]
@@ -0,0 +1,49 @@
+import pytest
+
+CATEGORIES = [None, "Супы", None, "Закуска", "Супы", None, "Десерты"]
+
+def walk(db, order_by, ascending, limit=2, category_filter=None):
+    # Все страницы подряд по ключу последней строки, как их листает список и API
+    result = []
+    after = None
+    while True:
+        rows = db.fetch_page("dishes", order_by, ascending, after, limit, category_filter)
+        result += [row.id for row in rows]
+        if len(rows) < limit:
+            return result
+        value = getattr(rows[-1], order_by)
+        after = (value if value is not None else "", rows[-1].id)
+
+@pytest.fixture
+def dishes(db):
+    return [db.add_record("dishes", (f"Блюдо {number}", None, None, 100 + number % 3, category)).id
+            for number, category in enumerate(CATEGORIES)]
+
+@pytest.mark.parametrize("warm", [False, True])
+@pytest.mark.parametrize("ascending", [True, False])
+def test_keyset_pages_with_null_sort_keys(db, dishes, warm, ascending):
+    if warm:
+        db.warm_dish_cache()
+    expected = [dish_id for _, dish_id in sorted(((category or "", dish_id) for dish_id, category in zip(dishes, CATEGORIES)),
+                                                 reverse=not ascending)]
+    assert walk(db, "category", ascending) == expected
+    # NULL в описании: у всех блюд один ключ, порядок по id
+    assert walk(db, "description", ascending) == sorted(dishes, reverse=not ascending)
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_keyset_pages_with_category_filter(db, dishes, warm):
+    if warm:
+        db.warm_dish_cache()
+    soups = [dish_id for dish_id, category in zip(dishes, CATEGORIES) if category == "Супы"]
+    assert walk(db, "price", True, limit=1, category_filter=["Супы"]) == sorted(
+        soups, key=lambda dish_id: (db.fetch_record("dishes", dish_id).price, dish_id))
+
+def test_dish_cache_follows_writes(db, dishes):
+    db.warm_dish_cache()
+    db.update_record("dishes", {"id": dishes[0], "category": "Супы"})
+    db.delete_record("dishes", dishes[1])
+    added = db.add_record("dishes", ("Новое", None, None, 1, None)).id
+    cached = walk(db, "category", True)
+    db.invalidate_caches("dishes")
+    assert cached == walk(db, "category", True)
+    assert added in cached and dishes[1] not in cached
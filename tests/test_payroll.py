@@ -0,0 +1,43 @@
+import pytest
+
+import payroll
+from payroll import compute_payroll, night_seconds
+
+HOUR = 3600
+# Оклад на норму часов в месяце: ставка ровно 100 в час
+STAFF = [(1, "Анна", "Повар", payroll.MONTH_HOURS * 100, 0), (2, "Борис", "Официант", payroll.MONTH_HOURS * 100, 3)]
+
+# numpy - необязательная зависимость: расчёт идёт и без неё, циклом. Каждый тест с этой
+# фикстурой проверяет оба пути; без numpy его вариант "numpy" пропускается (skip)
+@pytest.fixture(params=["numpy", "loop"])
+def calculation(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(payroll, "numpy", None)
+    return request.param
+
+def test_night_seconds_across_midnight():
+    assert night_seconds(20 * HOUR, 30 * HOUR) == 8 * HOUR  # 20:00-06:00
+    assert night_seconds(2 * HOUR, 10 * HOUR) == 4 * HOUR  # ночь, начатая накануне
+    assert night_seconds(8 * HOUR, 16 * HOUR) == 0
+
+def test_night_and_overtime_split(calculation):
+    # Смена 20:00-06:00 (10 часов): 8 ночных, 2 сверхурочных
+    groups = [(1, 20 * HOUR, 10 * HOUR, 1)]
+    slip = compute_payroll(STAFF[:1], groups)[0]
+    assert (slip.hours, slip.night_hours, slip.overtime_hours) == (10, 8, 2)
+    assert slip.base == 1000
+    assert slip.night_pay == pytest.approx(8 * 100 * (payroll.NIGHT_MULTIPLIER - 1))
+    assert slip.overtime_pay == pytest.approx(2 * 100 * (payroll.OVERTIME_MULTIPLIER - 1))
+    assert slip.tenure_bonus == 0
+    assert slip.total == pytest.approx(slip.base + slip.night_pay + slip.overtime_pay)
+
+def test_groups_are_summed_per_employee(calculation):
+    groups = [(2, 9 * HOUR, 8 * HOUR, 20), (2, 23 * HOUR, 4 * HOUR, 2), (3, 9 * HOUR, 8 * HOUR, 5)]
+    slips = compute_payroll(STAFF, groups)
+    assert [slip.staff_id for slip in slips] == [1, 2]
+    assert slips[0].hours == 0 and slips[0].total == 0
+    assert (slips[1].hours, slips[1].night_hours, slips[1].overtime_hours) == (168, 8, 0)
+    # Три полных года стажа - надбавка 10%
+    assert slips[1].tenure_bonus == pytest.approx((slips[1].base + slips[1].night_pay) * 0.10)
@@ -0,0 +1,40 @@
+import pytest
+
+from repricing import PriceRule
+
+def add_dishes(db, *items):
+    return [db.add_record("dishes", (name, None, None, price, category)).id for name, price, category in items]
+
+def price(db, dish_id):
+    return db.fetch_record("dishes", dish_id).price
+
+def test_apply_and_preview_agree(db):
+    soup, salad, cake = add_dishes(db, ("Борщ", 300, "Супы"), ("Оливье", 250, "Закуска"), ("Торт", 199, "Десерты"))
+    rule = PriceRule(["Супы", "Десерты"], percent=10, round_to=10)
+    preview = db.reprice_preview(rule)
+    assert [(row[0], row[3], row[4]) for row in preview] == [(cake, 199, 220), (soup, 300, 330)]
+    batch_id, count = db.reprice(rule)
+    assert count == 2
+    assert (price(db, soup), price(db, salad), price(db, cake)) == (330, 250, 220)
+    batch = db.price_batches()[0]
+    assert (batch[0], batch[3]) == (batch_id, 2)
+
+def test_undo_skips_dishes_repriced_later(db):
+    soup, stew = add_dishes(db, ("Борщ", 300, "Супы"), ("Солянка", 400, "Супы"))
+    batch_id, _ = db.reprice(PriceRule(["Супы"], delta=50))
+    db.update_record("dishes", {"id": stew, "price": 999})
+    assert db.undo_repricing(batch_id) == (1, 1)
+    assert price(db, soup) == 300
+    assert price(db, stew) == 999
+    with pytest.raises(ValueError):
+        db.undo_repricing(batch_id)
+
+def test_rule_that_zeroes_a_price_is_rejected(db):
+    soup, cake = add_dishes(db, ("Борщ", 300, "Супы"), ("Безе", 40, "Десерты"))
+    rule = PriceRule(["Супы", "Десерты"], delta=-40)
+    with pytest.raises(ValueError):
+        db.reprice_preview(rule)
+    with pytest.raises(ValueError):
+        db.reprice(rule)
+    assert (price(db, soup), price(db, cake)) == (300, 40)
+    assert db.price_batches() == []
@@ -0,0 +1,71 @@
+import pytest
+
+from availability import parse_reservation_date
+from seating import plan_seating
+
+HOUR = 3600
+DAY = "2030-03-01"
+
+def reservation(reservation_id, guests, start_hour, hours=2, table=0):
+    return reservation_id, guests, start_hour * HOUR, (start_hour + hours) * HOUR, table
+
+def test_best_fit_picks_the_smallest_free_table():
+    capacities = {1: 6, 2: 2, 3: 4}
+    # Компании на 3 и на 2 человека не занимают стол на 6, пока есть подходящие поменьше
+    plan = plan_seating([reservation(1, 2, 18), reservation(2, 3, 20)], capacities, {})
+    assert plan.assignments == {1: (2,), 2: (3,)}
+    # В одно время: крупная компания первой берёт стол на 4, вторая пара - оставшийся на 6
+    plan = plan_seating([reservation(1, 2, 18), reservation(2, 3, 18), reservation(3, 2, 18)], capacities, {})
+    assert plan.assignments == {1: (2,), 2: (3,), 3: (1,)}
+    assert plan.unseated == []
+
+def test_large_party_gets_joined_neighbours():
+    plan = plan_seating([reservation(1, 7, 18)], {1: 4, 2: 4, 3: 2}, {1: [2], 2: [1]})
+    assert plan.assignments == {1: (1, 2)}
+    # Без соседства столы не сдвигаются
+    plan = plan_seating([reservation(1, 7, 18)], {1: 4, 2: 4, 3: 2}, {})
+    assert plan.unseated == [1]
+
+def test_overlapping_reservations_never_share_a_table():
+    reservations = [reservation(number, 4, 18 + number % 3) for number in range(1, 7)]
+    plan = plan_seating(reservations, {1: 4, 2: 4, 3: 4}, {})
+    starts = {item[0]: item[2] for item in reservations}
+    by_table = {}
+    for reservation_id, tables in plan.assignments.items():
+        for table in tables:
+            by_table.setdefault(table, []).append(starts[reservation_id])
+    for table_starts in by_table.values():
+        table_starts.sort()
+        assert all(later - earlier >= 2 * HOUR for earlier, later in zip(table_starts, table_starts[1:]))
+    assert plan.seated_guests + 4 * len(plan.unseated) == plan.total_guests
+
+def only_table_one(db):
+    for number in range(2, 11):
+        db.delete_table(number)
+
+def test_overnight_reservation_from_the_previous_day_blocks_its_table(db):
+    only_table_one(db)
+    db.add_record("reservations", ("Вчерашняя", "2030-02-28 23:00", 2, 1, 180))
+    early = db.add_record("reservations", ("Ранняя", f"{DAY} 00:30", 2, 1, 60)).id
+    late = db.add_record("reservations", ("Поздняя", f"{DAY} 02:00", 2, 1, 60)).id
+    plan = db.seating_plan(DAY)
+    assert plan.unseated == [early]
+    assert plan.assignments == {late: (1,)}
+
+def test_apply_moves_reservations_and_joins_tables(db):
+    party = db.add_record("reservations", ("Банкет", f"{DAY} 19:00", 7, 5, 120)).id
+    plan = db.seating_plan(DAY)
+    tables = plan.assignments[party]
+    assert len(tables) == 2 and tables[1] == tables[0] + 1
+    assert db.apply_seating(plan) == [party]
+    assert db.fetch_record("reservations", party).table_number == tables[0]
+    assert db.day_reservations(DAY)[1] == {party: tables}
+    start = parse_reservation_date(f"{DAY} 19:30")
+    assert db.reservation_conflicts(tables[1], start, 30) == [party]
+
+def test_stale_plan_is_rejected(db):
+    db.add_record("reservations", ("Первая", f"{DAY} 19:00", 2, 1, 120))
+    plan = db.seating_plan(DAY)
+    db.add_record("reservations", ("Вторая", f"{DAY} 20:00", 2, 2, 120))
+    with pytest.raises(ValueError):
+        db.apply_seating(plan)